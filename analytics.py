@@ -0,0 +1,366 @@
+#!/usr/bin/env python3
+"""
+Progress Analytics
+Accuracy, retention and response-time statistics over review history, with NumPy
+"""
+
+import argparse
+import json
+import sqlite3
+from pathlib import Path
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from deck_watch import _numbered, card_identity
+from quiz_engine import DEFAULT_DECK_PATH, Deck
+from review_log import (
+    DEFAULT_PROGRESS_DIR, FLAG_RESET, LEGACY_LOG_MAGIC, LOG_HEADER, LOG_MAGIC, read_log,
+)
+
+
+DAY = 86400.0
+
+# Upper edges (days since the card was last seen) of the retention curve buckets
+RETENTION_EDGES = (1 / 24, 1, 3, 7, 14, 30, 90, 365)
+
+LATENCY_PERCENTILES = (50, 90, 99)
+
+
+def _require_numpy():
+    if np is None:
+        raise ImportError("Progress analytics requires NumPy: pip install numpy")
+
+
+def _log_dtype(legacy=False):
+    # Mirrors review_log.RECORD (LEGACY_RECORD, keyed by position) followed by its CRC
+    return np.dtype([
+        ('timestamp', '<f8'), ('card', '<u4' if legacy else '<u8'), ('chosen', 'i1'),
+        ('flags', 'u1'), ('latency', '<f4'), ('crc', '<u4'),
+    ])
+
+
+class ReviewData:
+    """Reviews from one or more learners as parallel NumPy arrays
+
+    `card` indexes the deck; `learner` numbers the sources the reviews came
+    from. Score reset markers and reviews of cards outside the deck are
+    dropped on load.
+    """
+
+    def __init__(self, deck, timestamp, card, correct, latency, learner, learners=None):
+        _require_numpy()
+        store = deck.cards
+        self.deck = deck
+        self.concept_numbers = np.asarray(store.concept_numbers, dtype=np.int64)
+        self.card_concept = self.concept_numbers[np.asarray(store.concept_ids, dtype=np.int64)]
+        # Sorted distinct concept numbers, and each card's position among them
+        self.concepts = np.unique(self.concept_numbers)
+        self.card_concept_position = np.searchsorted(self.concepts, self.card_concept)
+        self.card_type = np.asarray(store.type_ids, dtype=np.int64)
+        self.question_types = list(store.question_types)
+
+        keep = card < len(deck)
+        order = np.argsort(timestamp[keep], kind='stable')
+        self.timestamp = timestamp[keep][order]
+        self.card = card[keep][order].astype(np.int64)
+        self.correct = correct[keep][order].astype(bool)
+        self.latency = latency[keep][order].astype(np.float64)
+        self.learner = learner[keep][order].astype(np.int64)
+        self.learners = learners or [str(i) for i in range(int(learner.max()) + 1 if len(learner) else 0)]
+
+    def __len__(self):
+        return len(self.card)
+
+    @classmethod
+    def load(cls, deck, progress_dirs=(), databases=()):
+        """Load reviews from review-log directories and SQLite databases"""
+        _require_numpy()
+        parts = []
+        names = []
+        for directory in progress_dirs:
+            parts.append(_read_progress_dir(directory, deck))
+            names.append(str(directory))
+        for db_path in databases:
+            parts.append(_read_database(db_path, deck))
+            names.append(str(db_path))
+        if not parts:
+            empty = np.zeros(0)
+            return cls(deck, empty, empty.astype(np.int64), empty.astype(bool), empty, empty.astype(np.int64))
+        learner = np.concatenate([
+            np.full(len(part[0]), i, dtype=np.int64) for i, part in enumerate(parts)
+        ])
+        timestamp, card, correct, latency = (np.concatenate(column) for column in zip(*parts))
+        return cls(deck, timestamp, card, correct, latency, learner, names)
+
+    # Grouped accuracy
+
+    def _accuracy_by(self, keys, size):
+        answered = np.bincount(keys, minlength=size)
+        correct = np.bincount(keys, weights=self.correct.astype(np.float64), minlength=size)
+        return answered, correct.astype(np.int64)
+
+    def accuracy_by_concept(self):
+        """{concept_number: (answered, correct)} for concepts with reviews"""
+        positions = self.card_concept_position[self.card]
+        answered, correct = self._accuracy_by(positions, len(self.concepts))
+        return {
+            int(self.concepts[i]): (int(answered[i]), int(correct[i]))
+            for i in np.flatnonzero(answered)
+        }
+
+    def accuracy_by_question_type(self):
+        """{question_type: (answered, correct)} for question types with reviews"""
+        answered, correct = self._accuracy_by(self.card_type[self.card], len(self.question_types))
+        return {
+            self.question_types[i]: (int(answered[i]), int(correct[i]))
+            for i in np.flatnonzero(answered)
+        }
+
+    def accuracy_by_learner(self):
+        answered, correct = self._accuracy_by(self.learner, len(self.learners))
+        return {
+            self.learners[i]: (int(answered[i]), int(correct[i]))
+            for i in np.flatnonzero(answered)
+        }
+
+    # Over time
+
+    def rolling_accuracy(self, window=50):
+        """Fraction correct over each run of `window` consecutive reviews"""
+        if len(self) < window:
+            return np.zeros(0)
+        totals = np.concatenate(([0], np.cumsum(self.correct)))
+        return (totals[window:] - totals[:-window]) / window
+
+    def daily_accuracy(self):
+        """(day start timestamps, answered, fraction correct) per day with reviews"""
+        if not len(self):
+            return np.zeros(0), np.zeros(0, dtype=np.int64), np.zeros(0)
+        # Reviews are in time order, so each day is one contiguous run
+        days = (self.timestamp // DAY).astype(np.int64)
+        starts = np.concatenate(([0], np.flatnonzero(days[1:] != days[:-1]) + 1))
+        answered = np.diff(np.append(starts, len(days)))
+        correct = np.add.reduceat(self.correct.astype(np.float64), starts)
+        return days[starts] * DAY, answered, correct / answered
+
+    def retention_curve(self, edges=RETENTION_EDGES):
+        """Accuracy by time since the same learner last saw the card
+
+        Returns (bucket upper edges in days, answered, fraction correct);
+        the last bucket collects everything beyond the final edge.
+        """
+        edges = np.asarray(edges, dtype=np.float64)
+        # Reviews are already in time order; sorting (learner, card, position)
+        # packed into one integer puts each learner's reviews of a card
+        # together, oldest first
+        count = len(self)
+        packed = np.sort((self.learner * len(self.deck) + self.card) * count + np.arange(count))
+        order = packed % max(count, 1)
+        key = packed // max(count, 1)
+        repeat = np.zeros(len(order), dtype=bool)
+        repeat[1:] = key[1:] == key[:-1]
+        elapsed = np.zeros(len(order))
+        elapsed[1:] = np.diff(self.timestamp[order]) / DAY
+        buckets = np.searchsorted(edges, elapsed[repeat], side='left')
+        answered = np.bincount(buckets, minlength=len(edges) + 1)
+        correct = np.bincount(
+            buckets, weights=self.correct[order][repeat].astype(np.float64), minlength=len(edges) + 1
+        )
+        with np.errstate(invalid='ignore', divide='ignore'):
+            fraction = np.where(answered > 0, correct / np.maximum(answered, 1), np.nan)
+        return np.append(edges, np.inf), answered, fraction
+
+    # Response time
+
+    def latency_percentiles(self, percentiles=LATENCY_PERCENTILES):
+        """{percentile: seconds} over every review"""
+        if not len(self):
+            return {p: 0.0 for p in percentiles}
+        values = np.percentile(self.latency, percentiles)
+        return {p: float(value) for p, value in zip(percentiles, values)}
+
+    def latency_percentiles_by_concept(self, percentiles=LATENCY_PERCENTILES):
+        """{concept_number: {percentile: seconds}} using one sort for all concepts"""
+        positions = self.card_concept_position[self.card]
+        # Concept position plus latency scaled into [0, 1) sorts by both at once
+        scale = float(self.latency.max()) * 2 + 1 if len(self) else 1.0
+        ordered = np.sort(positions + self.latency / scale)
+        counts = np.bincount(positions, minlength=len(self.concepts))
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+        present = np.flatnonzero(counts)
+        result = {int(self.concepts[i]): {} for i in present}
+        for p in percentiles:
+            picks = (ordered[starts[present] + (counts[present] - 1) * p // 100] % 1) * scale
+            for i, value in zip(present, picks):
+                result[int(self.concepts[i])][p] = float(value)
+        return result
+
+    def summary(self):
+        """Everything above as plain Python values, for JSON"""
+        edges, retained, retention = self.retention_curve()
+        days, day_answered, day_accuracy = self.daily_accuracy()
+        return {
+            'reviews': len(self),
+            'learners': len(self.learners),
+            'accuracy': float(self.correct.mean()) if len(self) else 0.0,
+            'by_concept': {str(k): v for k, v in self.accuracy_by_concept().items()},
+            'by_question_type': self.accuracy_by_question_type(),
+            'by_learner': self.accuracy_by_learner(),
+            'daily': [
+                {'day': float(day), 'answered': int(count), 'accuracy': float(accuracy)}
+                for day, count, accuracy in zip(days, day_answered, day_accuracy)
+            ],
+            'retention': [
+                {'max_days': None if np.isinf(edge) else float(edge), 'answered': int(count),
+                 'accuracy': None if np.isnan(accuracy) else float(accuracy)}
+                for edge, count, accuracy in zip(edges, retained, retention)
+            ],
+            'latency_seconds': {str(p): v for p, v in self.latency_percentiles().items()},
+        }
+
+
+def _log_records(data, deck):
+    """(timestamp, card, flags, latency) arrays from the committed bytes of a log
+
+    Card keys are mapped to deck positions; cards no longer in the deck get
+    len(deck). Version 1 logs already hold positions.
+    """
+    magic = data[:len(LOG_MAGIC)]
+    if magic not in (LOG_MAGIC, LEGACY_LOG_MAGIC):
+        return None
+    dtype = _log_dtype(legacy=magic == LEGACY_LOG_MAGIC)
+    count = max(len(data) - LOG_HEADER.size, 0) // dtype.itemsize
+    records = np.frombuffer(data, dtype=dtype, count=count, offset=LOG_HEADER.size)
+    card = records['card'].astype(np.int64)
+    if magic == LOG_MAGIC:
+        keys = np.asarray(deck.cards.card_keys(), dtype=np.uint64)
+        order = np.argsort(keys)
+        found = np.minimum(np.searchsorted(keys[order], records['card']), max(len(keys) - 1, 0))
+        card = np.full(len(records), len(deck), dtype=np.int64)
+        if len(keys):
+            matched = keys[order][found] == records['card']
+            card[matched] = order[found[matched]]
+    return records['timestamp'], card, records['flags'], records['latency']
+
+
+def _read_progress_dir(directory, deck):
+    """(timestamp, card, correct, latency) arrays from a ReviewHistory directory"""
+    directory = Path(directory)
+    chunks = []
+    # Archived logs were fully committed before they were moved
+    for path in sorted((directory / "archive").glob("reviews.*.log")):
+        chunks.append(_log_records(path.read_bytes(), deck))
+    log_path = directory / "reviews.log"
+    try:
+        _, _, valid_length, _ = read_log(log_path)
+    except (FileNotFoundError, ValueError):
+        valid_length = 0
+    if valid_length > LOG_HEADER.size:
+        chunks.append(_log_records(log_path.read_bytes()[:valid_length], deck))
+    chunks = [chunk for chunk in chunks if chunk is not None]
+    if not chunks:
+        empty = np.zeros(0)
+        return empty, empty.astype(np.int64), empty.astype(bool), empty
+    timestamp, card, flags, latency = (np.concatenate(column) for column in zip(*chunks))
+    keep = (flags & FLAG_RESET) == 0
+    return (
+        timestamp[keep].astype(np.float64),
+        card[keep],
+        (flags[keep] & 1).astype(bool),
+        latency[keep].astype(np.float64),
+    )
+
+
+def _read_database(db_path, deck):
+    """(timestamp, card, correct, latency) arrays from a SQLiteStore database
+
+    Card row ids are mapped to deck positions by card identity (concept
+    number and question text, repeats told apart in order), as
+    SQLiteStore.import_rows() matches cards.
+    """
+    conn = sqlite3.connect(str(db_path))
+    try:
+        position = dict(zip(_numbered(
+            card_identity(card['concept_number'], card['question_text']) for card in deck
+        ), range(len(deck))))
+        stored = conn.execute("SELECT id, concept_number, question_text FROM cards ORDER BY id").fetchall()
+        ids = dict(zip(
+            (card_id for card_id, _, _ in stored),
+            (position.get(identity, len(deck)) for identity in _numbered(
+                card_identity(number, text) for _, number, text in stored
+            )),
+        ))
+        rows = conn.execute("SELECT timestamp, card_id, correct, latency FROM reviews ORDER BY id").fetchall()
+    finally:
+        conn.close()
+    if not rows:
+        empty = np.zeros(0)
+        return empty, empty.astype(np.int64), empty.astype(bool), empty
+    timestamp, card_id, correct, latency = (np.asarray(column) for column in zip(*rows))
+    card = np.fromiter((ids.get(int(i), len(deck)) for i in card_id), dtype=np.int64, count=len(card_id))
+    return timestamp.astype(np.float64), card, correct.astype(bool), latency.astype(np.float64)
+
+
+def format_report(data, deck, top=10):
+    """Text report of a ReviewData, as shown by the CLI and the app's stats panel"""
+    if not len(data):
+        return "No reviews recorded yet."
+
+    def percent(answered, correct):
+        return f"{correct}/{answered} ({int(correct / answered * 100)}%)"
+
+    names = dict(zip(data.concept_numbers.tolist(), deck.cards.concept_names))
+    lines = [f"{len(data):,} reviews from {len(data.learners)} learner(s), "
+             f"{percent(len(data), int(data.correct.sum()))} correct"]
+    latency = data.latency_percentiles()
+    lines.append("Response time: " + ", ".join(f"p{p} {seconds:.1f}s" for p, seconds in latency.items()))
+    rolling = data.rolling_accuracy()
+    if len(rolling):
+        lines.append(f"Last 50 answers: {rolling[-1] * 100:.0f}% correct")
+
+    lines.append("")
+    lines.append("Weakest concepts:")
+    by_concept = sorted(data.accuracy_by_concept().items(), key=lambda item: item[1][1] / item[1][0])
+    for number, (answered, correct) in by_concept[:top]:
+        lines.append(f"  #{number:<3} {names.get(number, ''):<40} {percent(answered, correct)}")
+
+    lines.append("")
+    lines.append("Weakest question types:")
+    by_type = sorted(data.accuracy_by_question_type().items(), key=lambda item: item[1][1] / item[1][0])
+    for question_type, (answered, correct) in by_type[:top]:
+        lines.append(f"  {question_type:<44} {percent(answered, correct)}")
+
+    lines.append("")
+    lines.append("Retention (time since the card was last seen):")
+    for edge, answered, accuracy in zip(*data.retention_curve()):
+        if not answered:
+            continue
+        label = "longer" if np.isinf(edge) else (f"< {edge * 24:.0f} h" if edge < 1 else f"< {edge:.0f} d")
+        lines.append(f"  {label:<10} {answered:>7,} reviews  {accuracy * 100:.0f}% correct")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Report progress from review history")
+    parser.add_argument('--deck', default=str(DEFAULT_DECK_PATH), help="flashcard CSV file")
+    parser.add_argument('--progress', action='append', default=[], metavar='DIR',
+                        help="review log directory (repeat for a class; default: data/progress)")
+    parser.add_argument('--db', action='append', default=[], metavar='FILE',
+                        help="SQLite progress database (repeatable)")
+    parser.add_argument('--json', action='store_true', help="print the report as JSON")
+    args = parser.parse_args()
+
+    progress = args.progress or ([] if args.db else [str(DEFAULT_PROGRESS_DIR)])
+    deck = Deck.load(args.deck)
+    data = ReviewData.load(deck, progress, args.db)
+    if args.json:
+        print(json.dumps(data.summary(), indent=2))
+    else:
+        print(format_report(data, deck))
+
+
+if __name__ == "__main__":
+    main()
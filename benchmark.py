@@ -0,0 +1,408 @@
+#!/usr/bin/env python3
+"""
+Benchmark Suite
+Times deck loading, card selection, scoring and source lookup on synthetic decks of any size
+"""
+
+import argparse
+import csv
+import json
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import distractors
+from card_store import CARD_FIELDS
+from concept_store import SECTION_MARKER, ConceptStore
+from deck_cache import compile_deck, default_cache_path, open_compiled
+from instrumentation import Histogram
+from quiz_engine import Deck, QuizSession, Scorer
+from review_log import ReviewHistory
+from scheduler import SpacedRepetitionScheduler
+
+
+BENCHMARK_VERSION = 1
+
+# Compiling holds every row in memory (about 7 KB a card at peak), so bigger
+# decks are opt-in with --sizes, up to what fits in a few GB of RAM
+DEFAULT_SIZES = (1_000, 10_000, 100_000)
+MAX_ROWS = 1_000_000
+
+# Generated decks are kept here and reused while their manifest matches
+DEFAULT_WORK_DIR = Path(__file__).parent / "data" / ".cache" / "benchmarks"
+
+# Real decks have about five cards per concept; big decks get more per concept
+CARDS_PER_CONCEPT = 5
+MAX_CONCEPTS = 20_000
+
+# Concept sections per generated source file
+CONCEPTS_PER_FILE = 1_000
+
+# Every Nth generated card leaves a wrong answer blank, as imported decks do,
+# so compiling also exercises distractor generation
+BLANK_ANSWER_EVERY = 50
+
+QUESTION_TYPES = (
+    'definition', 'purpose', 'targets', 'principle', 'application', 'technique',
+    'position', 'timing', 'range', 'avoidance', 'shift', 'example',
+)
+
+# Questions served and answered, and source texts read, per deck size
+OPERATIONS = 20_000
+
+# Warm loads timed per size; the best one is kept
+LOAD_REPEAT = 5
+
+# Fraction a metric may grow over its baseline before it counts as a regression
+DEFAULT_TOLERANCE = 0.25
+
+# Differences smaller than these are timer, scheduler or allocator noise,
+# whatever the ratio: single operations take a few µs, and whole steps on
+# the small decks swing by tens of ms from one process to the next
+NOISE_FLOOR = {'_seconds': 0.1, '_ms': 0.05, '_mb': 4.0}
+
+# Runs per deck size; each metric reported is its median over the runs
+DEFAULT_RUNS = 3
+
+# Metrics compared against a baseline: lower is better for all of them
+COMPARED_METRICS = (
+    'compile_seconds', 'compile_peak_rss_mb', 'warm_load_seconds', 'restore_seconds',
+    'select_p50_ms', 'select_p99_ms', 'answer_p50_ms', 'answer_p99_ms',
+    'source_first_seconds', 'source_p50_ms', 'source_p99_ms', 'peak_rss_mb',
+)
+
+_WORDS = (
+    "centerline target strike guard lead rear hand foot range timing angle "
+    "trap block parry punch kick elbow knee chain straight blast shin eyes "
+    "throat groin balance stance footwork distance pressure line energy "
+    "intercept attack defend redirect forward motion economy structure"
+).split()
+
+
+def deck_paths(directory, rows):
+    directory = Path(directory)
+    return directory / f"deck-{rows}.csv", directory / f"concepts-{rows}"
+
+
+def concept_count(rows):
+    return max(1, min(MAX_CONCEPTS, rows // CARDS_PER_CONCEPT))
+
+
+def _sentence(rng, words):
+    return ' '.join(rng.choices(_WORDS, k=words))
+
+
+def generate_deck(directory, rows, seed=0):
+    """Write a deck CSV with the real deck's columns and its concept texts
+
+    Returns (csv path, concepts directory). Both are reused when a
+    manifest shows they were made with the same rows, seed and version.
+    Options are distinct like the real deck's, but some answers hold
+    commas and some explanations span lines, so CSV quoting is exercised.
+    """
+    if not 0 < rows <= MAX_ROWS:
+        raise ValueError(f"rows must be between 1 and {MAX_ROWS:,}")
+    csv_path, concepts_dir = deck_paths(directory, rows)
+    manifest_path = csv_path.with_suffix('.json')
+    manifest = {'version': BENCHMARK_VERSION, 'rows': rows, 'seed': seed}
+    try:
+        if json.loads(manifest_path.read_text()) == manifest and csv_path.exists():
+            return csv_path, concepts_dir
+    except (OSError, ValueError):
+        pass
+
+    rng = random.Random(seed)
+    concepts = concept_count(rows)
+    names = [f"{_sentence(rng, 2).title()} Theory {number}" for number in range(1, concepts + 1)]
+    csv_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(csv_path, 'w', encoding='utf-8', newline='') as file:
+        writer = csv.writer(file)
+        writer.writerow(CARD_FIELDS)
+        for index in range(rows):
+            number = index * concepts // rows + 1
+            answers = []
+            while len(answers) < 4:
+                answer = _sentence(rng, rng.randint(2, 6))
+                if answer not in answers:
+                    answers.append(answer)
+            if index % 7 == 0:
+                answers[0] = ', '.join(answers[0].split())
+            if index % BLANK_ANSWER_EVERY == 0:
+                answers[3] = ''
+            explanation = _sentence(rng, rng.randint(4, 20))
+            if index % 11 == 0:
+                explanation += '\n' + _sentence(rng, 6)
+            writer.writerow((
+                number, names[number - 1], QUESTION_TYPES[index % len(QUESTION_TYPES)],
+                f"{_sentence(rng, rng.randint(4, 10)).capitalize()} ({index})?",
+                *answers, explanation,
+            ))
+
+    concepts_dir.mkdir(parents=True, exist_ok=True)
+    for old in concepts_dir.glob('*.txt'):
+        old.unlink()
+    for first in range(1, concepts + 1, CONCEPTS_PER_FILE):
+        with open(concepts_dir / f"part-{first // CONCEPTS_PER_FILE:04d}.txt", 'wb') as file:
+            for number in range(first, min(first + CONCEPTS_PER_FILE, concepts + 1)):
+                file.write(SECTION_MARKER + f"{number}\n".encode())
+                lines = [f"{names[number - 1]}", ""]
+                lines += [f"{i}. {_sentence(rng, 12).capitalize()}." for i in range(1, rng.randint(3, 9))]
+                file.write(('\n'.join(lines) + '\n\n').encode('utf-8'))
+    manifest_path.write_text(json.dumps(manifest))
+    return csv_path, concepts_dir
+
+
+def peak_rss_mb():
+    """Peak resident memory of this process in MiB, or None where unsupported"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return peak / (1 << 20) if sys.platform == 'darwin' else peak / 1024
+
+
+def run_compile(csv_path):
+    """Time a cold load of a deck CSV: parse, validate, find near-duplicates, fill and compile"""
+    # Start without saved distractor picks, as on a deck's first launch
+    distractors.default_cache_path(csv_path).unlink(missing_ok=True)
+    start = time.perf_counter()
+    store = compile_deck(csv_path)
+    return {
+        'cards': len(store),
+        'compile_seconds': time.perf_counter() - start,
+        'compile_peak_rss_mb': peak_rss_mb(),
+    }
+
+
+def run_session(csv_path, concepts_dir, operations=OPERATIONS, seed=0):
+    """Time the paths FlashcardApp runs once the deck is compiled
+
+    Memory-maps the deck (best of LOAD_REPEAT), serves and answers
+    `operations` questions through the review log, restores that progress
+    into a fresh scheduler, and looks up the source text of random cards'
+    concepts.
+    """
+    clock = time.perf_counter
+    cache_path = default_cache_path(csv_path)
+    warm = []
+    for _ in range(LOAD_REPEAT):
+        start = clock()
+        store = open_compiled(cache_path, csv_path)
+        store.options(len(store) // 2)
+        warm.append(clock() - start)
+    deck = Deck(store)
+
+    rng = random.Random(seed)
+    select_times, answer_times, source_times = Histogram(), Histogram(), Histogram()
+    with tempfile.TemporaryDirectory() as progress_dir:
+        history = ReviewHistory(progress_dir)
+        scheduler = SpacedRepetitionScheduler(deck, rng)
+        session = QuizSession(deck, rng=rng, selector=scheduler, recorder=history)
+        history.restore(session.scorer, scheduler)
+        for _ in range(operations):
+            before = clock()
+            question = session.next_question()
+            select_times.record(clock() - before)
+            choice = question.correct_index if rng.random() < 0.75 else (question.correct_index + 1) % 4
+            before = clock()
+            session.answer(choice)
+            answer_times.record(clock() - before)
+        history.close(session.scorer, scheduler)
+
+        # Startup with that progress saved: snapshot plus log replay
+        history = ReviewHistory(progress_dir)
+        start = clock()
+        history.restore(Scorer(), SpacedRepetitionScheduler(deck, rng))
+        restore_seconds = clock() - start
+        history.close()
+
+    concepts = ConceptStore(concepts_dir)
+    numbers = [int(deck.cards.concept_number(rng.randrange(len(deck)))) for _ in range(operations)]
+    start = clock()
+    concepts.get(numbers[0])
+    source_first_seconds = clock() - start
+    for number in numbers:
+        before = clock()
+        concepts.get(number)
+        source_times.record(clock() - before)
+
+    return {
+        'concepts': len(concepts),
+        'warm_load_seconds': min(warm),
+        'restore_seconds': restore_seconds,
+        'select_p50_ms': select_times.percentile(0.5) * 1000,
+        'select_p99_ms': select_times.percentile(0.99) * 1000,
+        'answer_p50_ms': answer_times.percentile(0.5) * 1000,
+        'answer_p99_ms': answer_times.percentile(0.99) * 1000,
+        'source_first_seconds': source_first_seconds,
+        'source_p50_ms': source_times.percentile(0.5) * 1000,
+        'source_p99_ms': source_times.percentile(0.99) * 1000,
+        'peak_rss_mb': peak_rss_mb(),
+        'operations': operations,
+    }
+
+
+def _child(*args):
+    """Run one phase in a fresh interpreter and return its JSON result"""
+    output = subprocess.run(
+        [sys.executable, __file__, *map(str, args)], check=True, capture_output=True, text=True,
+    ).stdout
+    return json.loads(output)
+
+
+def _median(runs):
+    """Each metric's median over several results; unmeasured ones stay None"""
+    result = {}
+    for metric in runs[0]:
+        values = [run[metric] for run in runs if run.get(metric) is not None]
+        result[metric] = statistics.median(values) if values else None
+    return result
+
+
+def run_benchmarks(sizes=DEFAULT_SIZES, work_dir=DEFAULT_WORK_DIR, operations=OPERATIONS,
+                   seed=0, progress=None, runs=DEFAULT_RUNS):
+    """Generate (or reuse) a deck per size and benchmark it `runs` times
+
+    Compiling and the session each run in their own process, so peak
+    memory readings are independent of each other, of the other sizes
+    and of generating the decks. Each metric is the median of the runs,
+    so one slow run doesn't make a regression.
+    """
+    results = {}
+    for rows in sizes:
+        csv_path, concepts_dir = generate_deck(work_dir, rows, seed)
+        measured = []
+        for run in range(runs):
+            if progress is not None:
+                progress(f"{rows:,} cards, run {run + 1}/{runs}...")
+            result = _child('--run-compile', csv_path)
+            result.update(_child('--run-session', csv_path, concepts_dir,
+                                 '--operations', operations, '--seed', seed))
+            measured.append(result)
+        results[str(rows)] = _median(measured)
+    return {
+        'version': BENCHMARK_VERSION,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'seed': seed,
+        'operations': operations,
+        'runs': runs,
+        'results': results,
+    }
+
+
+def compare(report, baseline, tolerance=DEFAULT_TOLERANCE):
+    """(lines, regressions) comparing a report with a saved baseline
+
+    Only sizes and metrics present in both are compared. A metric regresses
+    when it grew by more than `tolerance` of its baseline value and by more
+    than its NOISE_FLOOR.
+    """
+    lines = []
+    regressions = []
+    for size, result in report['results'].items():
+        old = baseline.get('results', {}).get(size)
+        if old is None:
+            continue
+        for metric in COMPARED_METRICS:
+            new_value, old_value = result.get(metric), old.get(metric)
+            if new_value is None or not old_value:
+                continue
+            change = new_value / old_value - 1
+            floor = next(value for suffix, value in NOISE_FLOOR.items() if metric.endswith(suffix))
+            line = f"{int(size):>10,} {metric:<22} {old_value:>12.4f} -> {new_value:>12.4f} ({change:+.1%})"
+            if change > tolerance and new_value - old_value > floor:
+                line += "  REGRESSION"
+                regressions.append(line)
+            lines.append(line)
+    return lines, regressions
+
+
+def format_report(report):
+    """One line per deck size: seconds for whole steps, ms for single operations"""
+    def megabytes(value):
+        return f"{value:.0f}MB" if value is not None else "n/a"
+
+    lines = [f"{'cards':>10} {'compile':>16} {'warm load':>10} {'restore':>9} "
+             f"{'select p50/p99':>16} {'answer p50/p99':>16} {'source p50/p99':>16} {'RSS':>7}"]
+    for size, result in report['results'].items():
+        lines.append(
+            f"{int(size):>10,} {result['compile_seconds']:>8.3f}s {megabytes(result['compile_peak_rss_mb']):>7} "
+            f"{result['warm_load_seconds'] * 1000:>8.2f}ms {result['restore_seconds'] * 1000:>7.1f}ms "
+            f"{result['select_p50_ms']:>7.3f}/{result['select_p99_ms']:<6.3f}ms "
+            f"{result['answer_p50_ms']:>7.3f}/{result['answer_p99_ms']:<6.3f}ms "
+            f"{result['source_p50_ms']:>7.3f}/{result['source_p99_ms']:<6.3f}ms "
+            f"{megabytes(result['peak_rss_mb']):>7}"
+        )
+    return '\n'.join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the quiz paths on synthetic decks")
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(DEFAULT_SIZES),
+                        help=f"deck sizes in cards (up to {MAX_ROWS:,})")
+    parser.add_argument('--work-dir', default=str(DEFAULT_WORK_DIR),
+                        help="where generated decks are kept between runs")
+    parser.add_argument('--operations', type=int, default=OPERATIONS,
+                        help="questions answered and source texts read per size")
+    parser.add_argument('--seed', type=int, default=0, help="seed for the generated decks")
+    parser.add_argument('--runs', type=int, default=DEFAULT_RUNS,
+                        help=f"runs per size; each metric is the median (default: {DEFAULT_RUNS})")
+    parser.add_argument('--save', metavar='JSON', help="write the results as a baseline")
+    parser.add_argument('--baseline', metavar='JSON',
+                        help="compare with a saved baseline; exit 1 on any regression")
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help="allowed growth over the baseline (default: 0.25 = 25%%)")
+    parser.add_argument('--json', action='store_true', help="print the results as JSON")
+    parser.add_argument('--generate-only', action='store_true',
+                        help="write the decks and concept texts without timing anything")
+    parser.add_argument('--run-compile', metavar='CSV', help=argparse.SUPPRESS)
+    parser.add_argument('--run-session', nargs=2, metavar=('CSV', 'CONCEPTS'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_compile:
+        print(json.dumps(run_compile(Path(args.run_compile))))
+        return
+    if args.run_session:
+        print(json.dumps(run_session(Path(args.run_session[0]), Path(args.run_session[1]),
+                                     args.operations, args.seed)))
+        return
+    if args.generate_only:
+        for rows in args.sizes:
+            csv_path, concepts_dir = generate_deck(args.work_dir, rows, args.seed)
+            print(f"{rows:,} cards: {csv_path} and {concepts_dir}")
+        return
+
+    for rows in args.sizes:
+        if not 0 < rows <= MAX_ROWS:
+            parser.error(f"sizes must be between 1 and {MAX_ROWS:,}")
+    report = run_benchmarks(args.sizes, args.work_dir, args.operations, args.seed,
+                            progress=lambda message: print(message, file=sys.stderr),
+                            runs=max(1, args.runs))
+    if args.save:
+        Path(args.save).write_text(json.dumps(report, indent=2) + '\n', encoding='utf-8')
+    print(json.dumps(report, indent=2) if args.json else format_report(report))
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as file:
+            baseline = json.load(file)
+        lines, regressions = compare(report, baseline, args.tolerance)
+        if not args.json:
+            print()
+            print('\n'.join(lines))
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) over {args.tolerance:.0%}:", file=sys.stderr)
+            for line in regressions:
+                print(line, file=sys.stderr)
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
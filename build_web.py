@@ -0,0 +1,425 @@
+#!/usr/bin/env python3
+"""
+Web Build
+Regenerates the web app's data files from the deck CSV and concept texts, plus a
+minified, gzipped, content-hashed copy of the app for static hosting
+"""
+
+import argparse
+import gzip
+import hashlib
+import json
+import re
+import sys
+import textwrap
+from pathlib import Path
+
+from card_store import CARD_FIELDS
+from concept_store import ConceptStore
+from deck_cache import read_rows
+from quiz_engine import DEFAULT_DECK_PATH
+
+
+ROOT_DIR = Path(__file__).parent
+WEB_DIR = ROOT_DIR / "web"
+DIST_DIR = WEB_DIR / "dist"
+MANIFEST_PATH = ROOT_DIR / "data" / ".cache" / "web_build.json"
+
+# Hand-written app sources; the root copies mirror web/
+STATIC_SOURCES = ('index.html', 'styles.css', 'app.js')
+
+CONCEPT_TEXTS_HEADER = "// JKD Concept Source Material - extracted from PDF\n"
+
+MANIFEST_VERSION = 2
+
+# Hex digits of the content hash put in asset file names
+HASH_LENGTH = 10
+
+
+def _digest(data):
+    return hashlib.sha256(data.encode('utf-8') if isinstance(data, str) else data).hexdigest()
+
+
+def _template_literal(text):
+    """Text as a JavaScript template literal"""
+    return '`' + text.replace('\\', '\\\\').replace('`', '\\`').replace('${', '\\${') + '`'
+
+
+# Record fragments
+
+class FragmentCache:
+    """Serialised cards and concepts keyed by content hash
+
+    A record is only serialised again when its content hash is new, so an
+    edit to one card touches one fragment. Cards are hashed from their
+    field values as read, so unchanged cards are never serialised.
+    """
+
+    def __init__(self, path=MANIFEST_PATH):
+        self.path = Path(path)
+        self.cards = {}
+        self.concepts = {}
+        self.added = 0
+        self.reused = 0
+        try:
+            with open(self.path, 'r', encoding='utf-8') as file:
+                data = json.load(file)
+            if data.get('version') == MANIFEST_VERSION:
+                self.cards = data['cards']
+                self.concepts = data['concepts']
+        except (OSError, ValueError, KeyError):
+            pass
+        self._used_cards = {}
+        self._used_concepts = {}
+
+    def card(self, row):
+        """(pretty, compact) JSON for a card"""
+        key = _digest('\0'.join(row.get(field) or '' for field in CARD_FIELDS))
+        fragment = self.cards.get(key)
+        if fragment is None:
+            record = {field: row.get(field) or '' for field in CARD_FIELDS}
+            fragment = [
+                textwrap.indent(json.dumps(record, indent=2, ensure_ascii=False), '  '),
+                json.dumps(record, ensure_ascii=False, separators=(',', ':')),
+            ]
+            self.added += 1
+        else:
+            self.reused += 1
+        self._used_cards[key] = fragment
+        return fragment
+
+    def concept(self, number, text):
+        """(pretty, compact) JavaScript object entries for a concept's text"""
+        key = _digest(f"{number}\0{text}")
+        fragment = self.concepts.get(key)
+        if fragment is None:
+            literal = _template_literal(text)
+            fragment = [f"    {number}: {literal}", f"{number}:{literal}"]
+            self.added += 1
+        else:
+            self.reused += 1
+        self._used_concepts[key] = fragment
+        return fragment
+
+    def save(self):
+        """Keep only the fragments used by this build"""
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, 'w', encoding='utf-8') as file:
+                json.dump({
+                    'version': MANIFEST_VERSION,
+                    'cards': self._used_cards,
+                    'concepts': self._used_concepts,
+                }, file, ensure_ascii=False)
+        except OSError:
+            pass
+
+
+def flashcards_json(rows, fragments):
+    """(pretty, compact) flashcards.json"""
+    cards = [fragments.card(row) for row in rows]
+    if not cards:
+        return '[]', '[]'
+    return (
+        '[\n' + ',\n'.join(pretty for pretty, _ in cards) + '\n]',
+        '[' + ','.join(compact for _, compact in cards) + ']',
+    )
+
+
+def concept_texts_js(concepts, fragments):
+    """(pretty, compact) conceptTexts.js"""
+    entries = [fragments.concept(number, concepts[number]) for number in sorted(concepts)]
+    return (
+        CONCEPT_TEXTS_HEADER + "const CONCEPT_TEXTS = {\n"
+        + ',\n\n'.join(pretty for pretty, _ in entries) + "\n};\n",
+        "const CONCEPT_TEXTS={" + ','.join(compact for _, compact in entries) + "};",
+    )
+
+
+# Minifiers
+
+_JS_WORD = re.compile(r"[\w$]")
+
+# Characters after which a '/' starts a regular expression rather than a division
+_REGEX_PRECEDERS = set('(,=:[!&|?{};+-*%<>~^\n')
+
+
+def _skip_string(source, start):
+    """Index just past the string or template literal that starts at start"""
+    quote = source[start]
+    i = start + 1
+    depth = 0
+    while i < len(source):
+        char = source[i]
+        if char == '\\':
+            i += 2
+            continue
+        if quote == '`' and depth == 0 and source.startswith('${', i):
+            depth = 1
+            i += 2
+            continue
+        if depth:
+            if char in '\'"`':
+                i = _skip_string(source, i)
+                continue
+            if char == '{':
+                depth += 1
+            elif char == '}':
+                depth -= 1
+        elif char == quote:
+            return i + 1
+        i += 1
+    return i
+
+
+def minify_js(source):
+    """Drop comments, indentation and blank lines from JavaScript
+
+    Line breaks are kept so automatic semicolon insertion still sees them.
+    """
+    out = []
+    i = 0
+    length = len(source)
+    pending_space = False
+    while i < length:
+        char = source[i]
+        if char in '\'"`':
+            end = _skip_string(source, i)
+            token = source[i:end]
+            i = end
+        elif source.startswith('//', i):
+            i = source.find('\n', i)
+            i = length if i < 0 else i
+            continue
+        elif source.startswith('/*', i):
+            end = source.find('*/', i + 2)
+            i = length if end < 0 else end + 2
+            pending_space = True
+            continue
+        elif char == '/':
+            previous = next((token[-1] for token in reversed(out) if token != ' '), '\n')
+            if previous in _REGEX_PRECEDERS:
+                # Regular expression literal, classes may contain '/'
+                j = i + 1
+                in_class = False
+                while j < length and source[j] != '\n':
+                    if source[j] == '\\':
+                        j += 2
+                        continue
+                    if source[j] == '[':
+                        in_class = True
+                    elif source[j] == ']':
+                        in_class = False
+                    elif source[j] == '/' and not in_class:
+                        break
+                    j += 1
+                j += 1
+                while j < length and _JS_WORD.match(source[j]):
+                    j += 1
+                token = source[i:j]
+                i = j
+            else:
+                token = char
+                i += 1
+        elif char == '\n':
+            while out and out[-1] == ' ':
+                out.pop()
+            if out and out[-1] != '\n':
+                out.append('\n')
+            pending_space = False
+            i += 1
+            continue
+        elif char in ' \t\r':
+            pending_space = True
+            i += 1
+            continue
+        else:
+            token = char
+            i += 1
+
+        if pending_space and out and out[-1] != '\n':
+            last = out[-1][-1]
+            first = token[0]
+            if (_JS_WORD.match(last) and _JS_WORD.match(first)) or (last in '+-' and first in '+-'):
+                out.append(' ')
+        pending_space = False
+        out.append(token)
+    return ''.join(out).strip() + '\n'
+
+
+_CSS_TOKENS = re.compile(r"""("(?:\\.|[^"\\])*"|'(?:\\.|[^'\\])*')|(/\*.*?\*/)|(\s+)""", re.S)
+_CSS_PUNCTUATION = re.compile(r"\s*([{};,>])\s*")
+
+
+def minify_css(source):
+    """Drop comments and needless whitespace from CSS"""
+    parts = []
+    position = 0
+    for match in _CSS_TOKENS.finditer(source):
+        parts.append(source[position:match.start()])
+        string, comment, space = match.groups()
+        if string:
+            parts.append('\0' + string + '\0')
+        elif space:
+            parts.append(' ')
+        position = match.end()
+    parts.append(source[position:])
+
+    # Tighten punctuation outside strings, which are fenced by NUL bytes
+    pieces = ''.join(parts).split('\0')
+    for index in range(0, len(pieces), 2):
+        piece = _CSS_PUNCTUATION.sub(r'\1', pieces[index])
+        pieces[index] = re.sub(r":\s+", ':', piece).replace(';}', '}')
+    return ''.join(pieces).strip() + '\n'
+
+
+def minify_html(source):
+    """Drop comments, indentation and blank lines from HTML"""
+    source = re.sub(r"<!--.*?-->", '', source, flags=re.S)
+    return '\n'.join(line.strip() for line in source.splitlines() if line.strip()) + '\n'
+
+
+# Output
+
+class BuildResult:
+    """Files written or left alone by a build"""
+
+    def __init__(self):
+        self.written = []
+        self.unchanged = []
+        self.removed = []
+        self.records_rebuilt = 0
+        self.records_reused = 0
+        self.sizes = {}
+
+    @property
+    def changed(self):
+        return bool(self.written or self.removed)
+
+
+def _write_if_changed(path, data, result, dry_run):
+    data = data.encode('utf-8') if isinstance(data, str) else data
+    try:
+        if path.read_bytes() == data:
+            result.unchanged.append(path)
+            return
+    except OSError:
+        pass
+    result.written.append(path)
+    if not dry_run:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(data)
+
+
+def _hashed_name(name, data):
+    stem, dot, suffix = name.rpartition('.')
+    return f"{stem}.{_digest(data)[:HASH_LENGTH]}{dot}{suffix}"
+
+
+def build_dist(sources, dist_dir, result, dry_run=False):
+    """Write minified, content-hashed assets with .gz siblings and an index.html
+
+    `sources` maps file names to their minified text. Asset names referenced
+    by app.js and index.html are rewritten to the hashed names.
+    """
+    names = {}
+    outputs = {}
+    # Data first so the hashed names can be substituted into the code
+    for name in ('flashcards.json', 'conceptTexts.js', 'styles.css', 'app.js'):
+        text = sources[name]
+        for original, hashed in names.items():
+            text = text.replace(f"'{original}'", f"'{hashed}'")
+        names[name] = _hashed_name(name, text)
+        outputs[names[name]] = text
+
+    html = sources['index.html']
+    for original, hashed in names.items():
+        html = html.replace(f'"{original}"', f'"{hashed}"')
+    outputs['index.html'] = html
+
+    expected = set()
+    for name, text in outputs.items():
+        data = text.encode('utf-8')
+        compressed = gzip.compress(data, 9, mtime=0)
+        _write_if_changed(dist_dir / name, data, result, dry_run)
+        _write_if_changed(dist_dir / f"{name}.gz", compressed, result, dry_run)
+        expected.update((name, f"{name}.gz"))
+        result.sizes[name] = (len(data), len(compressed))
+
+    # Assets from earlier builds
+    if dist_dir.is_dir():
+        for path in sorted(dist_dir.iterdir()):
+            if path.is_file() and path.name not in expected:
+                result.removed.append(path)
+                if not dry_run:
+                    path.unlink()
+    return names
+
+
+def build(csv_path=DEFAULT_DECK_PATH, concepts=None, web_dir=WEB_DIR, mirror_dir=ROOT_DIR,
+          dist=True, manifest_path=MANIFEST_PATH, dry_run=False):
+    """Regenerate the web app's data files (and mirrors and dist) from the Python sources"""
+    result = BuildResult()
+    web_dir = Path(web_dir)
+    concepts = ConceptStore() if concepts is None else concepts
+    fragments = FragmentCache(manifest_path)
+
+    flashcards, flashcards_min = flashcards_json(read_rows(csv_path), fragments)
+    concept_texts, concept_texts_min = concept_texts_js(concepts, fragments)
+    result.records_rebuilt = fragments.added
+    result.records_reused = fragments.reused
+
+    generated = {'flashcards.json': flashcards, 'conceptTexts.js': concept_texts}
+    for name, text in generated.items():
+        _write_if_changed(web_dir / name, text, result, dry_run)
+
+    if mirror_dir is not None:
+        mirror_dir = Path(mirror_dir)
+        for name, text in generated.items():
+            _write_if_changed(mirror_dir / name, text, result, dry_run)
+        for name in STATIC_SOURCES:
+            _write_if_changed(mirror_dir / name, (web_dir / name).read_bytes(), result, dry_run)
+
+    if dist:
+        sources = {
+            'flashcards.json': flashcards_min,
+            'conceptTexts.js': concept_texts_min,
+            'index.html': minify_html((web_dir / 'index.html').read_text(encoding='utf-8')),
+            'styles.css': minify_css((web_dir / 'styles.css').read_text(encoding='utf-8')),
+            'app.js': minify_js((web_dir / 'app.js').read_text(encoding='utf-8')),
+        }
+        build_dist(sources, web_dir / "dist", result, dry_run)
+
+    if not dry_run:
+        fragments.save()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Regenerate the web app from the deck CSV and concept texts")
+    parser.add_argument('--deck', default=str(DEFAULT_DECK_PATH), help="flashcard CSV file")
+    parser.add_argument('--no-dist', action='store_true', help="skip the minified web/dist build")
+    parser.add_argument('--no-mirror', action='store_true', help="don't update the copies in the repo root")
+    parser.add_argument('--check', action='store_true',
+                        help="write nothing; exit 1 if any generated file is out of date")
+    args = parser.parse_args()
+
+    result = build(
+        args.deck, dist=not args.no_dist, mirror_dir=None if args.no_mirror else ROOT_DIR,
+        dry_run=args.check
+    )
+    verb = "Out of date" if args.check else "Wrote"
+    for path in result.written:
+        print(f"{verb}: {path.relative_to(ROOT_DIR)}")
+    for path in result.removed:
+        print(f"{'Stale' if args.check else 'Removed'}: {path.relative_to(ROOT_DIR)}")
+    print(f"Records: {result.records_rebuilt} rebuilt, {result.records_reused} unchanged; "
+          f"files: {len(result.written)} written, {len(result.unchanged)} unchanged")
+    for name, (size, compressed) in sorted(result.sizes.items()):
+        print(f"  dist/{name:<32} {size:>8,} bytes  {compressed:>7,} gzipped")
+    if args.check and result.changed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,266 @@
+"""
+Card Store
+Compact columnar storage for flashcard decks
+"""
+
+import hashlib
+import sys
+from array import array
+from collections.abc import Mapping
+
+
+# Column order of the flashcard CSV format
+CARD_FIELDS = (
+    'concept_number', 'concept_name', 'question_type', 'question_text',
+    'correct_answer', 'wrong_answer_1', 'wrong_answer_2', 'wrong_answer_3',
+    'explanation'
+)
+
+# Free-text columns kept in the string pool, in storage order
+TEXT_FIELDS = (
+    'question_text', 'correct_answer', 'wrong_answer_1', 'wrong_answer_2',
+    'wrong_answer_3', 'explanation'
+)
+
+# Each card owns one offset per text field plus the end of its last field
+OFFSETS_PER_CARD = len(TEXT_FIELDS) + 1
+
+# Position of the correct answer within TEXT_FIELDS
+ANSWERS_START = TEXT_FIELDS.index('correct_answer')
+
+_TEXT_POSITIONS = {field: i for i, field in enumerate(TEXT_FIELDS)}
+
+_QUESTION_POSITION = TEXT_FIELDS.index('question_text')
+
+
+class CardStore:
+    """Flashcards stored column-wise instead of as one dict per card
+
+    Concept and question type names are interned once and referenced by
+    integer id. Free text lives in a single UTF-8 pool addressed by byte
+    offsets, so a card costs a few machine words plus its text.
+    """
+
+    def __init__(self):
+        self.concept_numbers = []   # concept id -> concept number
+        self.concept_names = []     # concept id -> interned concept name
+        self.question_types = []    # type id -> interned question type
+        self.concept_ids = array('I')
+        self.type_ids = array('I')
+        self.offsets = array('Q')
+        self.pool = bytearray()
+        self._concept_lookup = {}
+        self._type_lookup = {}
+        self._keys = None           # card_keys(), once computed or loaded
+
+    @classmethod
+    def from_columns(cls, concepts, question_types, concept_ids, type_ids, offsets, pool, keys=None):
+        """Wrap prebuilt columns, e.g. memoryviews over a compiled deck file
+
+        `concepts` is a list of (concept_number, concept_name) pairs indexed by
+        concept id, and `keys` the card_keys() if they were saved with the
+        columns. The columns are used as-is and are not copied.
+        """
+        store = cls()
+        store._keys = keys
+        for number, name in concepts:
+            store._concept_lookup[(number, name)] = len(store.concept_numbers)
+            store.concept_numbers.append(number)
+            store.concept_names.append(sys.intern(name))
+        for question_type in question_types:
+            store._type_lookup[question_type] = len(store.question_types)
+            store.question_types.append(sys.intern(question_type))
+        store.concept_ids = concept_ids
+        store.type_ids = type_ids
+        store.offsets = offsets
+        store.pool = pool
+        return store
+
+    @classmethod
+    def from_rows(cls, rows):
+        """Build a store from mappings with the flashcard CSV columns"""
+        store = cls()
+        for row in rows:
+            store.append(row)
+        return store
+
+    def __len__(self):
+        return len(self.concept_ids)
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("card index out of range")
+        return CardView(self, index)
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield CardView(self, index)
+
+    def _ids(self, row):
+        """Concept id and question type id of a row, interning new ones"""
+        concept_key = (int(row['concept_number']), row['concept_name'])
+        concept_id = self._concept_lookup.get(concept_key)
+        if concept_id is None:
+            concept_id = len(self.concept_numbers)
+            self.concept_numbers.append(concept_key[0])
+            self.concept_names.append(sys.intern(concept_key[1]))
+            self._concept_lookup[concept_key] = concept_id
+
+        question_type = row['question_type']
+        type_id = self._type_lookup.get(question_type)
+        if type_id is None:
+            type_id = len(self.question_types)
+            self.question_types.append(sys.intern(question_type))
+            self._type_lookup[question_type] = type_id
+        return concept_id, type_id
+
+    def append(self, row):
+        """Add a card and return its index"""
+        concept_id, type_id = self._ids(row)
+        self.concept_ids.append(concept_id)
+        self.type_ids.append(type_id)
+        self._append_text(row)
+        return len(self.concept_ids) - 1
+
+    def replace(self, index, row):
+        """Overwrite a card in place, keeping its index
+
+        The new text is appended to the pool and the card's offsets point at
+        it; the old text stays in the pool until the store is rebuilt.
+        """
+        concept_id, type_id = self._ids(row)
+        self._keys = None
+        self.concept_ids[index] = concept_id
+        self.type_ids[index] = type_id
+        offsets = self.offsets
+        pool = self.pool
+        base = index * OFFSETS_PER_CARD
+        for position, field in enumerate(TEXT_FIELDS):
+            offsets[base + position] = len(pool)
+            pool += (row.get(field) or '').encode('utf-8')
+        offsets[base + len(TEXT_FIELDS)] = len(pool)
+
+    def copy(self):
+        """In-memory copy that can be appended to and replaced, e.g. of a mapped store"""
+        concept_ids = array('I')
+        concept_ids.frombytes(bytes(self.concept_ids))
+        type_ids = array('I')
+        type_ids.frombytes(bytes(self.type_ids))
+        offsets = array('Q')
+        offsets.frombytes(bytes(self.offsets))
+        keys = None
+        if self._keys is not None:
+            keys = array('Q')
+            keys.frombytes(bytes(self._keys))
+        return CardStore.from_columns(
+            list(zip(self.concept_numbers, self.concept_names)),
+            self.question_types,
+            concept_ids, type_ids, offsets, bytearray(self.pool), keys
+        )
+
+    def _append_text(self, row):
+        offsets = self.offsets
+        pool = self.pool
+        for field in TEXT_FIELDS:
+            offsets.append(len(pool))
+            pool += (row.get(field) or '').encode('utf-8')
+        offsets.append(len(pool))
+
+    def text(self, index, position):
+        """Return text field number `position` (see TEXT_FIELDS) of a card"""
+        base = index * OFFSETS_PER_CARD + position
+        return str(self.pool[self.offsets[base]:self.offsets[base + 1]], 'utf-8')
+
+    def options(self, index):
+        """Return the four answer options of a card, correct answer first"""
+        offsets = self.offsets
+        pool = self.pool
+        base = index * OFFSETS_PER_CARD + ANSWERS_START
+        return [
+            str(pool[offsets[k]:offsets[k + 1]], 'utf-8')
+            for k in range(base, base + 4)
+        ]
+
+    def concept_number(self, index):
+        return self.concept_numbers[self.concept_ids[index]]
+
+    def card_keys(self):
+        """Stable 63-bit key of every card by index, for progress that survives CSV edits
+
+        A key hashes what deck_watch.card_identity() compares, the concept
+        number and the question text without surrounding whitespace, plus
+        how many earlier cards share both, so it stays with the card when
+        rows are added, removed or reordered.
+        """
+        if self._keys is not None and len(self._keys) == len(self):
+            return self._keys
+        keys = array('Q')
+        seen = {}
+        numbers = [b'%d\x1f' % number for number in self.concept_numbers]
+        offsets = self.offsets
+        pool = self.pool
+        blake2b = hashlib.blake2b
+        base = _QUESTION_POSITION
+        for concept_id in self.concept_ids:
+            identity = numbers[concept_id] + bytes(pool[offsets[base]:offsets[base + 1]]).strip()
+            base += OFFSETS_PER_CARD
+            count = seen.get(identity, 0)
+            seen[identity] = count + 1
+            if count:
+                identity += b'\x1f%d' % count
+            keys.append(int.from_bytes(blake2b(identity, digest_size=8).digest(), 'little') >> 1)
+        self._keys = keys
+        return keys
+
+    def concept_name(self, index):
+        return self.concept_names[self.concept_ids[index]]
+
+    def question_type(self, index):
+        return self.question_types[self.type_ids[index]]
+
+    def row(self, index):
+        """Return a card as a plain dict with the CSV columns"""
+        return dict(CardView(self, index))
+
+    @property
+    def nbytes(self):
+        """Approximate memory held by the card columns and string pool"""
+        return (
+            self.concept_ids.itemsize * len(self.concept_ids)
+            + self.type_ids.itemsize * len(self.type_ids)
+            + self.offsets.itemsize * len(self.offsets)
+            + len(self.pool)
+        )
+
+
+class CardView(Mapping):
+    """Read-only dict-like view of one card in a CardStore"""
+
+    __slots__ = ('store', 'index')
+
+    def __init__(self, store, index):
+        self.store = store
+        self.index = index
+
+    def __getitem__(self, key):
+        position = _TEXT_POSITIONS.get(key)
+        if position is not None:
+            return self.store.text(self.index, position)
+        if key == 'concept_number':
+            return self.store.concept_number(self.index)
+        if key == 'concept_name':
+            return self.store.concept_name(self.index)
+        if key == 'question_type':
+            return self.store.question_type(self.index)
+        raise KeyError(key)
+
+    def __iter__(self):
+        return iter(CARD_FIELDS)
+
+    def __len__(self):
+        return len(CARD_FIELDS)
+
+    def __repr__(self):
+        return f"CardView({self.index}, {self['question_text']!r})"
@@ -0,0 +1,122 @@
+"""
+Concept Text Store
+Source material for each concept, read from disk one concept at a time
+"""
+
+import struct
+from collections.abc import Mapping
+from functools import lru_cache
+from pathlib import Path
+
+
+DEFAULT_CONCEPTS_DIR = Path(__file__).parent / "data" / "concepts"
+
+# Each concept in a source file starts with a line "@@ <concept number>"
+SECTION_MARKER = b'@@ '
+
+INDEX_MAGIC = b'JKDCIDX1'
+
+# magic, source size, source mtime (ns), entry count
+INDEX_HEADER = struct.Struct('<8sQqI')
+
+# concept number, byte offset of the text, byte length of the text
+INDEX_ENTRY = struct.Struct('<IQI')
+
+
+def scan_sections(path):
+    """Return [(concept_number, offset, length)] for a concept source file"""
+    entries = []
+    current = None
+    offset = 0
+    with open(path, 'rb') as file:
+        for line in file:
+            if line.startswith(SECTION_MARKER):
+                if current is not None:
+                    entries.append((current[0], current[1], offset - current[1]))
+                current = (int(line[len(SECTION_MARKER):]), offset + len(line))
+            offset += len(line)
+    if current is not None:
+        entries.append((current[0], current[1], offset - current[1]))
+    return entries
+
+
+def index_path_for(path):
+    path = Path(path)
+    return path.parent / ".cache" / f"{path.stem}.idx"
+
+
+def load_index(path):
+    """Read a source file's offset index, rebuilding it when the file changed"""
+    path = Path(path)
+    stat = path.stat()
+    index_path = index_path_for(path)
+    try:
+        data = index_path.read_bytes()
+        magic, size, mtime_ns, count = INDEX_HEADER.unpack_from(data)
+        if (magic == INDEX_MAGIC and size == stat.st_size and mtime_ns == stat.st_mtime_ns
+                and len(data) == INDEX_HEADER.size + count * INDEX_ENTRY.size):
+            return list(INDEX_ENTRY.iter_unpack(data[INDEX_HEADER.size:]))
+    except (OSError, struct.error):
+        pass
+
+    entries = scan_sections(path)
+    data = INDEX_HEADER.pack(INDEX_MAGIC, stat.st_size, stat.st_mtime_ns, len(entries))
+    data += b''.join(INDEX_ENTRY.pack(*entry) for entry in entries)
+    try:
+        index_path.parent.mkdir(parents=True, exist_ok=True)
+        index_path.write_bytes(data)
+    except OSError:
+        pass  # Read-only install: rescan next time
+    return entries
+
+
+class ConceptStore(Mapping):
+    """Read-only mapping of concept number to source text
+
+    Nothing is read at construction. The first lookup loads the offset index
+    of every source file; each text is then read with a single seek and kept
+    in a small LRU cache.
+    """
+
+    def __init__(self, directory=DEFAULT_CONCEPTS_DIR, cache_size=8):
+        self.directory = Path(directory)
+        self._locations = None
+        self._read = lru_cache(maxsize=cache_size)(self._read_text)
+
+    @property
+    def locations(self):
+        """{concept_number: (path, offset, length)}, loaded on first use"""
+        if self._locations is None:
+            locations = {}
+            for path in sorted(self.directory.glob('*.txt')):
+                for number, offset, length in load_index(path):
+                    locations[number] = (path, offset, length)
+            self._locations = locations
+        return self._locations
+
+    def _read_text(self, concept_number):
+        path, offset, length = self.locations[concept_number]
+        with open(path, 'rb') as file:
+            file.seek(offset)
+            data = file.read(length)
+        # Drop the newline that separates this section from the next marker
+        return data.decode('utf-8').removesuffix('\n')
+
+    def __getitem__(self, concept_number):
+        if concept_number not in self.locations:
+            raise KeyError(concept_number)
+        return self._read(concept_number)
+
+    def __contains__(self, concept_number):
+        return concept_number in self.locations
+
+    def __iter__(self):
+        return iter(sorted(self.locations))
+
+    def __len__(self):
+        return len(self.locations)
+
+    def reload(self):
+        """Forget the index and cached texts so edited files are picked up"""
+        self._locations = None
+        self._read.cache_clear()
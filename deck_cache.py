@@ -0,0 +1,295 @@
+#!/usr/bin/env python3
+"""
+Compiled Deck Cache
+Builds a binary image of a flashcard CSV once and memory-maps it on later launches
+"""
+
+import argparse
+import csv
+import hashlib
+import json
+import mmap
+import os
+import struct
+import sys
+import time
+import warnings
+from pathlib import Path
+
+import deck_validator
+import distractors
+import near_duplicates
+from card_store import CardStore, OFFSETS_PER_CARD
+
+
+MAGIC = b'JKDDECK\0'
+FORMAT_VERSION = 3
+
+# Bump whenever read_rows() changes what a deck compiles to (validation,
+# generated wrong answers, warnings), so images built before are rebuilt
+PIPELINE_VERSION = 3
+
+# magic, format version, source size, source mtime (ns), source sha256,
+# pipeline version, card count, table bytes, pool bytes
+HEADER = struct.Struct('<8sIQq32sIQQQ')
+
+ALIGNMENT = 8
+
+
+class DeckCacheError(Exception):
+    """Raised when a compiled deck is missing, stale or corrupt"""
+
+
+def default_cache_path(csv_path):
+    """Location of the compiled image for a deck CSV"""
+    csv_path = Path(csv_path)
+    return csv_path.parent / ".cache" / f"{csv_path.stem}.deck"
+
+
+def file_digest(path):
+    """SHA-256 of a file's contents"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.digest()
+
+
+def read_rows(csv_path):
+    """Card rows of a deck CSV as dicts, with any missing wrong answers generated
+
+    Rows that can't be loaded are left out with a warning, and near-duplicate
+    cards or near-copied wrong answers are pointed out with another.
+    """
+    skipped = []
+    near_copies = []
+    with open(csv_path, 'r', encoding='utf-8', newline='') as file:
+        rows = list(deck_validator.usable_rows(csv.DictReader(file), skipped, near_copies))
+    if skipped:
+        warnings.warn(deck_validator.skipped_message(skipped))
+    duplicates = near_duplicates.deck_warning(rows, near_copies)
+    if duplicates:
+        warnings.warn(duplicates)
+
+    if any(distractors.weak_slots(row) for row in rows):
+        try:
+            rows = distractors.fill_distractors(rows, distractors.default_cache_path(csv_path))
+        except ImportError as error:
+            warnings.warn(f"Cards with missing wrong answers left as-is: {error}")
+    return rows
+
+
+def read_deck(csv_path):
+    """Parse a deck CSV into a CardStore (see read_rows)"""
+    return CardStore.from_rows(read_rows(csv_path))
+
+
+def _padding(length):
+    return -length % ALIGNMENT
+
+
+def compile_deck(csv_path, cache_path=None):
+    """Parse a deck CSV and write its compiled image, returning the store"""
+    csv_path = Path(csv_path)
+    cache_path = Path(cache_path) if cache_path else default_cache_path(csv_path)
+
+    stat = csv_path.stat()
+    digest = file_digest(csv_path)
+    # Kept in the image so `deck_cache.py --warnings` can repeat them
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter('always')
+        store = read_deck(csv_path)
+    messages = [str(warning.message) for warning in caught]
+    for message in messages:
+        warnings.warn(message)
+
+    table = json.dumps({
+        'byteorder': sys.byteorder,
+        'concepts': list(zip(store.concept_numbers, store.concept_names)),
+        'question_types': store.question_types,
+        'warnings': messages,
+    }).encode('utf-8')
+    header = HEADER.pack(
+        MAGIC, FORMAT_VERSION, stat.st_size, stat.st_mtime_ns, digest, PIPELINE_VERSION,
+        len(store), len(table), len(store.pool)
+    )
+
+    cache_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = cache_path.with_name(cache_path.name + f".{os.getpid()}.tmp")
+    with open(tmp_path, 'wb') as file:
+        sections = (header, table, store.concept_ids, store.type_ids, store.offsets,
+                    store.card_keys(), store.pool)
+        for section in sections:
+            data = section if isinstance(section, (bytes, bytearray)) else section.tobytes()
+            file.write(data)
+            file.write(b'\0' * _padding(len(data)))
+    os.replace(tmp_path, cache_path)
+    return store
+
+
+def open_compiled(cache_path, csv_path=None):
+    """Memory-map a compiled deck and return a CardStore over it
+
+    When `csv_path` is given the image must have been built from the file's
+    current contents. Raises DeckCacheError if the image can't be used.
+    """
+    return _open_compiled(cache_path, csv_path)[0]
+
+
+def _open_compiled(cache_path, csv_path=None):
+    """open_compiled(), plus the warnings recorded when the image was built"""
+    try:
+        file = open(cache_path, 'rb')
+    except FileNotFoundError:
+        raise DeckCacheError(f"No compiled deck at {cache_path}") from None
+
+    with file:
+        raw = file.read(HEADER.size)
+        if len(raw) < HEADER.size:
+            raise DeckCacheError("Compiled deck header is truncated")
+        (magic, version, source_size, source_mtime_ns, digest, pipeline,
+         count, table_len, pool_len) = HEADER.unpack(raw)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise DeckCacheError("Compiled deck has an unknown format")
+        if pipeline != PIPELINE_VERSION:
+            raise DeckCacheError("Compiled deck was built by an older version of the loader")
+        if csv_path is not None:
+            _check_fresh(cache_path, csv_path, source_size, source_mtime_ns, digest)
+
+        sizes = [table_len, count * 4, count * 4, count * OFFSETS_PER_CARD * 8, count * 8, pool_len]
+        expected = HEADER.size + _padding(HEADER.size)
+        expected += sum(size + _padding(size) for size in sizes)
+        if os.fstat(file.fileno()).st_size != expected:
+            raise DeckCacheError("Compiled deck size doesn't match its header")
+        mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    view = memoryview(mapped)
+    sections = []
+    position = HEADER.size + _padding(HEADER.size)
+    for size in sizes:
+        sections.append(view[position:position + size])
+        position += size + _padding(size)
+    table_view, concept_ids, type_ids, offsets, keys, pool = sections
+
+    try:
+        table = json.loads(str(table_view, 'utf-8'))
+    except ValueError:
+        raise DeckCacheError("Compiled deck tables are corrupt") from None
+    if table.get('byteorder') != sys.byteorder:
+        raise DeckCacheError("Compiled deck was built on a machine with another byte order")
+
+    offsets = offsets.cast('Q')
+    if count and offsets[-1] != pool_len:
+        raise DeckCacheError("Compiled deck offsets are corrupt")
+    store = CardStore.from_columns(
+        [tuple(concept) for concept in table['concepts']],
+        table['question_types'],
+        concept_ids.cast('I'),
+        type_ids.cast('I'),
+        offsets,
+        pool,
+        keys.cast('Q')
+    )
+    return store, table.get('warnings', [])
+
+
+def _check_fresh(cache_path, csv_path, source_size, source_mtime_ns, digest):
+    """Compare the recorded source key against the CSV on disk"""
+    stat = Path(csv_path).stat()
+    if stat.st_size != source_size:
+        raise DeckCacheError("Deck CSV changed size since it was compiled")
+    if stat.st_mtime_ns == source_mtime_ns:
+        return
+    # Touched but maybe not edited: fall back to the content hash
+    if file_digest(csv_path) != digest:
+        raise DeckCacheError("Deck CSV changed since it was compiled")
+    try:
+        with open(cache_path, 'r+b') as file:
+            file.seek(struct.calcsize('<8sIQ'))
+            file.write(struct.pack('<q', stat.st_mtime_ns))
+    except OSError:
+        pass  # Read-only install: the image is still current, hash again next time
+
+
+def load_deck(csv_path, cache_path=None):
+    """Open the compiled deck for a CSV, rebuilding it if stale or corrupt
+
+    Warnings about the deck's rows are given when it is compiled (or read
+    from the CSV), not on every cached load.
+    """
+    cache_path = Path(cache_path) if cache_path else default_cache_path(csv_path)
+    try:
+        return open_compiled(cache_path, csv_path)
+    except (DeckCacheError, OSError):
+        pass
+    try:
+        compile_deck(csv_path, cache_path)
+        return open_compiled(cache_path, csv_path)
+    except OSError:
+        # Read-only install or similar: serve the deck straight from the CSV
+        return read_deck(csv_path)
+
+
+def timing_report(csv_path, cache_path=None, repeat=5):
+    """Time cold (parse and compile) against warm (mmap) deck loads"""
+    cache_path = Path(cache_path) if cache_path else default_cache_path(csv_path)
+
+    def best(func):
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            store = func()
+            # Touch one card so warm loads pay for the page they actually use
+            store.options(len(store) // 2)
+            times.append(time.perf_counter() - start)
+        return min(times), len(store)
+
+    def parse_csv():
+        with open(csv_path, 'r', encoding='utf-8', newline='') as file:
+            return CardStore.from_rows(csv.DictReader(file))
+
+    csv_time, count = best(parse_csv)
+    cold_time, _ = best(lambda: compile_deck(csv_path, cache_path))
+    warm_time, _ = best(lambda: open_compiled(cache_path, csv_path))
+    return {
+        'cards': count,
+        'csv_parse_seconds': csv_time,
+        'cold_start_seconds': cold_time,
+        'warm_start_seconds': warm_time,
+        'speedup': csv_time / warm_time if warm_time else float('inf'),
+    }
+
+
+def main():
+    from quiz_engine import DEFAULT_DECK_PATH
+
+    parser = argparse.ArgumentParser(description="Compile a flashcard deck into a memory-mapped cache")
+    parser.add_argument('--deck', default=str(DEFAULT_DECK_PATH), help="flashcard CSV file")
+    parser.add_argument('--cache', help="compiled deck path (default: data/.cache/<deck>.deck)")
+    parser.add_argument('--report', action='store_true', help="print a cold vs. warm start timing report")
+    parser.add_argument('--warnings', action='store_true',
+                        help="print the warnings recorded when the deck was last compiled")
+    args = parser.parse_args()
+
+    if args.warnings:
+        try:
+            _, messages = _open_compiled(args.cache or default_cache_path(args.deck), args.deck)
+        except (DeckCacheError, OSError) as error:
+            sys.exit(f"{error}; run without --warnings to compile the deck")
+        print('\n'.join(messages) if messages else "No warnings")
+        return
+
+    if args.report:
+        report = timing_report(args.deck, args.cache)
+        print(f"Cards:              {report['cards']:,}")
+        print(f"CSV parse:          {report['csv_parse_seconds'] * 1000:.2f} ms")
+        print(f"Cold start (build): {report['cold_start_seconds'] * 1000:.2f} ms")
+        print(f"Warm start (mmap):  {report['warm_start_seconds'] * 1000:.2f} ms")
+        print(f"Warm vs. CSV:       {report['speedup']:.1f}x faster")
+    else:
+        store = compile_deck(args.deck, args.cache)
+        print(f"Compiled {len(store):,} cards to {args.cache or default_cache_path(args.deck)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,350 @@
+#!/usr/bin/env python3
+"""
+Deck Library
+Every deck under data/, indexed by header at startup and loaded on first use
+"""
+
+import argparse
+import json
+import warnings
+from array import array
+from bisect import bisect_right
+from collections import OrderedDict, namedtuple
+from pathlib import Path
+
+from concept_store import ConceptStore
+from deck_cache import load_deck
+from quiz_engine import DEFAULT_DECK_PATH, Deck
+
+
+DEFAULT_DATA_DIR = Path(__file__).parent / "data"
+
+LIBRARY_INDEX_VERSION = 1
+
+# Bytes of card data kept loaded before least recently used decks are dropped
+DEFAULT_MEMORY_BUDGET = 256 << 20
+
+# Folders under data/ that never hold decks
+SKIPPED_DIRS = ('progress', 'concepts')
+
+# What the library knows about a deck without loading its cards.
+# `concepts` is a tuple of (number, name) pairs, `size`/`mtime_ns` identify
+# the CSV the entry was read from.
+DeckInfo = namedtuple('DeckInfo', 'name path cards concepts question_types size mtime_ns')
+
+
+def discover_decks(directory=DEFAULT_DATA_DIR):
+    """Deck CSV files under directory, skipping hidden and progress folders"""
+    directory = Path(directory)
+    found = []
+    for path in directory.rglob('*.csv'):
+        parts = path.relative_to(directory).parts[:-1]
+        if any(part.startswith('.') or part in SKIPPED_DIRS for part in parts):
+            continue
+        found.append(path)
+    return sorted(found)
+
+
+def deck_name(path, directory=DEFAULT_DATA_DIR):
+    """Library name of a deck: its path under data/ without the extension"""
+    return Path(path).relative_to(directory).with_suffix('').as_posix()
+
+
+DEFAULT_DECK_NAME = deck_name(DEFAULT_DECK_PATH)
+
+
+def read_info(path, name):
+    """Header of one deck, read from its compiled image (built if needed)"""
+    stat = Path(path).stat()
+    store = load_deck(path)
+    concepts = tuple(zip(store.concept_numbers, store.concept_names))
+    return DeckInfo(name, str(path), len(store), concepts, tuple(store.question_types),
+                    stat.st_size, stat.st_mtime_ns)
+
+
+class DeckLibrary:
+    """All installed decks, their headers and a concept index shared between them
+
+    Startup reads one index file and stats each deck CSV; only decks that
+    are new or changed are opened to refresh their headers. Card data is
+    loaded by load() and the least recently used decks are dropped once
+    the loaded decks exceed `memory_budget` bytes. concept_index maps a
+    concept number to the decks that teach it, so a session over any set
+    of concepts finds its decks without opening the others.
+    """
+
+    def __init__(self, directory=DEFAULT_DATA_DIR, memory_budget=DEFAULT_MEMORY_BUDGET,
+                 index_path=None):
+        self.directory = Path(directory)
+        self.memory_budget = memory_budget
+        self.index_path = Path(index_path) if index_path else self.directory / ".cache" / "library.json"
+        self.concepts = ConceptStore(self.directory / "concepts")
+        self.decks = {}            # name -> DeckInfo
+        self.concept_index = {}    # concept number -> tuple of deck names
+        self.concept_names = {}    # concept number -> name
+        self._loaded = OrderedDict()
+        self.refresh()
+
+    def refresh(self):
+        """Rediscover decks, reusing index entries whose CSV hasn't changed"""
+        try:
+            saved = json.loads(self.index_path.read_text(encoding='utf-8'))
+            if saved.get('version') != LIBRARY_INDEX_VERSION:
+                saved = {}
+        except (OSError, ValueError):
+            saved = {}
+        known = {
+            entry['name']: DeckInfo(
+                entry['name'], entry['path'], entry['cards'],
+                tuple(tuple(concept) for concept in entry['concepts']),
+                tuple(entry['question_types']), entry['size'], entry['mtime_ns']
+            )
+            for entry in saved.get('decks', ())
+        }
+
+        decks = {}
+        changed = False
+        for path in discover_decks(self.directory):
+            name = deck_name(path, self.directory)
+            stat = path.stat()
+            info = known.get(name)
+            if info is None or (info.size, info.mtime_ns) != (stat.st_size, stat.st_mtime_ns):
+                try:
+                    info = read_info(path, name)
+                except (OSError, ValueError, KeyError) as error:
+                    warnings.warn(f"Skipping deck {name}: {error}")
+                    continue
+                self._loaded.pop(name, None)
+                changed = True
+            decks[name] = info._replace(path=str(path))
+        changed = changed or decks.keys() != known.keys()
+
+        self.decks = decks
+        self._build_concept_index()
+        if changed:
+            self._save_index()
+
+    def _build_concept_index(self):
+        index = {}
+        self.concept_names = {}
+        for name, info in self.decks.items():
+            for number, concept_name in info.concepts:
+                index.setdefault(number, []).append(name)
+                self.concept_names.setdefault(number, concept_name)
+        self.concept_index = {number: tuple(names) for number, names in index.items()}
+
+    def _save_index(self):
+        data = {
+            'version': LIBRARY_INDEX_VERSION,
+            'decks': [info._asdict() for info in self.decks.values()],
+        }
+        try:
+            self.index_path.parent.mkdir(parents=True, exist_ok=True)
+            self.index_path.write_text(json.dumps(data), encoding='utf-8')
+        except OSError:
+            pass  # Read-only install: rebuild the headers next time
+
+    def __contains__(self, name):
+        return name in self.decks
+
+    def __iter__(self):
+        return iter(self.decks)
+
+    def __len__(self):
+        return len(self.decks)
+
+    def load(self, name):
+        """The Deck called `name`, loading its cards if they aren't already"""
+        deck = self._loaded.get(name)
+        if deck is not None:
+            self._loaded.move_to_end(name)
+            return deck
+        deck = Deck.load(self.decks[name].path)
+        self._loaded[name] = deck
+        self._evict()
+        return deck
+
+    def _evict(self):
+        """Drop least recently used decks while over budget, keeping the newest"""
+        while len(self._loaded) > 1 and self.memory_in_use > self.memory_budget:
+            self._loaded.popitem(last=False)
+
+    @property
+    def memory_in_use(self):
+        return sum(deck.cards.nbytes for deck in self._loaded.values())
+
+    @property
+    def loaded(self):
+        """Names of the decks whose cards are loaded, least recently used first"""
+        return list(self._loaded)
+
+    def decks_for(self, concepts):
+        """Names of the decks that teach any of the concept numbers, sorted
+
+        Only the concept index is consulted, so this doesn't grow with the
+        number of installed decks.
+        """
+        wanted = set()
+        for number in concepts:
+            wanted.update(self.concept_index.get(int(number), ()))
+        return sorted(wanted)
+
+    def session_deck(self, names=None, concepts=None):
+        """A Deck over the named decks, or those teaching `concepts`
+
+        One deck is returned as loaded. Several are chained without loading
+        any of them; each is loaded when one of its cards is first read.
+        """
+        if names is None:
+            names = self.decks_for(concepts) if concepts is not None else list(self.decks)
+        names = list(names)
+        for name in names:
+            if name not in self.decks:
+                raise KeyError(f"No deck named {name!r}")
+        if not names:
+            raise ValueError("No decks selected")
+        if len(names) == 1:
+            return self.load(names[0])
+        return Deck(ChainedCardStore(self, names))
+
+
+class ChainedCardStore:
+    """The cards of several library decks, numbered one after another
+
+    Card counts come from the library's headers, so the store is built
+    without loading any deck. Reading a card loads its deck through the
+    library. The merged concept/type columns used by analytics are built
+    on first use and load every deck.
+    """
+
+    def __init__(self, library, names):
+        self.library = library
+        self.names = tuple(names)
+        self.starts = [0]
+        for name in self.names:
+            self.starts.append(self.starts[-1] + library.decks[name].cards)
+        self._columns = None
+        self._keys = None
+
+    def __len__(self):
+        return self.starts[-1]
+
+    def _locate(self, index):
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("card index out of range")
+        position = bisect_right(self.starts, index) - 1
+        return self.library.load(self.names[position]).cards, index - self.starts[position]
+
+    def __getitem__(self, index):
+        store, local = self._locate(index)
+        return store[local]
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+    def text(self, index, position):
+        store, local = self._locate(index)
+        return store.text(local, position)
+
+    def options(self, index):
+        store, local = self._locate(index)
+        return store.options(local)
+
+    def concept_number(self, index):
+        store, local = self._locate(index)
+        return store.concept_number(local)
+
+    def concept_name(self, index):
+        store, local = self._locate(index)
+        return store.concept_name(local)
+
+    def question_type(self, index):
+        store, local = self._locate(index)
+        return store.question_type(local)
+
+    def row(self, index):
+        store, local = self._locate(index)
+        return store.row(local)
+
+    @property
+    def nbytes(self):
+        return self.library.memory_in_use
+
+    def card_keys(self):
+        """Each deck's CardStore.card_keys() in chain order; loads every deck"""
+        if self._keys is None:
+            keys = array('Q')
+            for name in self.names:
+                keys.extend(self.library.load(name).cards.card_keys())
+            self._keys = keys
+        return self._keys
+
+    def _merged_columns(self):
+        if self._columns is None:
+            concept_lookup, type_lookup = {}, {}
+            concept_numbers, concept_names, question_types = [], [], []
+            concept_ids, type_ids = array('I'), array('I')
+            for name in self.names:
+                store = self.library.load(name).cards
+                concept_map = []
+                for number, concept_name in zip(store.concept_numbers, store.concept_names):
+                    key = (number, concept_name)
+                    if key not in concept_lookup:
+                        concept_lookup[key] = len(concept_numbers)
+                        concept_numbers.append(number)
+                        concept_names.append(concept_name)
+                    concept_map.append(concept_lookup[key])
+                type_map = []
+                for question_type in store.question_types:
+                    if question_type not in type_lookup:
+                        type_lookup[question_type] = len(question_types)
+                        question_types.append(question_type)
+                    type_map.append(type_lookup[question_type])
+                concept_ids.extend(concept_map[i] for i in store.concept_ids)
+                type_ids.extend(type_map[i] for i in store.type_ids)
+            self._columns = (concept_numbers, concept_names, question_types, concept_ids, type_ids)
+        return self._columns
+
+    @property
+    def concept_numbers(self):
+        return self._merged_columns()[0]
+
+    @property
+    def concept_names(self):
+        return self._merged_columns()[1]
+
+    @property
+    def question_types(self):
+        return self._merged_columns()[2]
+
+    @property
+    def concept_ids(self):
+        return self._merged_columns()[3]
+
+    @property
+    def type_ids(self):
+        return self._merged_columns()[4]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="List the decks installed under data/")
+    parser.add_argument('--data', default=str(DEFAULT_DATA_DIR), help="library folder")
+    parser.add_argument('--concept', type=int, action='append',
+                        help="only decks teaching this concept (repeatable)")
+    args = parser.parse_args()
+
+    library = DeckLibrary(args.data)
+    names = library.decks_for(args.concept) if args.concept else list(library)
+    for name in names:
+        info = library.decks[name]
+        numbers = [number for number, _ in info.concepts]
+        span = f"concepts {min(numbers)}-{max(numbers)}" if numbers else "no concepts"
+        print(f"{name:<32} {info.cards:>6} cards  {span}")
+    print(f"{len(names)} of {len(library)} decks, {len(library.concept_index)} concepts")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,428 @@
+#!/usr/bin/env python3
+"""
+Deck Validator
+Checks a flashcard CSV row by row across a process pool and reports every problem found
+"""
+
+import argparse
+import csv
+import io
+import json
+import os
+import re
+import sys
+import time
+from collections import namedtuple
+
+from card_store import CARD_FIELDS
+from distractors import WRONG_FIELDS
+from near_duplicates import near_copies
+
+
+Issue = namedtuple('Issue', 'line severity code field message')
+
+REQUIRED_FIELDS = ('concept_number', 'concept_name', 'question_type', 'question_text', 'correct_answer')
+
+# Problems that make a row unloadable; the deck loader skips these rows.
+# Everything else is either fixed on load or only affects question quality.
+MALFORMED = frozenset(('encoding', 'columns', 'missing_field', 'bad_concept_number'))
+
+# Raw bytes handed to a worker at a time
+CHUNK_BYTES = 4 << 20
+
+# Issues of each kind kept in the report; the rest are only counted
+SAMPLES_PER_CODE = 20
+
+
+# Required columns as positions in CARD_FIELDS order
+_REQUIRED_POSITIONS = tuple(CARD_FIELDS.index(field) for field in REQUIRED_FIELDS)
+
+# Answers are normalised four at a time: joined with a separator the
+# pattern keeps, every other run of non-token characters becomes a space
+_ANSWER_SEPARATOR = '\x00'
+_NOT_TOKEN = re.compile(r"[^a-z0-9\x00]+")
+
+
+# ASCII text takes a faster path: one bytes.translate lower-cases letters
+# and blanks everything else but digits and the separator
+_ASCII_TOKENS = bytes(
+    byte + 32 if 65 <= byte <= 90 else byte if 97 <= byte <= 122 or 48 <= byte <= 57 or byte == 0
+    else 32
+    for byte in range(256)
+)
+
+
+def _normalized_answers(answers):
+    """normalize_answer() for the correct answer and the wrong answers at once"""
+    joined = _NOT_TOKEN.sub(' ', _ANSWER_SEPARATOR.join(answers).lower())
+    return [answer.strip(' ') for answer in joined.split(_ANSWER_SEPARATOR)]
+
+
+def _options_distinct(answers):
+    """Whether all four options are non-empty and different once normalised"""
+    joined = _ANSWER_SEPARATOR.join(answers)
+    if joined.isascii():
+        options = [
+            tuple(option.split())
+            for option in joined.encode('ascii').translate(_ASCII_TOKENS).split(b'\0')
+        ]
+    else:
+        options = _normalized_answers(answers)
+    return all(options) and len(set(options)) == len(answers)
+
+
+def check_card(values, line=None, known_concepts=None):
+    """Return the Issues for one card given its values in CARD_FIELDS order
+
+    `known_concepts`, when given, is the set of concept numbers that have
+    source material.
+    """
+    issues = []
+    for position in _REQUIRED_POSITIONS:
+        value = values[position]
+        if not value or value.isspace():
+            field = CARD_FIELDS[position]
+            issues.append(Issue(line, 'error', 'missing_field', field, f"{field} is empty"))
+    if issues:
+        return issues
+
+    number = values[0]
+    try:
+        concept_number = int(number)
+    except ValueError:
+        issues.append(Issue(line, 'error', 'bad_concept_number', 'concept_number',
+                            f"concept_number {number!r} is not an integer"))
+    else:
+        if known_concepts is not None and concept_number not in known_concepts:
+            issues.append(Issue(line, 'error', 'unknown_concept', 'concept_number',
+                                f"No source material for concept {concept_number}"))
+
+    correct, *wrong = _normalized_answers(values[4:8])
+    issues.extend(
+        Issue(line, 'warning', 'near_copy_option', field,
+              f"{field} nearly repeats the correct answer ({similarity:.0%} alike)")
+        for field, similarity in near_copies(correct, wrong)
+    )
+    if _options_distinct(values[4:8]):
+        return issues
+
+    # Something is off among the options; work out what
+    if not correct:
+        issues.append(Issue(line, 'error', 'indistinct_answer', 'correct_answer',
+                            "correct_answer has no letters or digits to tell it apart"))
+    seen = {}
+    for field, answer in zip(WRONG_FIELDS, wrong):
+        if not answer:
+            issues.append(Issue(line, 'warning', 'missing_wrong_answer', field, f"{field} is empty"))
+        elif answer == correct:
+            issues.append(Issue(line, 'error', 'indistinct_answer', field,
+                                f"{field} is the same as the correct answer"))
+        elif answer in seen:
+            issues.append(Issue(line, 'warning', 'duplicate_option', field,
+                                f"{field} repeats {seen[answer]}"))
+        else:
+            seen[answer] = field
+    return issues
+
+
+def check_row(row, line=None, known_concepts=None):
+    """check_card() for a csv.DictReader or JSON row"""
+    if None in row:
+        return [Issue(line, 'error', 'columns', None,
+                      f"{len(row[None])} more values than there are columns")]
+    values = [row.get(field) for field in CARD_FIELDS]
+    return check_card(['' if value is None else str(value) for value in values], line, known_concepts)
+
+
+def usable_rows(rows, skipped, near_copies=None):
+    """Yield the rows that can be loaded, adding Issues for the others to `skipped`
+
+    Rows from a csv.DictReader are reported by line, other rows by position.
+    near_copy_option Issues of loaded rows go to `near_copies` when given.
+    """
+    for number, row in enumerate(rows, 1):
+        line = getattr(rows, 'line_num', number)
+        issues = check_row(row, line)
+        malformed = [issue for issue in issues if issue.code in MALFORMED]
+        if malformed:
+            skipped.extend(malformed)
+            continue
+        if near_copies is not None:
+            near_copies.extend(issue for issue in issues if issue.code == 'near_copy_option')
+        yield row
+
+
+def skipped_message(skipped, limit=5):
+    """Human-readable summary of the rows usable_rows() left out"""
+    lines = {issue.line for issue in skipped}
+    details = [f"line {issue.line}: {issue.message}" for issue in skipped[:limit]]
+    if len(skipped) > limit:
+        details.append(f"... and {len(skipped) - limit} more")
+    return f"Skipped {len(lines)} card row(s) that could not be loaded\n" + '\n'.join(details)
+
+
+def _split_records(data, quotes_before=0):
+    """Position just past the last newline in data that ends a CSV record
+
+    A newline ends a record when an even number of quote characters
+    precede it. Returns -1 when the data holds no complete record.
+    """
+    end = len(data)
+    while True:
+        newline = data.rfind(b'\n', 0, end)
+        if newline < 0:
+            return -1
+        if (quotes_before + data.count(b'"', 0, newline)) % 2 == 0:
+            return newline + 1
+        end = newline
+
+
+def read_chunks(csv_path, chunk_bytes=CHUNK_BYTES):
+    """Yield the header then (first line number, raw bytes) chunks of whole records"""
+    with open(csv_path, 'rb') as file:
+        buffer = file.read(chunk_bytes)
+        if buffer.startswith(b'\xef\xbb\xbf'):
+            buffer = buffer[3:]
+        end = buffer.find(b'\n')
+        header_line = buffer if end < 0 else buffer[:end]
+        yield next(csv.reader([header_line.decode('utf-8', 'replace')]), [])
+        buffer = b'' if end < 0 else buffer[end + 1:]
+
+        line = 2
+        while True:
+            data = file.read(chunk_bytes)
+            buffer += data
+            split = _split_records(buffer) if data else len(buffer)
+            if split > 0:
+                chunk = buffer[:split]
+                yield line, chunk
+                line += chunk.count(b'\n')
+                buffer = buffer[split:]
+            if not data:
+                return
+
+
+_known_concepts = None
+
+
+def _init_worker(known_concepts):
+    global _known_concepts
+    _known_concepts = known_concepts
+
+
+def validate_chunk(header, first_line, data, keep_valid=False, known_concepts=None):
+    """Validate raw CSV records
+
+    Returns (row count, issues, {(concept_number, concept_name)}, valid rows
+    as CSV text or None).
+    """
+    if known_concepts is None:
+        known_concepts = _known_concepts
+    try:
+        text = data.decode('utf-8')
+        damaged = False
+    except UnicodeDecodeError:
+        text = data.decode('utf-8', 'replace')
+        damaged = True
+
+    # Map file columns onto CARD_FIELDS order unless they already match
+    width = len(header)
+    positions = None
+    if tuple(header) != CARD_FIELDS:
+        positions = [header.index(field) if field in header else None for field in CARD_FIELDS]
+
+    reader = csv.reader(io.StringIO(text, newline=''))
+    output = io.StringIO() if keep_valid else None
+    writer = csv.writer(output) if keep_valid else None
+    issues = []
+    concept_names = set()
+    rows = 0
+    line_offset = first_line - 1
+    end_line = 0
+    for values in reader:
+        line = line_offset + end_line + 1
+        end_line = reader.line_num
+        if not values:
+            continue
+        rows += 1
+        if damaged and any('\ufffd' in value for value in values):
+            issues.append(Issue(line, 'error', 'encoding', None, "Row is not valid UTF-8"))
+            continue
+        if len(values) != width:
+            issues.append(Issue(line, 'error', 'columns', None,
+                                f"{len(values)} values for {width} columns"))
+            continue
+        card = values if positions is None else [
+            '' if position is None else values[position] for position in positions
+        ]
+        row_issues = check_card(card, line, known_concepts)
+        if row_issues:
+            issues.extend(row_issues)
+            if any(issue.code in MALFORMED for issue in row_issues):
+                continue
+        concept_names.add((card[0].strip(), card[1]))
+        if writer is not None and not any(issue.severity == 'error' for issue in row_issues):
+            writer.writerow(values)
+    return rows, issues, concept_names, output.getvalue() if keep_valid else None
+
+
+class ValidationReport:
+    """Counts and sample issues from validating one deck"""
+
+    def __init__(self, path, samples_per_code=SAMPLES_PER_CODE):
+        self.path = str(path)
+        self.samples_per_code = samples_per_code
+        self.rows = 0
+        self.rows_with_errors = 0
+        self.counts = {}
+        self.samples = {}
+        self.concept_names = {}
+        self.elapsed = 0.0
+
+    @property
+    def errors(self):
+        return sum(count for (severity, _), count in self.counts.items() if severity == 'error')
+
+    @property
+    def warnings(self):
+        return sum(count for (severity, _), count in self.counts.items() if severity == 'warning')
+
+    @property
+    def ok(self):
+        return not self.errors
+
+    def add(self, issue):
+        key = (issue.severity, issue.code)
+        self.counts[key] = self.counts.get(key, 0) + 1
+        samples = self.samples.setdefault(issue.code, [])
+        if len(samples) < self.samples_per_code:
+            samples.append(issue)
+
+    def add_chunk(self, rows, issues, concept_names):
+        self.rows += rows
+        self.rows_with_errors += len({issue.line for issue in issues if issue.severity == 'error'})
+        for issue in issues:
+            self.add(issue)
+        for number, name in concept_names:
+            self.concept_names.setdefault(number, set()).add(name)
+
+    def finish(self):
+        """Add deck-wide checks once every chunk is in"""
+        for number, names in sorted(self.concept_names.items(), key=lambda item: int(item[0])):
+            if len(names) > 1:
+                self.add(Issue(None, 'warning', 'concept_name_mismatch', 'concept_name',
+                               f"Concept {number} is named {', '.join(sorted(map(repr, names)))}"))
+
+    def to_dict(self):
+        return {
+            'path': self.path,
+            'rows': self.rows,
+            'valid_rows': self.rows - self.rows_with_errors,
+            'errors': self.errors,
+            'warnings': self.warnings,
+            'elapsed_seconds': self.elapsed,
+            'counts': [
+                {'severity': severity, 'code': code, 'count': count}
+                for (severity, code), count in sorted(self.counts.items())
+            ],
+            'issues': [issue._asdict() for samples in self.samples.values() for issue in samples],
+        }
+
+    def summary(self):
+        lines = [
+            f"{self.path}: {self.rows:,} rows, {self.rows - self.rows_with_errors:,} valid, "
+            f"{self.errors:,} errors, {self.warnings:,} warnings ({self.elapsed:.2f}s)"
+        ]
+        for (severity, code), count in sorted(self.counts.items()):
+            lines.append(f"  {severity:<7} {code:<22} {count:,}")
+            for issue in self.samples[code][:3]:
+                where = f"line {issue.line}" if issue.line else "deck"
+                lines.append(f"      {where}: {issue.message}")
+        return '\n'.join(lines)
+
+
+def validate_deck(csv_path, known_concepts=None, workers=None, output_path=None,
+                  chunk_bytes=CHUNK_BYTES):
+    """Validate a deck CSV, optionally writing its error-free rows to output_path
+
+    The file is streamed in chunks of whole records; chunks are checked in
+    `workers` processes (0 checks in this process) while the next ones are
+    read. Returns a ValidationReport.
+    """
+    start = time.perf_counter()
+    report = ValidationReport(csv_path)
+    if workers is None:
+        workers = os.cpu_count() or 1
+    chunks = read_chunks(csv_path, chunk_bytes)
+    header = next(chunks)
+    missing = [field for field in REQUIRED_FIELDS if field not in header]
+    if missing:
+        report.add(Issue(1, 'error', 'columns', None, f"Header is missing {', '.join(missing)}"))
+        report.elapsed = time.perf_counter() - start
+        return report
+
+    output = None
+    writer = None
+    if output_path is not None:
+        output = open(output_path, 'w', encoding='utf-8', newline='')
+        writer = csv.writer(output)
+        writer.writerow(header)
+    keep_valid = output is not None
+
+    def collect(result):
+        rows, issues, concept_names, valid = result
+        report.add_chunk(rows, issues, concept_names)
+        if output is not None:
+            output.write(valid)
+
+    try:
+        if workers == 0:
+            for first_line, data in chunks:
+                collect(validate_chunk(header, first_line, data, keep_valid, known_concepts))
+        else:
+            # Imported here: loading a deck only needs check_row(), not the pool
+            from concurrent.futures import ProcessPoolExecutor
+
+            # Keep a bounded number of chunks in flight and collect them in order
+            with ProcessPoolExecutor(workers, initializer=_init_worker,
+                                     initargs=(known_concepts,)) as pool:
+                pending = []
+                for first_line, data in chunks:
+                    pending.append(pool.submit(validate_chunk, header, first_line, data, keep_valid))
+                    if len(pending) >= workers * 2:
+                        collect(pending.pop(0).result())
+                for future in pending:
+                    collect(future.result())
+    finally:
+        if output is not None:
+            output.close()
+
+    report.finish()
+    report.elapsed = time.perf_counter() - start
+    return report
+
+
+def main():
+    from concept_store import ConceptStore
+    from quiz_engine import DEFAULT_DECK_PATH
+
+    parser = argparse.ArgumentParser(description="Validate a flashcard CSV deck")
+    parser.add_argument('deck', nargs='?', default=str(DEFAULT_DECK_PATH), help="flashcard CSV file")
+    parser.add_argument('-o', '--output', help="write rows without errors to this CSV")
+    parser.add_argument('--workers', type=int, help="validation processes (default: CPU count, 0 = none)")
+    parser.add_argument('--no-concepts', action='store_true',
+                        help="don't require source material for each concept")
+    parser.add_argument('--json', action='store_true', help="print the report as JSON")
+    args = parser.parse_args()
+
+    known_concepts = None if args.no_concepts else frozenset(ConceptStore())
+    report = validate_deck(args.deck, known_concepts, args.workers, args.output)
+    if args.json:
+        print(json.dumps(report.to_dict(), indent=2))
+    else:
+        print(report.summary())
+    sys.exit(0 if report.ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,236 @@
+"""
+Deck Watcher
+Polls a deck CSV and patches the loaded deck with the cards that changed
+"""
+
+import csv
+import hashlib
+import io
+import os
+import warnings
+from collections import namedtuple
+from pathlib import Path
+
+import deck_validator
+from card_store import TEXT_FIELDS
+
+
+# Seconds between stat() calls when driven by a UI timer
+POLL_INTERVAL = 1.0
+
+# Card indexes affected by one reload
+DeckChanges = namedtuple('DeckChanges', 'added changed removed')
+
+_QUESTION_POSITION = TEXT_FIELDS.index('question_text')
+
+
+def card_identity(concept_number, question_text):
+    """What makes two rows the same card across edits"""
+    return (int(concept_number), question_text.strip())
+
+
+def _numbered(identities):
+    """Tell repeated identities apart by how many times each came before"""
+    seen = {}
+    for identity in identities:
+        count = seen.get(identity, 0)
+        seen[identity] = count + 1
+        yield identity + (count,)
+
+
+def split_records(data):
+    """Header and raw body records of a CSV file, quoted newlines kept inside records"""
+    if data.startswith(b'\xef\xbb\xbf'):
+        data = data[3:]
+    records = []
+    pending = []
+    quotes = 0
+    for line in data.splitlines(keepends=True):
+        pending.append(line)
+        quotes += line.count(b'"')
+        if quotes % 2 == 0:
+            records.append(b''.join(pending))
+            pending = []
+            quotes = 0
+    if pending:
+        records.append(b''.join(pending))
+    records = [record for record in records if record.strip()]
+    if not records:
+        return b'', []
+    return records[0], records[1:]
+
+
+def _record_hash(record):
+    return hashlib.blake2b(record.rstrip(b'\r\n'), digest_size=16).digest()
+
+
+def _parse(record):
+    return next(csv.reader(io.StringIO(record.decode('utf-8', 'replace'))), [])
+
+
+def _parse_all(records):
+    """Parse many records with one reader, one record at a time if they disagree"""
+    text = b''.join(record if record.endswith(b'\n') else record + b'\n' for record in records)
+    rows = list(csv.reader(io.StringIO(text.decode('utf-8', 'replace'))))
+    if len(rows) != len(records):
+        rows = [_parse(record) for record in records]
+    return rows
+
+
+class DeckWatcher:
+    """Keeps a loaded Deck (and its scheduler) in sync with the CSV on disk
+
+    poll() only stat()s the file. When it changed, the file is split into
+    raw records and each record is hashed; only records whose hash wasn't
+    seen last time are parsed as cards. Cards are matched by concept number
+    and question text, so editing a card's answers updates it in place,
+    while editing its question removes the old card and adds a new one.
+
+    Within a session card indexes never move, so the scheduler stays valid:
+    changed cards are rewritten in place, added cards are appended and
+    removed cards are retired from the scheduler but left in the store.
+    The next start loads the CSV afresh, in its new order; saved progress
+    is keyed by CardStore.card_keys(), which matches cards the same way,
+    so it is remapped onto the new indexes. Added cards with blank wrong
+    answers are only filled on the next start.
+    """
+
+    def __init__(self, csv_path, deck, scheduler=None):
+        self.csv_path = Path(csv_path)
+        self.deck = deck
+        self.scheduler = scheduler
+        self.removed = set()
+        self._stat = self._current_stat()
+
+        store = deck.cards
+        self.index_of = dict(zip(_numbered(
+            card_identity(store.concept_number(index), store.text(index, _QUESTION_POSITION))
+            for index in range(len(store))
+        ), range(len(store))))
+        self.header, records = split_records(self.csv_path.read_bytes())
+        self.fields = _parse(self.header)
+        self.hashes = {}        # numbered identity -> hash of its record
+        self.identity_of = {}   # record hash -> identity
+        concept_column = self.fields.index('concept_number')
+        question_column = self.fields.index('question_text')
+        identified = []
+        for record, values in zip(records, _parse_all(records)):
+            try:
+                identified.append((card_identity(values[concept_column], values[question_column]), record))
+            except (IndexError, ValueError):
+                continue
+        for key, (identity, record) in zip(_numbered(identity for identity, _ in identified), identified):
+            if key in self.index_of:
+                digest = _record_hash(record)
+                self.hashes[key] = digest
+                self.identity_of[digest] = identity
+
+    def _current_stat(self):
+        try:
+            stat = os.stat(self.csv_path)
+        except FileNotFoundError:
+            return None
+        return (stat.st_size, stat.st_mtime_ns)
+
+    def poll(self):
+        """Apply any edits since the last poll; returns DeckChanges or None"""
+        stat = self._current_stat()
+        if stat is None or stat == self._stat:
+            return None
+        self._stat = stat
+        return self.reload()
+
+    def reload(self):
+        """Diff the file against the deck and apply the difference"""
+        header, records = split_records(self.csv_path.read_bytes())
+        if header != self.header:
+            # New columns or column order: every record has to be parsed again
+            self.header = header
+            self.fields = _parse(header)
+            self.identity_of = {}
+
+        parsed = []     # (identity, digest, parsed row or None, raw record)
+        skipped = []
+        line = header.count(b'\n') + 1
+        for record in records:
+            digest = _record_hash(record)
+            identity = self.identity_of.get(digest)
+            row = None
+            if identity is None:
+                values = _parse(record)
+                row = dict(zip(self.fields, values))
+                if len(values) > len(self.fields):
+                    row[None] = values[len(self.fields):]
+                malformed = [
+                    issue for issue in deck_validator.check_row(row, line)
+                    if issue.code in deck_validator.MALFORMED
+                ]
+                line += record.count(b'\n')
+                if malformed:
+                    skipped.extend(malformed)
+                    continue
+                identity = card_identity(row['concept_number'], row['question_text'])
+            else:
+                line += record.count(b'\n')
+            parsed.append((identity, digest, row, record))
+        if skipped:
+            warnings.warn(deck_validator.skipped_message(skipped))
+
+        current = {}
+        rows = {}
+        identity_of = {}
+        for key, (identity, digest, row, record) in zip(_numbered(item[0] for item in parsed), parsed):
+            current[key] = digest
+            identity_of[digest] = identity
+            index = self.index_of.get(key)
+            if row is None and (index is None or index in self.removed or self.hashes.get(key) != digest):
+                # A known record that now lands on another card, e.g. a pasted duplicate
+                row = dict(zip(self.fields, _parse(record)))
+            if row is not None:
+                rows[key] = row
+
+        added, changed, removed = [], [], []
+        store = self._writable_store()
+        for identity, digest in current.items():
+            index = self.index_of.get(identity)
+            if index is None:
+                index = store.append(rows[identity])
+                self.index_of[identity] = index
+                added.append(index)
+            elif index in self.removed:
+                store.replace(index, rows[identity])
+                self.removed.discard(index)
+                added.append(index)
+            elif self.hashes.get(identity) != digest:
+                store.replace(index, rows[identity])
+                changed.append(index)
+        for identity in self.hashes:
+            if identity not in current:
+                index = self.index_of[identity]
+                self.removed.add(index)
+                removed.append(index)
+
+        self.hashes = current
+        self.identity_of = identity_of
+        self._update_scheduler(added, removed)
+        return DeckChanges(added, changed, removed)
+
+    def _writable_store(self):
+        """The deck's store, swapped for an in-memory copy if it is memory-mapped"""
+        store = self.deck.cards
+        if not hasattr(store.concept_ids, 'append'):
+            store = store.copy()
+            self.deck.cards = store
+        return store
+
+    def _update_scheduler(self, added, removed):
+        scheduler = self.scheduler
+        if scheduler is None:
+            return
+        new_cards = len(self.deck) - len(scheduler.due)
+        if new_cards > 0:
+            scheduler.add_cards(new_cards)
+        for index in added:
+            scheduler.reinstate(index)
+        for index in removed:
+            scheduler.retire(index)
@@ -0,0 +1,300 @@
+#!/usr/bin/env python3
+"""
+Distractor Generator
+Fills in missing or weak wrong answers with plausible answers from related cards
+
+Needs NumPy: cards are compared with hashed TF-IDF vectors and cosine
+similarity, computed a block of neighbouring concepts at a time.
+"""
+
+import argparse
+import csv
+import hashlib
+import json
+import re
+import zlib
+from pathlib import Path
+
+
+WRONG_FIELDS = ('wrong_answer_1', 'wrong_answer_2', 'wrong_answer_3')
+
+# Width of the hashed feature space
+FEATURE_DIMS = 2048
+
+# Concepts on either side of a card's own that may supply its distractors
+NEIGHBOR_SPAN = 2
+
+# Similarity given up per concept of distance, so nearer concepts win ties
+CONCEPT_DISTANCE_PENALTY = 0.05
+
+# Candidates considered per card before de-duplicating answers
+TOP_CANDIDATES = 32
+
+# Cards scored against a block in one matrix product
+TARGET_CHUNK = 512
+
+CACHE_VERSION = 1
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+
+def normalize_answer(text):
+    return ' '.join(_TOKEN.findall((text or '').lower()))
+
+
+def weak_slots(row):
+    """Wrong answer columns that are blank, repeat the correct answer or repeat each other"""
+    seen = {normalize_answer(row.get('correct_answer'))}
+    weak = []
+    for field in WRONG_FIELDS:
+        answer = normalize_answer(row.get(field))
+        if not answer or answer in seen:
+            weak.append(field)
+        else:
+            seen.add(answer)
+    return weak
+
+
+def _features(row):
+    """Hashed word and word-bigram features of a card's question and answer"""
+    words = _TOKEN.findall(f"{row['question_text']} {row['correct_answer']}".lower())
+    grams = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+    return [zlib.crc32(gram.encode('utf-8')) % FEATURE_DIMS for gram in grams]
+
+
+def _digest(*parts):
+    return hashlib.sha1('\x1f'.join(parts).encode('utf-8')).hexdigest()[:16]
+
+
+def _card_key(row):
+    return _digest(str(row['concept_number']), row['question_text'])
+
+
+def _card_hash(row):
+    return _digest(row['correct_answer'], *(row.get(field) or '' for field in WRONG_FIELDS))
+
+
+class DistractorGenerator:
+    """Batch TF-IDF similarity between cards in nearby concepts"""
+
+    def __init__(self, rows, neighbor_span=NEIGHBOR_SPAN):
+        try:
+            import numpy as np
+        except ImportError:
+            raise ImportError("Generating distractors requires NumPy: pip install numpy") from None
+        self.np = np
+        self.rows = rows
+        self.neighbor_span = neighbor_span
+        self.concepts = np.array([int(row['concept_number']) for row in rows], dtype=np.int64)
+        # Cards ordered by concept, so a block is found by binary search
+        self.by_concept = np.argsort(self.concepts, kind='stable')
+        self.sorted_concepts = self.concepts[self.by_concept]
+        self.answers = [normalize_answer(row['correct_answer']) for row in rows]
+        answer_ids = {}
+        self.answer_ids = np.array(
+            [answer_ids.setdefault(answer, len(answer_ids)) for answer in self.answers],
+            dtype=np.int64
+        )
+
+        # Sparse term counts in CSR layout, then global IDF weights
+        indptr = [0]
+        indices = []
+        for row in rows:
+            features = _features(row)
+            indices.extend(features)
+            indptr.append(len(indices))
+        self.indptr = np.array(indptr, dtype=np.int64)
+        self.indices = np.array(indices, dtype=np.int64)
+        doc_ids = np.repeat(np.arange(len(rows)), np.diff(self.indptr))
+        unique_pairs = np.unique(doc_ids * FEATURE_DIMS + self.indices)
+        document_frequency = np.bincount(unique_pairs % FEATURE_DIMS, minlength=FEATURE_DIMS)
+        self.idf = (np.log((1 + len(rows)) / (1 + document_frequency)) + 1).astype(np.float32)
+
+    def block(self, concept_number):
+        """One card per distinct answer among concepts within neighbor_span"""
+        np = self.np
+        low = np.searchsorted(self.sorted_concepts, concept_number - self.neighbor_span, 'left')
+        high = np.searchsorted(self.sorted_concepts, concept_number + self.neighbor_span, 'right')
+        cards = np.sort(self.by_concept[low:high])
+        _, first = np.unique(self.answer_ids[cards], return_index=True)
+        return cards[np.sort(first)]
+
+    def _matrix(self, card_indexes):
+        """L2-normalised TF-IDF rows for the given cards"""
+        np = self.np
+        starts = self.indptr[card_indexes]
+        lengths = self.indptr[card_indexes + 1] - starts
+        rows = np.repeat(np.arange(len(card_indexes)), lengths)
+        positions = np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(lengths.sum())
+        counts = np.bincount(
+            rows * FEATURE_DIMS + self.indices[positions],
+            minlength=len(card_indexes) * FEATURE_DIMS
+        )
+        matrix = counts.reshape(len(card_indexes), FEATURE_DIMS).astype(np.float32)
+        matrix *= self.idf
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return matrix / norms
+
+    def generate(self, targets):
+        """Return {card_index: [answers for its weak slots]} for the target cards"""
+        np = self.np
+        results = {}
+        by_concept = {}
+        for card_index in targets:
+            by_concept.setdefault(int(self.concepts[card_index]), []).append(card_index)
+
+        for concept_number, concept_targets in by_concept.items():
+            pool = self.block(concept_number)
+            pool_matrix = self._matrix(pool)
+            distance_penalty = (
+                np.abs(self.concepts[pool] - concept_number).astype(np.float32)
+                * CONCEPT_DISTANCE_PENALTY
+            )
+            for start in range(0, len(concept_targets), TARGET_CHUNK):
+                chunk = np.array(concept_targets[start:start + TARGET_CHUNK], dtype=np.int64)
+                scores = self._matrix(chunk) @ pool_matrix.T - distance_penalty
+                # Never offer a card its own answer
+                scores[pool[None, :] == chunk[:, None]] = -np.inf
+                keep = min(TOP_CANDIDATES, len(pool))
+                top = np.argpartition(-scores, keep - 1, axis=1)[:, :keep]
+                for row_number, card_index in enumerate(chunk):
+                    ranked = top[row_number][np.argsort(-scores[row_number, top[row_number]])]
+                    results[int(card_index)] = self._pick(int(card_index), pool[ranked], pool)
+        return results
+
+    def _pick(self, card_index, ranked, pool):
+        """Take distinct answers for a card's weak slots, best candidates first"""
+        row = self.rows[card_index]
+        slots = weak_slots(row)
+        taken = {self.answers[card_index]}
+        taken.update(normalize_answer(row.get(field)) for field in WRONG_FIELDS if field not in slots)
+        picked = []
+        for candidates in (ranked, pool):
+            # Fall back to the rest of the block when the top candidates repeat
+            for candidate in candidates.tolist():
+                if len(picked) == len(slots):
+                    return picked
+                answer = self.answers[candidate]
+                if answer and answer not in taken:
+                    taken.add(answer)
+                    picked.append(self.rows[candidate]['correct_answer'])
+        return picked
+
+
+def fill_distractors(rows, cache_path=None, neighbor_span=NEIGHBOR_SPAN):
+    """Return rows with weak wrong answers replaced, reusing cached picks
+
+    A cached pick is reused while both the card and the cards of its
+    concept neighbourhood are unchanged.
+    """
+    rows = [dict(row) for row in rows]
+    targets = [i for i, row in enumerate(rows) if weak_slots(row)]
+    if not targets:
+        return rows
+
+    cache = _load_cache(cache_path)
+    neighbourhood_hashes = _neighbourhood_hashes(rows, neighbor_span)
+
+    stale = []
+    for card_index in targets:
+        row = rows[card_index]
+        entry = cache.get(_card_key(row))
+        neighbourhood = neighbourhood_hashes[int(row['concept_number'])]
+        if entry and entry['card'] == _card_hash(row) and entry['pool'] == neighbourhood:
+            _apply(row, entry['answers'])
+        else:
+            stale.append(card_index)
+
+    if stale:
+        generated = DistractorGenerator(rows, neighbor_span).generate(stale)
+        for card_index, answers in generated.items():
+            row = rows[card_index]
+            cache[_card_key(row)] = {
+                'card': _card_hash(row),
+                'pool': neighbourhood_hashes[int(row['concept_number'])],
+                'answers': answers,
+            }
+            _apply(row, answers)
+        _save_cache(cache_path, cache)
+    return rows
+
+
+def _apply(row, answers):
+    for field, answer in zip(weak_slots(row), answers):
+        row[field] = answer
+
+
+def _neighbourhood_hashes(rows, neighbor_span):
+    """Fingerprint of the candidate cards for each concept's neighbourhood"""
+    per_concept = {}
+    for row in rows:
+        per_concept.setdefault(int(row['concept_number']), []).append(
+            _digest(row['question_text'], row['correct_answer'])
+        )
+    concept_hashes = {number: _digest(*sorted(hashes)) for number, hashes in per_concept.items()}
+    return {
+        number: _digest(*(
+            f"{other}:{concept_hashes[other]}"
+            for other in range(number - neighbor_span, number + neighbor_span + 1)
+            if other in concept_hashes
+        ))
+        for number in concept_hashes
+    }
+
+
+def _load_cache(cache_path):
+    if cache_path is None:
+        return {}
+    try:
+        with open(cache_path, 'r', encoding='utf-8') as file:
+            data = json.load(file)
+    except (OSError, ValueError):
+        return {}
+    return data.get('cards', {}) if data.get('version') == CACHE_VERSION else {}
+
+
+def _save_cache(cache_path, cache):
+    if cache_path is None:
+        return
+    cache_path = Path(cache_path)
+    try:
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(cache_path, 'w', encoding='utf-8') as file:
+            json.dump({'version': CACHE_VERSION, 'cards': cache}, file)
+    except OSError:
+        pass
+
+
+def default_cache_path(csv_path):
+    csv_path = Path(csv_path)
+    return csv_path.parent / ".cache" / f"{csv_path.stem}.distractors.json"
+
+
+def main():
+    from card_store import CARD_FIELDS
+
+    parser = argparse.ArgumentParser(description="Generate wrong answers for cards that lack them")
+    parser.add_argument('deck', help="flashcard CSV file")
+    parser.add_argument('-o', '--output', help="write the completed deck here (default: print a summary)")
+    args = parser.parse_args()
+
+    with open(args.deck, 'r', encoding='utf-8', newline='') as file:
+        rows = list(csv.DictReader(file))
+    weak = sum(1 for row in rows if weak_slots(row))
+    filled = fill_distractors(rows, default_cache_path(args.deck))
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8', newline='') as file:
+            writer = csv.DictWriter(file, fieldnames=CARD_FIELDS, extrasaction='ignore')
+            writer.writeheader()
+            writer.writerows(filled)
+        print(f"Filled wrong answers for {weak} of {len(rows)} cards -> {args.output}")
+    else:
+        for before, after in zip(rows, filled):
+            if weak_slots(before):
+                wrong = ' | '.join(after[field] for field in WRONG_FIELDS)
+                print(f"{after['question_text']}\n    ✓ {after['correct_answer']}\n    ✗ {wrong}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,218 @@
+"""
+Weak-Area Drill
+Draws cards in proportion to how often they, and their concept, were missed
+"""
+
+import random
+from array import array
+
+
+# Weight every eligible card keeps, so a card never answered wrong still turns up
+BASE_WEIGHT = 0.05
+
+# Error scores decay by these factors on every answer to the card / concept
+CARD_DECAY = 0.7
+CONCEPT_DECAY = 0.9
+
+# Starting card error per lapse recorded by the scheduler
+LAPSE_ERROR = 0.5
+
+# Draws retried when they land on a card that is already reserved
+RESERVED_RETRIES = 16
+
+
+class FenwickTree:
+    """Binary indexed tree over float weights: O(log n) update, prefix sum and search"""
+
+    __slots__ = ('tree', 'size', 'top')
+
+    def __init__(self, weights):
+        size = len(weights)
+        tree = array('d', [0.0]) * (size + 1)
+        for i, weight in enumerate(weights, 1):
+            tree[i] += weight
+            parent = i + (i & -i)
+            if parent <= size:
+                tree[parent] += tree[i]
+        self.tree = tree
+        self.size = size
+        self.top = 1 << size.bit_length() if size else 0
+
+    def add(self, index, delta):
+        tree = self.tree
+        i = index + 1
+        while i <= self.size:
+            tree[i] += delta
+            i += i & -i
+
+    def prefix(self, index):
+        """Sum of the weights before `index`"""
+        tree = self.tree
+        total = 0.0
+        i = index
+        while i > 0:
+            total += tree[i]
+            i -= i & -i
+        return total
+
+    def find(self, target):
+        """Smallest index whose prefix sum including itself exceeds target"""
+        tree = self.tree
+        position = 0
+        step = self.top
+        while step:
+            following = position + step
+            if following <= self.size and tree[following] <= target:
+                position = following
+                target -= tree[following]
+            step >>= 1
+        return min(position, self.size - 1)
+
+
+class WeakAreaSelector:
+    """Sample cards with probability proportional to card plus concept error
+
+    A card's weight is BASE_WEIGHT + its own error score + its concept's
+    error score. Eligible cards are laid out grouped by concept, so one
+    Fenwick tree over concepts and one over cards make both draw and
+    update O(log n): a draw picks a concept, then either a card by its own
+    weight within the concept's range or any card of the concept
+    uniformly, for the concept error share. Outcomes are passed on to
+    `base` so the SM-2 schedule stays current while drilling.
+    """
+
+    def __init__(self, deck, rng=None, base=None, concepts=None, question_types=None,
+                 card_errors=None):
+        store = deck.cards
+        concepts = {int(number) for number in concepts} if concepts else None
+        question_types = set(question_types) if question_types else None
+        eligible = [
+            index for index in range(len(store))
+            if (concepts is None or store.concept_number(index) in concepts)
+            and (question_types is None or store.question_type(index) in question_types)
+        ]
+        if not eligible:
+            raise ValueError("Filter matches no cards")
+        eligible.sort(key=lambda index: (store.concept_number(index), index))
+
+        self.deck = deck
+        self.rng = rng if rng is not None else random.Random()
+        self.base = base
+        self.cards = array('I', eligible)           # slot -> card index
+        self.slot_of = {index: slot for slot, index in enumerate(eligible)}
+        self.card_error = array('d', (
+            card_errors[index] if card_errors is not None else 0.0 for index in eligible
+        ))
+
+        # Contiguous slot range and error score per concept
+        self.concept_of = array('I')                # slot -> concept position
+        self.concept_numbers = []
+        self.concept_start = array('I')
+        self.concept_end = array('I')
+        for slot, index in enumerate(eligible):
+            number = store.concept_number(index)
+            if not self.concept_numbers or self.concept_numbers[-1] != number:
+                if self.concept_numbers:
+                    self.concept_end.append(slot)
+                self.concept_numbers.append(number)
+                self.concept_start.append(slot)
+            self.concept_of.append(len(self.concept_numbers) - 1)
+        self.concept_end.append(len(eligible))
+        self.concept_error = array('d', [0.0]) * len(self.concept_numbers)
+        for concept in range(len(self.concept_numbers)):
+            start, end = self.concept_start[concept], self.concept_end[concept]
+            self.concept_error[concept] = sum(self.card_error[start:end]) / (end - start)
+
+        self._reserved = set()
+        self._rebuild()
+
+    @classmethod
+    def from_scheduler(cls, deck, scheduler, rng=None, **filters):
+        """Drill selector seeded with the lapses an SM-2 scheduler has seen"""
+        errors = [lapses * LAPSE_ERROR for lapses in scheduler.lapses]
+        return cls(deck, rng if rng is not None else scheduler.rng, base=scheduler,
+                   card_errors=errors, **filters)
+
+    def _card_weight(self, slot):
+        return BASE_WEIGHT + self.card_error[slot]
+
+    def _concept_weight(self, concept):
+        start, end = self.concept_start[concept], self.concept_end[concept]
+        card_sum = self.card_tree.prefix(end) - self.card_tree.prefix(start)
+        return card_sum + (end - start) * self.concept_error[concept]
+
+    def _rebuild(self):
+        """Recompute both trees from the error arrays, shedding float drift"""
+        self.card_tree = FenwickTree([self._card_weight(slot) for slot in range(len(self.cards))])
+        self.concept_tree = FenwickTree([
+            self._concept_weight(concept) for concept in range(len(self.concept_numbers))
+        ])
+        self._updates = 0
+
+    def __len__(self):
+        return len(self.cards)
+
+    def weight(self, card_index):
+        """Current draw weight of a card (0 if it is outside the filter)"""
+        slot = self.slot_of.get(card_index)
+        if slot is None:
+            return 0.0
+        return self._card_weight(slot) + self.concept_error[self.concept_of[slot]]
+
+    def _draw(self):
+        rng = self.rng
+        concept = self.concept_tree.find(rng.random() * self.concept_tree.prefix(self.concept_tree.size))
+        start, end = self.concept_start[concept], self.concept_end[concept]
+        low = self.card_tree.prefix(start)
+        card_sum = self.card_tree.prefix(end) - low
+        share = rng.random() * (card_sum + (end - start) * self.concept_error[concept])
+        if share < card_sum:
+            slot = self.card_tree.find(low + share)
+            return self.cards[min(max(slot, start), end - 1)]
+        return self.cards[start + rng.randrange(end - start)]
+
+    def select(self):
+        """Return the index of the next card to drill and reserve it"""
+        card_index = self._draw()
+        for _ in range(RESERVED_RETRIES):
+            if card_index not in self._reserved:
+                break
+            card_index = self._draw()
+        self._reserved.add(card_index)
+        return card_index
+
+    def release(self, card_index):
+        self._reserved.discard(card_index)
+
+    def update(self, card_index, is_correct):
+        """Decay the card's and its concept's error scores, adding a miss"""
+        self._reserved.discard(card_index)
+        if self.base is not None:
+            self.base.update(card_index, is_correct)
+        slot = self.slot_of.get(card_index)
+        if slot is None:
+            return
+        miss = 0.0 if is_correct else 1.0
+        concept = self.concept_of[slot]
+        start, end = self.concept_start[concept], self.concept_end[concept]
+
+        old_card = self.card_error[slot]
+        self.card_error[slot] = old_card * CARD_DECAY + miss
+        card_delta = self.card_error[slot] - old_card
+        self.card_tree.add(slot, card_delta)
+
+        old_concept = self.concept_error[concept]
+        self.concept_error[concept] = old_concept * CONCEPT_DECAY + miss
+        concept_delta = (self.concept_error[concept] - old_concept) * (end - start)
+        self.concept_tree.add(concept, card_delta + concept_delta)
+
+        self._updates += 1
+        if self._updates >= len(self.cards) + 1024:
+            self._rebuild()
+
+    def weakest_concepts(self, count=5):
+        """(concept number, error score) of the most missed concepts"""
+        ranked = sorted(
+            zip(self.concept_numbers, self.concept_error), key=lambda item: item[1], reverse=True
+        )
+        return ranked[:count]
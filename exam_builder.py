@@ -0,0 +1,354 @@
+#!/usr/bin/env python3
+"""
+Exam Builder
+Samples fixed-length printable exams that cover every concept, with answer keys
+"""
+
+import argparse
+import html
+import json
+import random
+import sys
+import time
+from collections import namedtuple
+from itertools import permutations
+from pathlib import Path
+
+from concept_store import ConceptStore
+from quiz_engine import DEFAULT_DECK_PATH, Deck
+
+
+EXAM_FORMAT_VERSION = 1
+
+DEFAULT_LENGTH = 50
+
+# Whole exams redrawn when the picks paint themselves into a corner, e.g.
+# concept cover used up a quota type that a later concept needed
+MAX_ATTEMPTS = 100
+
+# Random draws from a card list before falling back to scanning it for
+# cards that are still allowed
+DRAW_RETRIES = 8
+
+ANSWER_LETTERS = 'ABCD'
+
+# Every way to order four options, as (order, position of the correct answer);
+# `order` lists the card's option positions in the order they are printed
+OPTION_ORDERS = [(order, order.index(0)) for order in permutations(range(4))]
+
+ExamQuestion = namedtuple('ExamQuestion', 'card_index order answer')
+
+Exam = namedtuple('Exam', 'number questions')
+
+
+def parse_quotas(specs):
+    """{question_type: count} from 'type=count' strings"""
+    quotas = {}
+    for spec in specs or ():
+        question_type, separator, count = spec.rpartition('=')
+        if not separator or not question_type:
+            raise ValueError(f"Quota {spec!r} is not of the form type=count")
+        quotas[question_type] = quotas.get(question_type, 0) + int(count)
+    return quotas
+
+
+class ExamBuilder:
+    """Draws exam variants from a deck under coverage and quota constraints
+
+    Every exam has `length` different cards, at least one card of each
+    concept in `concepts`, and exactly quotas[t] cards of each question
+    type t with a quota; the rest are drawn from types without one. Card
+    lists per concept and per type are built once, so a variant costs a
+    few random draws per question. Variant n of a seed is always the same
+    exam, whichever other variants are built alongside it.
+    """
+
+    def __init__(self, deck, concepts, length=DEFAULT_LENGTH, quotas=None):
+        self.deck = deck
+        self.length = length
+        self.quotas = dict(quotas or {})
+        self.concepts = sorted(set(concepts))
+
+        store = deck.cards
+        numbers = store.concept_numbers
+        types = store.question_types
+        self.card_concepts = [numbers[concept_id] for concept_id in store.concept_ids]
+        self.card_types = [types[type_id] for type_id in store.type_ids]
+
+        self.by_concept = {}
+        self.by_type = {}
+        for index, (concept, question_type) in enumerate(zip(self.card_concepts, self.card_types)):
+            self.by_concept.setdefault(concept, []).append(index)
+            self.by_type.setdefault(question_type, []).append(index)
+        # Cards the rest of an exam is filled from
+        self.free = [
+            index for index, question_type in enumerate(self.card_types)
+            if question_type not in self.quotas
+        ]
+        self._check()
+
+    def _check(self):
+        """Raise ValueError for constraints no exam can meet"""
+        if self.length < 1:
+            raise ValueError("An exam needs at least one question")
+        if self.length > len(self.deck):
+            raise ValueError(f"The deck has only {len(self.deck)} cards for a {self.length}-question exam")
+        for question_type, count in self.quotas.items():
+            available = len(self.by_type.get(question_type, ()))
+            if count < 0:
+                raise ValueError(f"Quota for {question_type!r} is negative")
+            if count > available:
+                raise ValueError(f"Quota of {count} {question_type!r} questions, "
+                                 f"but the deck has {available}")
+        quota_total = sum(self.quotas.values())
+        if quota_total > self.length:
+            raise ValueError(f"Quotas add up to {quota_total} questions, "
+                             f"more than the exam's {self.length}")
+        if len(self.free) < self.length - quota_total:
+            raise ValueError(f"Only {len(self.free)} cards have a question type without a quota, "
+                             f"{self.length - quota_total} are needed")
+        missing = [number for number in self.concepts if number not in self.by_concept]
+        if missing:
+            raise ValueError(f"No cards for concept(s) {', '.join(map(str, missing))}")
+        if len(self.concepts) > self.length:
+            raise ValueError(f"A {self.length}-question exam can't cover {len(self.concepts)} concepts")
+
+    def _draw(self, rng, cards, used, remaining):
+        """A random card from `cards` that isn't used and fits the quotas, or None"""
+        for _ in range(DRAW_RETRIES):
+            card = cards[rng.randrange(len(cards))]
+            if card not in used and remaining.get(self.card_types[card], 1) > 0:
+                return card
+        allowed = [
+            card for card in cards
+            if card not in used and remaining.get(self.card_types[card], 1) > 0
+        ]
+        return rng.choice(allowed) if allowed else None
+
+    def _pick(self, rng):
+        """Card indexes for one exam, or None if this attempt got stuck"""
+        picked = []
+        used = set()
+        covered = set()
+        remaining = dict(self.quotas)
+
+        def take(card):
+            picked.append(card)
+            used.add(card)
+            covered.add(self.card_concepts[card])
+            question_type = self.card_types[card]
+            if question_type in remaining:
+                remaining[question_type] -= 1
+
+        concepts = list(self.concepts)
+        rng.shuffle(concepts)
+        for concept in concepts:
+            if concept in covered:
+                continue
+            card = self._draw(rng, self.by_concept[concept], used, remaining)
+            if card is None:
+                return None
+            take(card)
+        if len(picked) > self.length - sum(remaining.values()):
+            return None  # Covering concepts left no room for the quotas
+        for question_type in self.quotas:
+            while remaining[question_type]:
+                card = self._draw(rng, self.by_type[question_type], used, remaining)
+                if card is None:
+                    return None
+                take(card)
+        while len(picked) < self.length:
+            card = self._draw(rng, self.free, used, remaining)
+            if card is None:
+                return None
+            take(card)
+        return picked
+
+    def build(self, number, seed=0):
+        """Exam variant `number` for `seed`"""
+        rng = random.Random(f"{seed}:{number}")
+        for _ in range(MAX_ATTEMPTS):
+            picked = self._pick(rng)
+            if picked is not None:
+                break
+        else:
+            raise ValueError(f"Couldn't meet the concept cover and quotas in {MAX_ATTEMPTS} attempts; "
+                             "try a longer exam or smaller quotas")
+        rng.shuffle(picked)
+        orders = rng.choices(OPTION_ORDERS, k=len(picked))
+        return Exam(number, [
+            ExamQuestion(card, order, answer) for card, (order, answer) in zip(picked, orders)
+        ])
+
+    def build_many(self, count, seed=0, first=1):
+        """Yield variants first .. first + count - 1"""
+        for number in range(first, first + count):
+            yield self.build(number, seed)
+
+
+def answer_key(exam):
+    """The exam's correct letters in question order, e.g. 'BADC...'"""
+    return ''.join(ANSWER_LETTERS[question.answer] for question in exam.questions)
+
+
+def options(deck, question):
+    """The question's option texts in printed order"""
+    raw = deck.options(question.card_index)
+    return [raw[i] for i in question.order]
+
+
+def exam_record(deck, exam):
+    """JSON-ready dict for one exam"""
+    store = deck.cards
+    return {
+        'number': exam.number,
+        'questions': [
+            {
+                'card': question.card_index,
+                'concept_number': store.concept_number(question.card_index),
+                'concept_name': store.concept_name(question.card_index),
+                'question_type': store.question_type(question.card_index),
+                'question': deck[question.card_index]['question_text'],
+                'options': options(deck, question),
+                'answer': ANSWER_LETTERS[question.answer],
+            }
+            for question in exam.questions
+        ],
+        'answer_key': answer_key(exam),
+    }
+
+
+def write_json(path, builder, exams, seed):
+    """Stream exams to a JSON file with the settings that reproduce them
+
+    Returns the number of exams written.
+    """
+    written = 0
+    with open(path, 'w', encoding='utf-8') as file:
+        settings = json.dumps({
+            'version': EXAM_FORMAT_VERSION,
+            'seed': seed,
+            'length': builder.length,
+            'quotas': builder.quotas,
+            'concepts': builder.concepts,
+        })
+        file.write(settings[:-1] + ', "variants": [\n')
+        for exam in exams:
+            file.write((',\n' if written else '') + json.dumps(exam_record(builder.deck, exam)))
+            written += 1
+        file.write('\n]}\n')
+    return written
+
+
+HTML_STYLE = """
+body { font-family: Georgia, serif; margin: 2em; color: #111; }
+h1 { font-size: 1.4em; margin-bottom: 0.2em; }
+.exam, .keys { page-break-after: always; break-after: page; }
+.fields { margin-bottom: 1.5em; }
+ol.questions > li { margin-bottom: 1em; page-break-inside: avoid; break-inside: avoid; }
+ol.options { list-style-type: upper-alpha; margin-top: 0.3em; }
+table { border-collapse: collapse; }
+td, th { border: 1px solid #999; padding: 0.2em 0.6em; font-family: monospace; text-align: left; }
+"""
+
+
+def _key_groups(key, size=5):
+    return ' '.join(key[i:i + size] for i in range(0, len(key), size))
+
+
+def write_html(path, builder, exams, seed, title="Jeet Kune Do Grading Exam"):
+    """Stream exams to one printable HTML file, each on its own pages
+
+    Answer keys for every variant follow the exams. Returns the number of
+    exams written.
+    """
+    deck = builder.deck
+    keys = []
+    escape = html.escape
+    with open(path, 'w', encoding='utf-8') as file:
+        file.write(f"<!DOCTYPE html>\n<html><head><meta charset=\"utf-8\">"
+                   f"<title>{escape(title)}</title><style>{HTML_STYLE}</style></head><body>\n")
+        for exam in exams:
+            parts = [
+                f'<section class="exam"><h1>{escape(title)}</h1>',
+                f'<p class="fields">Variant {exam.number} &middot; Name: ______________________ '
+                f'&middot; Date: ____________</p><ol class="questions">',
+            ]
+            for question in exam.questions:
+                items = ''.join(f'<li>{escape(option)}</li>' for option in options(deck, question))
+                parts.append(f'<li>{escape(deck[question.card_index]["question_text"])}'
+                             f'<ol class="options">{items}</ol></li>')
+            parts.append('</ol></section>\n')
+            file.write(''.join(parts))
+            keys.append((exam.number, answer_key(exam)))
+        file.write(f'<section class="keys"><h1>Answer Keys</h1>'
+                   f'<p>Seed {escape(str(seed))}, {builder.length} questions per exam</p>'
+                   f'<table><tr><th>Variant</th><th>Answers</th></tr>')
+        file.write(''.join(f'<tr><td>{number}</td><td>{_key_groups(key)}</td></tr>' for number, key in keys))
+        file.write('</table></section>\n</body></html>\n')
+    return len(keys)
+
+
+def _tee(exams, sink):
+    for exam in exams:
+        sink.append(exam)
+        yield exam
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build printable exam variants with answer keys")
+    parser.add_argument('--deck', action='append', metavar='NAME',
+                        help="deck from data/ to draw from (repeatable; default: the main deck)")
+    parser.add_argument('--concept', type=int, action='append', metavar='NUMBER',
+                        help="concept every exam must cover (repeatable; default: every concept "
+                             "with source material)")
+    parser.add_argument('--length', type=int, default=DEFAULT_LENGTH, help="questions per exam")
+    parser.add_argument('--quota', action='append', metavar='TYPE=COUNT',
+                        help="exact number of questions of a question_type (repeatable)")
+    parser.add_argument('--variants', type=int, default=1, help="number of exams to build")
+    parser.add_argument('--first', type=int, default=1, help="number of the first variant")
+    parser.add_argument('--seed', type=int, help="seed; the same seed always gives the same variants")
+    parser.add_argument('--json', metavar='FILE', help="write the exams and answer keys as JSON")
+    parser.add_argument('--html', metavar='FILE', help="write the exams and answer keys as printable HTML")
+    args = parser.parse_args()
+
+    seed = args.seed if args.seed is not None else random.randrange(1 << 32)
+    try:
+        if args.deck or args.concept:
+            from deck_library import DeckLibrary
+            library = DeckLibrary()
+            deck = library.session_deck(args.deck, args.concept)
+        else:
+            deck = Deck.load(DEFAULT_DECK_PATH)
+        concepts = args.concept or list(ConceptStore())
+        builder = ExamBuilder(deck, concepts, args.length, parse_quotas(args.quota))
+
+        start = time.perf_counter()
+        exams = builder.build_many(args.variants, seed, args.first)
+        if args.json and args.html:
+            built = []
+            write_json(args.json, builder, _tee(exams, built), seed)
+            write_html(args.html, builder, built, seed)
+        elif args.json:
+            write_json(args.json, builder, exams, seed)
+        elif args.html:
+            write_html(args.html, builder, exams, seed)
+        else:
+            exams = list(exams)
+        elapsed = time.perf_counter() - start
+    except (KeyError, ValueError) as e:
+        sys.exit(f"Can't build exams: {e}")
+
+    rate = args.variants / elapsed if elapsed > 0 else float('inf')
+    print(f"{args.variants:,} exam(s) of {builder.length} questions covering {len(builder.concepts)} "
+          f"concepts, seed {seed} ({elapsed:.2f}s, {rate:,.0f}/s)")
+    for path in (args.json, args.html):
+        if path:
+            print(f"Wrote {Path(path).resolve()}")
+    if not args.json and not args.html:
+        for exam in exams[:10]:
+            print(f"Variant {exam.number}: {_key_groups(answer_key(exam))}")
+
+
+if __name__ == "__main__":
+    main()
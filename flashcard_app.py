@@ -4,330 +4,64 @@ Jeet Kune Do Flashcard Training App
 A desktop application for studying JKD concepts using spaced repetition
 """
 
-import tkinter as tk
-from tkinter import ttk, messagebox, scrolledtext
-import csv
-import random
-from pathlib import Path
+import argparse
+import sys
+import time
+import warnings
+from concept_store import ConceptStore
+from deck_watch import POLL_INTERVAL
+from drill import WeakAreaSelector
+from instrumentation import NullProfiler, Profiler
+from prefetch import LatencyStats, QuestionPrefetcher, SOURCE_NOT_FOUND
+from quiz_engine import DEFAULT_DECK_PATH, FilteredSelector
+from study import Study
 
+# Imported by load_tk() when the window opens, so the terminal frontend never loads Tk
+tk = messagebox = scrolledtext = None
 
-# JKD Concept Source Material - extracted from PDF
-CONCEPT_TEXTS = {
-    1: """Centerline Theory
 
-1. The centerline is an imaginary vertical line that runs along the center of the body.
-2. The primary targets on the centerline are the eyes, throat, groin and knees.
-3. The secondary targets are the nose, mouth, chin, sternum, solar plexus, stomach, liver, inner thigh, outer thigh, shin, and instep.
-4. Targets in the back are the head, neck, spine, tailbone, hamstrings, back of the knee, and Achilles tendon.
-5. All offense is directed to the centerline.
-6. All defense originates from the centerline.
-7. All footwork is designed to intercept the centerline.
-8. In emptiness, you hit in a straight line.
-9. Control, occupy, and defend the centerline at all times.
-10. Your objective is to hit the centerline, without being hit yourself.
-11. Centerline control uses economy of motion. Keeping both hands on the centerline will minimize all defensive motions.
-12. All actions in Jeet Kune Do focus on the centerline.""",
+# JKD Concept Source Material - extracted from PDF, read on demand from data/concepts/
+CONCEPT_TEXTS = ConceptStore()
 
-    2: """Economy of Motion Theory
+# Callbacks timed when the app runs with --profile
+PROFILED_CALLBACKS = (
+    'load_flashcards', 'setup_ui', 'next_question', 'on_question_painted',
+    'check_answer', 'submit_typed', 'show_source_material', 'show_search', 'show_stats',
+)
 
-1. Combat must be simple, direct, and non-classical (non-traditional).
-2. Motions should be economical, not overly complicated, and should go directly to the target
-3. Your actions must have no wasted energy and unnecessary motion. Use the least possible movement to hit your goal.
-4. The shortest distance between two points is a straight line – so stay straight.""",
 
-    3: """Four Ranges of Combat
-
-1. Kicking – distance where you can only make contact with your legs or feet
-2. Punching – distance where you can score with your lead hand
-3. Trapping – distance where you can clinch his neck tightly
-4. Grappling/Ground Fighting – distance where you can throw and ground fight""",
-
-    4: """Fighting Measure (Proper Distance) Theory
-
-1. The distance you want to maintain & control against an opponent.
-2. Proper distance is where he can't touch you without first taking a step or making a big motion.
-3. We avoid starting the fight in "trading blows" range.
-4. Maintain a 360 circle of awareness and avoid "tunnel vision".""",
-
-    5: """Power Side Forward Theory
-
-1. Lead with your dominant side; you can hit harder, faster, and more accurately; weak side is in the rear, which gives it more power from hip rotation.
-2. Both hands have "knockout" power – there is no "weak hand."
-3. Bruce Lee took this concept from Fencing.""",
-
-    6: """Forward Pressure Theory
-
-1. Powerful driving energy pushes him back, forcing him to backpedal.
-2. You must destroy his Base and Balance.
-3. The Straight Blast and Boxing Combos are often used to create pressure.
-4. Apply constant forward pressure against your opponent, which is like water flowing through the smallest crack seeking an opening. Whether your opponent retreats or advances, he should feel an "Alive" tension against his arms or body at all times, affecting his motions and restricting him.""",
-
-    7: """Non-Telegraphic Motion Theory
-
-1. Never show him what you are about to do before you do it: do not alert him.
-2. Never show him anything. Telegraphing can be physical, emotional, and psychological, so clean up your communication.
-3. Hit from where you are; there is no reset before striking.""",
-
-    8: """Simultaneous Attack & Defense (Lin Sil Dai Da) Theory
-
-1. Attack at the same time you defend. Offense and defense are one, not two.
-2. By attacking & defending at the same time, your move is a one-count motion.
-3. Your defense is also your attack. Treat his attack as an opportunity to counter-attack. Instead of blocking and then returning a strike, we block and strike at the same time.
-4. JKD is an offensive style – we prefer a pre-emptive approach. If you hit him before he hits you, then you prevent him from leading the dance.""",
-
-    9: """Visual Focus Principles
-
-1. Where you look at during a fight
-2. Make sure to widen your field of vision - avoid focal vision
-3. Primary Visual Focus – his solar plexus
-4. Secondary Visual Focus – his head
-5. Tertiary Visual Focus – his elbows (for punches) and knees (for kicks)""",
-
-    10: """Time-Distance Variable
-
-1. The less distance you have from him, the less time you have to react.
-2. The more distance you have from him, the more time you have to react.
-3. Defensively, you want more distance from him to give you more reaction time.
-4. Offensively, you want to close distance on him quickly to give him no reaction time.""",
-
-    11: """9-Second Rule
-
-1. You must end the fight in less than 9 seconds, or the odds of winning go down dramatically.
-2. The longer the fight, the odds increase that you will end up on the ground, weapons will be drawn, and multiple enemies will attack you.""",
-
-    12: """Worst-Case Scenario Theory
-
-1. Always train as if the enemy is bigger, stronger, and tougher than you.
-2. Always assume your enemy has a weapon, even if you cannot see it.
-3. Always assume your enemy has friends coming to help him
-4. Don't underestimate anyone""",
-
-    13: """Four Corners Theory
-
-1. The four corners are imaginary boundaries in which your hands operate.
-2. The hands never go outside these boundaries.
-3. The concept is to allow the opponent to enter one of the four corners and then close the gate upon the attack.
-4. By not going outside of one's boundaries, one learns not to chase the illusive opponent – do not chase the attacking tool. Let it come to you.
-5. The four corners are High Outside, Low Outside, High Inside, and Low Inside.""",
-
-    14: """Three Attack Lines Theory
-
-1. Attack Line 1 – Centerline (Attack is Straight)
-2. Attack Line 2 – Slanted (Attack is Angled to Opposite Shoulder)
-3. Attack Line 3 – Lateral Line (Attack Comes from the Side of the Head)""",
-
-    15: """Five Ways of Attack
-
-1. S.A.A./S.D.A. – Single Angular Attack/Single Direct Attack
-2. A.B.C. – Attack by Combination
-3. H.I.A./F.I.A. – Hand/Foot Immobilization Attack (Trapping)
-4. P.I.A. – Progressive Indirect Attack
-5. A.B.D. – Attack by Drawing
-
---- Study Notes ---
-
-1. SAA 🤛 / SDA 👊 - Single Angular Attack / Single Direct Attack. Remember, this is single. It is direct or angled. SINGLE. This is like Karate.
-2. ABC 🥊🥊 - Attack by Combination.
-3. HIA 🤝 / FIA 🦶 - Hand / Foot Immobilization Attack.
-4. PIA 🫳🤜 - Progressive Indirect Attack. eg Ping Chou -> Gua Choy. The low fake then facepunch. It's preceded by a feint or an uncommitted strike which is meant to misdirect your opponent's actions or reactions in order to hit an open line or gain a period of movement-time. It is one movement which changes direction, but is preceded by a feint.
-5. ABD 🤏 - Attack by Draw. [It's a SETUP]. An attack or counterattack initiated upon luring the opponent into a commitment by leaving him an apparent opening in your defenses, or performing movements that he may try to time and counter.""",
-
-    16: """Immovable Elbow Theory
-
-1. The front elbow must always be one fist away from the body, never less.
-2. Open and close the elbow for attack and defense.
-3. The concentration of energy on the elbow creates the immovable elbow.""",
-
-    17: """Five Gates Theory
-
-1. Bruce Lee added the fifth gate, which is from the waist down to the feet.
-2. This gate was made for kicking offense and defense.
-3. This gate is divided into the front and rear leg.""",
-
-    18: """Do Not Meet Force with Force Theory
-
-1. To defeat strength, use speed, footwork, angulation, sensitivity, explosive force, good body mechanics, and leverage.
-2. If you have to strain your muscles to beat him, then your technique is flawed.
-3. Deflect but don't block: blocking means putting yourself in the way of an attack to stop it; deflecting means moving yourself away from the attack and redirecting his force to another direction.
-4. Blocking only works if you are the same size as your opponent. Otherwise, you will get destroyed by someone stronger than you. Deflecting is preferable.""",
-
-    19: """Relax – Explode Principle
-
-1. Maintain a loose and relaxed physical and mental state, until the last moment when you strike. Then return back to this state as soon as possible.
-2. Your hit is delivered suddenly with maximum explosive force, velocity, and deep penetration. When you go from a relaxed state to a sudden burst of speed and high intensity, you create explosive force.
-3. Explosive force accelerates towards the target and go past it; non-explosive force (pushing force) will slow down as it nears the target, with very little penetration.""",
-
-    20: """Always Follow-Up: Assume Nothing is Final Theory
-
-1. Upon a successful entry, always continue your attack with aggressive ABC, Forward Pressure, and Killer Instinct. Never allow him to regain his base and balance. Never allow him to counter-attack.
-2. Do not stop attacking until the enemy is sufficiently immobilized.""",
-
-    21: """Proper Body Mechanics Theory
-
-1. Body mechanics involve compact power, efficient structure, and leverage.
-2. Proper punching mechanics involve:
-   - Stage 1: Driving from Foot to Hip
-   - Stage 2: Fast Rotation from Hip to Shoulder
-   - Stage 3: Loose and Relaxed Whipping Energy from Shoulder to Hand
-3. Effective striking principles involve:
-   - Correct Type of Force
-   - Correct Line of Force
-   - Correct Stability and Leverage Upon Impact
-4. Proper Weight Transfer
-5. Balance in Motion
-6. Tactical Breathing
-7. Alive Footwork – Perpetual Motion""",
-
-    22: """The Different Types of Speed
-
-1. Movement – the speed at which your body moves during an action
-2. Reaction – the speed at which you receive stimuli, then take action
-3. Initiation – the speed at which you go from inaction to action in response to stimuli.
-4. Perception/Visual – the speed at which you see and perceive stimuli, then take action.
-5. Audible – the speed at which you hear stimuli, then take action.
-6. Mental – the speed at which your mind chooses the right action in response to stimuli.
-7. Alteration – the speed at which you can change directions in the middle of an action.
-8. Combination – the speed at which you can deliver a series of movements in one flow.
-9. Sensitivity – the speed at which you can read pressure using touch, then take action.
-10. Footwork/Agility – the speed at which you can move your feet properly.
-11. Trapping – the speed at which you can apply effective trapping attacks on your enemy.""",
-
-    23: """Three Levels of Defense Theory
-
-1. Interception: respond by intercepting his movement with an attack.
-2. Evasion and Footwork: respond by evading the enemy's attack, then counter-attack him.
-3. Parrying, Trapping, and Counter-Attacking: respond by parrying, trapping, and counter-attacking his attacks.""",
-
-    24: """Immovable Elbow Moving Line Theory
-
-1. The lead elbow must be as strong as steel – never allow it to compress inwards,
-2. The lead elbow must be lined up on the centerline.
-3. The lead elbow must be placed about one and a half fist length from the body.
-4. All punches and deflections begin from the elbow, not the hand.""",
-
-    25: """The Hammer Principle
-
-1. By aiming (dropping your hand like a hammer) and lining up the lead hand at the target a split second before striking, you land a fast, accurate hit without telegraphing""",
-
-    26: """Three Sticks Theory
-
-1. Stick 1 (Centerline) – protect and defend at all costs – never give away your centerline
-2. Stick 2 (Lead Elbow) – "Strong as Steel" – never allow your elbow to collapse into your body
-3. Stick 3 (Lead Forearm) – "Soft as a Blade of Grass" – soft, yielding, flexible, sensitive, adaptable""",
-
-    27: """Flow Theory – Fluidity in Movement
-
-1. Flowing is a non-stop continuous motion that changes and moves without missing a beat. We never meet strength with strength, or force with force. You must flow with the situation.""",
-
-    28: """Comfortable in All Ranges and Adaptability Theory
-
-1. You must be comfortable in ALL ranges. Learn to adapt and overcome anything. Learn to fight and adapt to any scenario. Bruce Lee states that JKD can "fit in with any style". It means that JKD can defeat an enemy regardless of their style or system.
-2. The JKD man adapts to all weapons, kicking, boxing, trapping, clinching, and ground fighting ranges. He is the master of entry and exit.""",
-
-    29: """Longest Weapon to Nearest Target (Nearest Weapon to Nearest Target) Theory
-
-1. Use your longest (or nearest) weapon on the opponents nearest and most vulnerable target. Thus the lead hand and lead foot is preferred to using the rear hand and foot. Or in other words, as Bruce Lee said, "I would just as soon kick someone in the head as punch him in the toe…" For example, if your enemy's face is closest to your head, then a quick headbutt to the nose might be the best choice for attack, rather than pulling away to punch.""",
-
-    30: """Straight-Line Attack Theory
-
-1. The shortest distance between two points is a straight line.
-2. In offense and defense, we utilize the nearest weapon to the nearest target.""",
-
-    31: """Defend When You Attack: Always Cover Your Gates Theory
-
-1. You are most vulnerable to attack when you attack. Always defend your gates when you attack.
-2. Wu Sao is 80% for defense and is responsible for defending your centerline. You can hold it:
-   - In front of your chin
-   - Next to your Inside Gate jaw/cheek
-   - Next to your Outside Gate jaw/cheek
-3. Whenever you strike, be sure to cover your head with the non-striking hand and avoid dropping your hands.""",
-
-    32: """Bridge Hand Theory
-
-1. The forearm is referred to as the bridge.
-2. The forearm is used to intercept the opponent's forearm or attack in both offense and defense. This interception is referred to as a bridge.
-3. By using a bridge, we decrease the margin of being hit, and increase our margin of control.""",
-
-    33: """Trapping Hands Theory
-
-1. Referred to as the tying up of hands (immobilizing the hands).
-2. The idea is to use one hand to pin the opponent's two hands with one hand so that the other hand is free to strike at will.
-3. This theory also correlates that two hands should not be used to control one of the opponent's hands.""",
-
-    34: """Triangle Theory
-
-1. The triangle serves as the basic principle in the formation and use of all Wing Chun techniques.
-2. It also serves as a strong and efficient device to redirect energy. The more precise the position, the less energy required by the technique.""",
-
-    35: """Three Sectors Theory
-
-1. The three sectors are imaginary lines which separate the body into three sections.
-2. The high section is from the solar plexus up to the top of the head.
-3. The middle section is from the groin to the solar plexus.
-4. The low section is from the groin to the feet.
-5. Hands take care of the top two levels; legs take care of the bottom level.
-6. The hands do not chase into the low level.""",
-
-    36: """Evade a Strong Force Theory
-
-There is a limit to how much force any particular technique can handle. No matter how strong the stance or how precise the angle of hands, there will be a force strong enough to get through. Master Wong Kiu expressed this thought by saying "You cannot block a motorcycle with a Bong Sau." It just can't be done.
-
-Jun Fan teaches some direct confrontation techniques in term of blocking kicks or roundhouse punches; however, when the attacks are too strong, then alternative methods must be used. The advantage of direct confrontation techniques is that they are faster than going with the flow methods.
-
-One of the best remedies against a strong force such as a spinning kick or wild hook punch is not to be there when it arrives. You always risk getting hurt when you clash with a strong force.""",
-
-    37: """Combined Strength Theory
-
-There is a Chinese term called "Garb Lik" which means combined strength. This term also means to not have one passive hand and one active hand. For example, don't hold someone's arm with one hand while hitting high and low with the other hand. The holding hand is passive while the hitting hand is active.
-
-When you punch, there is also an equal strength put into the Wu Sau (guarding hand). When you apply the Bong Sau (wing block hand), you also put a strong instantaneous force into the guarding hand.
-
-In the Chi Sao (double sticking hands), when you do a Jik Jern (center palm hit), don't have a weak high Fook Sau or else the opponent can hit by changing his Boang Sau to a Sat Sau (neck chopping hand). Always have "Garb Lik" in all of your actions.""",
-
-    38: """Use Body Position Theory
-
-During fighting practice, the opponent may have you jammed up so that your hand actions cannot be applied. In such cases, a shift of the body can sometimes change the angles in such a way that you again have room to maneuver.
-
-If shifting does not help, you may still be able to move the stance in such a way as to offbalance the opponent. Even a slight change in position can sometimes give you another chance to hit.
-
-Seemingly hopeless situations, such as where the opponent has grabbed your kicking leg, can sometimes be remedied by changing the body position. In this case, dropping to the ground in order to kick the opponent's joint with the other leg.
-
-In Jun Fan, it is not only the hands which provide shocking forces. When you are being trapped, violent rotations of the body combined with the use of the elbow can sometimes save the day. Think of trying to hold on to a wiggling fish.""",
-
-    39: """Be Direct Theory
-
-There are sayings in the martial arts world such as "Use Soft Against Hard" and "Go with the Flow." These principles are useful when handling large forces. When the forces are not large, such as in the case of a roundhouse punch thrown by a similar sized opponent, it is often much quicker to clash directly with the attack so that you hit the opponent immediately.
-
-If you are confident with your technique and can handle the opponent's force, then you can just charge in directly to the opponent's center. Provided you are able to keep the Center, you will have no problems.
-
-Use your common sense to figure out under what circumstances the general principles of Jun Fan apply. These principles were often sayings to help people remember what to do. If you stick too dogmatically to a saying, then you could also be done in by it.""",
-
-    40: """Restrict Movement (Trapping) Theory
-
-The most dangerous opponent is one who is at close range with free use of both arms and legs. At high speeds it is not possible to predict or deflect all attacks. You are bound to get hit. World champion boxers are not able to avoid all hits.
-
-When in close contact with the opponent, try to restrict the opponent's movement. This increases your chances and decreases those of the opponent. Use one arm to control two. For example, use Gum Sau (pinning hand) to control the elbow of the opponent. When at close range, use your leg to trap the opponent's leg so that he cannot kick. There is a famous saying, "Allow the opponent's useless actions, but prevent is useful actions." If you try to control the opponent totally, then he will fight much harder than usual.""",
-
-    41: """The Meaning Behind the Jeet Kune Do Symbol
-
-The Chinese phrases surrounding the symbol are: "Using No Way as Way" and "Having No Limitation as Limitation". Regarding the first statement, one is to approach combat without any preconceived notions, and simply respond to "what is." In this way, the martial artist is adaptable and pliable enough to fit in with any opponent and situation instantly. He is using no particular or set way that was preconditioned in him. "No-mindedness" is a term often used to describe this state of unconscious consciousness or conscious unconsciousness. And, indeed, it is an ideal state that is difficult to attain but which one aspires to. In addition, one tries to be like water when using this "no-way" approach. Water automatically assumes the container that it is poured in, thereby constantly fitting in with and adapting to the situation.
-
-By having no limitation as the only limitation, one can transcend martial arts boundaries that are set by style, tradition, race, individual preferences, etc. Lee gave the JKD man the freedom to explore other martial arts with the only limitation being that he has only has two hands and two feet and the objective is how to use them to the maximum. Furthermore, Lee wanted us to search deep within ourselves to find what works best for each one of us. No longer are we dependent on the teachings of various styles or teachers. But by taking an honest assessment of our own strengths and weaknesses, we can improve our martial skill as well as our daily living. Like he said, "Knowledge ultimately, means self-knowledge." With this freedom to improve our skill and life in any way that we like, one is able to honestly express one's self."""
-}
+def load_tk():
+    """Import tkinter into this module's globals"""
+    global tk, messagebox, scrolledtext
+    import tkinter as tk
+    from tkinter import messagebox, scrolledtext
 
 
 class FlashcardApp:
-    def __init__(self, root):
+    def __init__(self, root, storage='log', profiler=None, seed=None, record_path=None,
+                 decks=None, concepts=None, typed=False):
         self.root = root
+        self.profiler = profiler if profiler is not None else NullProfiler()
+        self.profiler.instrument(self, PROFILED_CALLBACKS)
         self.root.title("Jeet Kune Do Training - Flashcard App")
         self.root.geometry("900x750")
         self.root.configure(bg='#1a1a1a')
 
         # Data
+        self.study = Study(storage, seed, record_path, decks, concepts)
         self.flashcards = []
+        self.session = None
+        self.scheduler = None
+        self.deck_watcher = None
         self.current_card = None
-        self.score = 0
-        self.total_answered = 0
+        self.current_source = None
+        self.prefetcher = None
+        self.paint_latency = LatencyStats()  # Next Question click until the card is drawn
+        self.search = None
+        self.search_results = []
+        self.typed = typed          # Type answers instead of picking options
+        self.matcher = None         # AnswerMatcher for the question on screen
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
 
         # Load flashcards
         self.load_flashcards()
@@ -338,21 +72,34 @@ class FlashcardApp:
         # Load first question
         self.next_question()
 
-    def load_flashcards(self):
-        """Load flashcards from CSV file"""
-        csv_path = Path(__file__).parent / "data" / "jkd_flashcards.csv"
+        if self.profiler.enabled:
+            self.profiler.attach(self.root)
+            self.root.bind('<F12>', self.dump_profile)
+
+        if self.deck_watcher is not None:
+            self.root.after(int(POLL_INTERVAL * 1000), self.poll_deck)
 
+    def load_flashcards(self):
+        """Load flashcards from the selected decks or the SQLite database"""
         try:
-            with open(csv_path, 'r', encoding='utf-8') as file:
-                reader = csv.DictReader(file)
-                self.flashcards = list(reader)
-
-            if not self.flashcards:
-                messagebox.showerror("Error", "No flashcards found in CSV file!")
-                self.root.quit()
-        except FileNotFoundError:
-            messagebox.showerror("Error", f"Flashcard file not found at: {csv_path}")
+            for message in self.study.open():
+                messagebox.showwarning("Flashcard Problems", message)
+        except FileNotFoundError as e:
+            messagebox.showerror("Error", f"Flashcard file not found at: {e.filename}")
             self.root.quit()
+            return
+        except (KeyError, ValueError) as e:
+            if self.study.deck_names is None:
+                messagebox.showerror("Error", str(e))
+            else:
+                messagebox.showerror("Error", f"Can't load decks {self.study.deck_names}: {e}")
+            self.root.quit()
+            return
+        self.flashcards = self.study.deck
+        self.scheduler = self.study.scheduler
+        self.session = self.study.session
+        self.deck_watcher = self.study.deck_watcher
+        self.prefetcher = QuestionPrefetcher(self.session, CONCEPT_TEXTS)
 
     def setup_ui(self):
         """Setup the user interface"""
@@ -376,7 +123,7 @@ class FlashcardApp:
 
         self.score_label = tk.Label(
             score_frame,
-            text="Score: 0/0 (0%)",
+            text=self.session.scorer.summary() if self.session else "Score: 0/0 (0%)",
             font=('Arial', 14),
             bg='#1a1a1a',
             fg='#4CAF50'
@@ -432,6 +179,27 @@ class FlashcardApp:
             btn.pack(fill='x', pady=5)
             self.answer_buttons.append(btn)
 
+        # Typed answer entry, shown instead of the buttons in typed mode
+        self.typed_frame = tk.Frame(self.buttons_frame, bg='#1a1a1a')
+        self.typed_entry = tk.Entry(
+            self.typed_frame,
+            font=('Arial', 16),
+            bg='#e0e0e0',
+            fg='#000000',
+            relief='flat'
+        )
+        self.typed_entry.pack(fill='x', ipady=10, pady=5)
+        self.typed_entry.bind('<KeyRelease>', self.on_typed_key)
+        self.typed_entry.bind('<Return>', self.submit_typed)
+        self.typed_hint = tk.Label(
+            self.typed_frame,
+            text="",
+            font=('Arial', 11),
+            bg='#1a1a1a',
+            fg='#888888'
+        )
+        self.typed_hint.pack(anchor='w')
+
         # Feedback frame
         self.feedback_frame = tk.Frame(self.root, bg='#1a1a1a', height=100)
         self.feedback_frame.pack(fill='x', padx=10, pady=5)
@@ -501,76 +269,219 @@ class FlashcardApp:
         )
         reset_btn.pack(side='left')
 
-    def next_question(self):
-        """Load next random question"""
+        self.latency_label = tk.Label(
+            self.root,
+            text="",
+            font=('Arial', 9),
+            bg='#1a1a1a',
+            fg='#555555'
+        )
+        self.latency_label.pack(side='bottom', anchor='e', padx=10)
+
+        search_btn = tk.Button(
+            control_frame,
+            text="🔍 Search",
+            font=('Arial', 12),
+            bg='#9C27B0',
+            fg='#000000',
+            activebackground='#7B1FA2',
+            activeforeground='#000000',
+            relief='flat',
+            cursor='hand2',
+            padx=20,
+            pady=10,
+            command=self.show_search
+        )
+        search_btn.pack(side='left', padx=10)
+
+        drill_btn = tk.Button(
+            control_frame,
+            text="🎯 Drill",
+            font=('Arial', 12),
+            bg='#FF9800',
+            fg='#000000',
+            activebackground='#F57C00',
+            activeforeground='#000000',
+            relief='flat',
+            cursor='hand2',
+            padx=20,
+            pady=10,
+            command=self.show_drill
+        )
+        drill_btn.pack(side='left')
+
+        stats_btn = tk.Button(
+            control_frame,
+            text="📊 Stats",
+            font=('Arial', 12),
+            bg='#607D8B',
+            fg='#000000',
+            activebackground='#455A64',
+            activeforeground='#000000',
+            relief='flat',
+            cursor='hand2',
+            padx=20,
+            pady=10,
+            command=self.show_stats
+        )
+        stats_btn.pack(side='left', padx=10)
+
+        self.typed_btn = tk.Button(
+            control_frame,
+            text="⌨ Type",
+            font=('Arial', 12),
+            bg='#795548',
+            fg='#000000',
+            activebackground='#5D4037',
+            activeforeground='#000000',
+            relief='flat',
+            cursor='hand2',
+            padx=20,
+            pady=10,
+            command=self.toggle_typed
+        )
+        self.typed_btn.pack(side='left')
+        self.show_answer_widgets()
+
+    def show_answer_widgets(self):
+        """Show the answer buttons, or the entry in typed mode"""
+        if self.typed:
+            for btn in self.answer_buttons:
+                btn.pack_forget()
+            self.typed_frame.pack(fill='x', pady=5)
+            self.typed_btn.config(text="☰ Options")
+        else:
+            self.typed_frame.pack_forget()
+            for btn in self.answer_buttons:
+                btn.pack(fill='x', pady=5)
+            self.typed_btn.config(text="⌨ Type")
+
+    def toggle_typed(self):
+        """Switch between typing answers and picking options"""
+        self.typed = not self.typed
+        self.show_answer_widgets()
+        if self.session.current is not None and not self.session.answered:
+            self.start_typed(self.session.current)
+        elif self.typed:
+            self.typed_entry.delete(0, 'end')
+            self.typed_hint.config(text="")
+
+    def next_question(self, card_index=None):
+        """Load the next scheduled question, or a specific card"""
+        clicked = time.perf_counter()
+
         # Reset UI
         self.feedback_label.config(text="")
         self.next_btn.config(state='disabled')
         self.source_btn.config(state='normal')
 
-        # Pick random flashcard
-        self.current_card = random.choice(self.flashcards)
+        # Take the next flashcard, prepared while the app was idle
+        prepared = self.prefetcher.take(card_index)
+        question = self.session.serve(prepared.question)
+        self.current_card = question.card
+        self.current_source = prepared.source_text
 
         # Update question
         self.question_label.config(text=self.current_card['question_text'])
-        self.concept_label.config(text=f"Concept #{self.current_card['concept_number']}: {self.current_card['concept_name']}")
-
-        # Prepare answers
-        answers = [
-            self.current_card['correct_answer'],
-            self.current_card['wrong_answer_1'],
-            self.current_card['wrong_answer_2'],
-            self.current_card['wrong_answer_3']
-        ]
-        random.shuffle(answers)
+        concept_text = f"Concept #{self.current_card['concept_number']}: {self.current_card['concept_name']}"
+        if isinstance(self.session.selector, FilteredSelector):
+            concept_text += f"  (filtered: {len(self.session.selector.indices)} cards)"
+        elif isinstance(self.session.selector, WeakAreaSelector):
+            concept_text += f"  (drill: {len(self.session.selector)} cards)"
+        self.concept_label.config(text=concept_text)
 
         # Update buttons
         for i, btn in enumerate(self.answer_buttons):
-            answer_text = answers[i]
             btn.config(
-                text=f"{chr(65+i)}) {answer_text}",
+                text=f"{chr(65+i)}) {question.options[i]}",
                 bg='#e0e0e0',
                 fg='#000000',
                 state='normal',
-                command=lambda ans=answer_text: self.check_answer(ans)
+                command=lambda index=i: self.check_answer(index)
             )
 
-    def check_answer(self, selected_answer):
-        """Check if the selected answer is correct"""
-        correct_answer = self.current_card['correct_answer']
-        is_correct = selected_answer == correct_answer
+        if self.typed:
+            self.start_typed(question)
+
+        # Runs after Tk's pending redraws, so the card is on screen by then
+        self.root.after_idle(self.on_question_painted, clicked)
+
+    def start_typed(self, question):
+        """Clear the entry for a typed answer to `question`"""
+        from typed_answers import AnswerMatcher
+
+        self.matcher = AnswerMatcher(question.correct_answer)
+        self.typed_entry.config(state='normal', bg='#e0e0e0')
+        self.typed_entry.delete(0, 'end')
+        self.typed_hint.config(text="Type your answer and press Enter", fg='#888888')
+        self.typed_entry.focus_set()
 
-        # Update score
-        self.total_answered += 1
-        if is_correct:
-            self.score += 1
+    def on_typed_key(self, event=None):
+        """Grade the answer as it is typed"""
+        from typed_answers import typing_hint
+
+        if self.matcher is None or self.session.answered:
+            return
+        text = self.typed_entry.get()
+        if text.strip():
+            match = self.matcher.grade(text)
+            self.typed_hint.config(text=typing_hint(match),
+                                   fg='#4CAF50' if match.is_correct else '#888888')
+        else:
+            self.typed_hint.config(text="Type your answer and press Enter", fg='#888888')
+
+    def submit_typed(self, event=None):
+        """Score the typed answer; Enter again moves to the next question"""
+        if self.session.answered:
+            self.next_question()
+            return
+        text = self.typed_entry.get()
+        if not text.strip():
+            return
+        result = self.session.answer_typed(text, self.matcher)
+        self.score_label.config(text=self.session.scorer.summary())
+        for i, btn in enumerate(self.answer_buttons):
+            if i == result.question.correct_index:
+                btn.config(bg='#4CAF50', fg='#ffffff', state='disabled')
+            else:
+                btn.config(state='disabled', bg='#888888', fg='#ffffff')
+        self.typed_entry.config(bg='#4CAF50' if result.is_correct else '#f44336')
+        self.typed_hint.config(text="Press Enter for the next question", fg='#888888')
+        self.feedback_label.config(
+            text=result.feedback(),
+            fg='#4CAF50' if result.is_correct else '#f44336'
+        )
+        self.next_btn.config(state='normal')
+
+    def on_question_painted(self, clicked):
+        """Record click-to-paint latency, then prepare upcoming cards"""
+        elapsed = time.perf_counter() - clicked
+        self.paint_latency.record(elapsed)
+        self.profiler.record('click_to_paint', elapsed)
+        self.latency_label.config(text=f"Next question: {self.paint_latency.summary()}")
+        self.prefetcher.fill()
+
+    def check_answer(self, selected_index):
+        """Check if the selected answer is correct"""
+        result = self.session.answer(selected_index)
 
         # Update score display
-        percentage = int((self.score / self.total_answered) * 100) if self.total_answered > 0 else 0
-        self.score_label.config(text=f"Score: {self.score}/{self.total_answered} ({percentage}%)")
+        self.score_label.config(text=self.session.scorer.summary())
 
         # Update button colors and disable all
-        for btn in self.answer_buttons:
-            answer_text = btn.cget('text')[3:]  # Remove "A) ", "B) ", etc.
-
-            if answer_text == correct_answer:
+        for i, btn in enumerate(self.answer_buttons):
+            if i == result.question.correct_index:
                 btn.config(bg='#4CAF50', fg='#ffffff', state='disabled')
-            elif answer_text == selected_answer and not is_correct:
+            elif i == selected_index and not result.is_correct:
                 btn.config(bg='#f44336', fg='#ffffff', state='disabled')
             else:
                 btn.config(state='disabled', bg='#888888', fg='#ffffff')
 
         # Show feedback
-        if is_correct:
-            self.feedback_label.config(
-                text=f"✓ Correct! {self.current_card.get('explanation', '')}",
-                fg='#4CAF50'
-            )
-        else:
-            self.feedback_label.config(
-                text=f"✗ Wrong. Correct answer: {correct_answer}. {self.current_card.get('explanation', '')}",
-                fg='#f44336'
-            )
+        self.feedback_label.config(
+            text=result.feedback(),
+            fg='#4CAF50' if result.is_correct else '#f44336'
+        )
 
         # Enable next button
         self.next_btn.config(state='normal')
@@ -578,21 +489,294 @@ class FlashcardApp:
     def reset_score(self):
         """Reset the score counter"""
         if messagebox.askyesno("Reset Score", "Are you sure you want to reset your score?"):
-            self.score = 0
-            self.total_answered = 0
-            self.score_label.config(text="Score: 0/0 (0%)")
+            self.session.reset_score()
+            self.score_label.config(text=self.session.scorer.summary())
             self.next_question()
 
-    def show_source_material(self):
-        """Show the full source text for the current concept"""
-        if not self.current_card:
+    def on_close(self):
+        """Save progress and close the app"""
+        self.study.close()
+        if self.profiler.enabled:
+            self.dump_profile()
+            self.profiler.detach()
+        self.root.destroy()
+
+    def dump_profile(self, event=None):
+        """Print the profiling summary and save it as JSON when a path was given"""
+        print(self.profiler.report())
+        path = self.profiler.save()
+        if path:
+            print(f"Profile written to {path}")
+
+    def poll_deck(self):
+        """Pick up edits to the deck CSV without restarting"""
+        try:
+            with warnings.catch_warnings(record=True) as caught:
+                warnings.simplefilter('always')
+                changes = self.deck_watcher.poll()
+        except (OSError, KeyError, ValueError) as e:
+            # Caught mid-save or missing columns: try again on the next poll
+            changes = None
+            caught = []
+            print(f"Deck reload failed: {e}")
+        for warning in caught:
+            messagebox.showwarning("Flashcard Problems", str(warning.message))
+        if changes is not None and any(changes):
+            # Prepared questions may hold the old text of edited cards
+            self.prefetcher.clear()
+            if self.search is not None:
+                for card_index in changes.added + changes.changed:
+                    self.search.update_card(self.flashcards, card_index)
+                for card_index in changes.removed:
+                    self.search.remove(card_index)
+            self.latency_label.config(
+                text=f"Deck updated: {len(changes.added)} added, "
+                     f"{len(changes.changed)} changed, {len(changes.removed)} removed"
+            )
+            self.prefetcher.fill()
+        self.root.after(int(POLL_INTERVAL * 1000), self.poll_deck)
+
+    def show_search(self):
+        """Search cards and source material by keyword"""
+        from search_index import DeckSearch, default_index_path
+
+        if self.search is None:
+            cache_path = None
+            if not self.study.uses_database and self.study.progress_name() is None:
+                cache_path = default_index_path(DEFAULT_DECK_PATH)
+            self.search = DeckSearch.build(self.flashcards, CONCEPT_TEXTS, cache_path)
+            if self.deck_watcher is not None:
+                for card_index in self.deck_watcher.removed:
+                    self.search.remove(card_index)
+
+        popup = tk.Toplevel(self.root)
+        popup.title("Search")
+        popup.geometry("700x500")
+        popup.configure(bg='#2d2d2d')
+
+        query = tk.StringVar()
+        entry = tk.Entry(popup, textvariable=query, font=('Arial', 14))
+        entry.pack(fill='x', padx=20, pady=15)
+        entry.focus_set()
+
+        results_list = tk.Listbox(
+            popup,
+            font=('Arial', 12),
+            bg='#ffffff',
+            fg='#000000',
+            activestyle='none'
+        )
+        results_list.pack(fill='both', expand=True, padx=20)
+
+        status_label = tk.Label(popup, text="", font=('Arial', 11), bg='#2d2d2d', fg='#888888')
+        status_label.pack(pady=5)
+
+        def run_search(*_):
+            self.search_results = self.search.search(
+                query.get(), self.flashcards, CONCEPT_TEXTS, limit=200
+            )
+            results_list.delete(0, 'end')
+            for result in self.search_results:
+                if result.kind == 'card':
+                    results_list.insert('end', f"#{result.concept_number}  {result.title}")
+                else:
+                    results_list.insert('end', f"📖 #{result.concept_number}  {result.title}")
+            cards = sum(1 for result in self.search_results if result.kind == 'card')
+            status_label.config(text=f"{cards} cards, {len(self.search_results) - cards} source texts")
+
+        def open_result(*_):
+            selection = results_list.curselection()
+            if not selection:
+                return
+            result = self.search_results[selection[0]]
+            if result.kind == 'card':
+                self.next_question(result.card_index)
+            else:
+                self.show_source_material(result.concept_number, result.title)
+
+        def quiz_results():
+            indices = [result.card_index for result in self.search_results if result.kind == 'card']
+            if indices:
+                self.set_card_filter(indices)
+                popup.destroy()
+
+        query.trace_add('write', run_search)
+        results_list.bind('<Double-Button-1>', open_result)
+        results_list.bind('<Return>', open_result)
+
+        buttons_frame = tk.Frame(popup, bg='#2d2d2d')
+        buttons_frame.pack(fill='x', padx=20, pady=10)
+        for text, command in (
+            ("Open", open_result),
+            ("Quiz These Cards", quiz_results),
+            ("Clear Filter", self.clear_card_filter),
+        ):
+            tk.Button(
+                buttons_frame,
+                text=text,
+                font=('Arial', 12),
+                bg='#4CAF50',
+                fg='#000000',
+                activebackground='#45a049',
+                activeforeground='#000000',
+                relief='flat',
+                cursor='hand2',
+                padx=15,
+                pady=5,
+                command=command
+            ).pack(side='left', padx=5)
+
+    def show_stats(self):
+        """Show accuracy, retention and response times from the review history"""
+        from analytics import format_report
+
+        try:
+            data = self.study.review_data()
+        except ImportError as e:
+            messagebox.showerror("Stats", str(e))
             return
 
-        concept_num = int(self.current_card['concept_number'])
-        concept_name = self.current_card['concept_name']
+        popup = tk.Toplevel(self.root)
+        popup.title("Progress Stats")
+        popup.geometry("700x600")
+        popup.configure(bg='#2d2d2d')
 
-        # Get the source text
-        source_text = CONCEPT_TEXTS.get(concept_num, "Source material not found.")
+        text_area = scrolledtext.ScrolledText(
+            popup,
+            font=('Courier', 12),
+            bg='#ffffff',
+            fg='#000000',
+            wrap=tk.NONE,
+            padx=15,
+            pady=15
+        )
+        text_area.pack(fill='both', expand=True, padx=20, pady=(20, 10))
+        text_area.insert('1.0', format_report(data, self.flashcards))
+        text_area.config(state='disabled')
+
+        tk.Button(
+            popup,
+            text="Close",
+            font=('Arial', 12, 'bold'),
+            bg='#4CAF50',
+            fg='#000000',
+            activebackground='#45a049',
+            activeforeground='#000000',
+            relief='flat',
+            cursor='hand2',
+            padx=40,
+            pady=10,
+            command=popup.destroy
+        ).pack(pady=15)
+
+    def show_drill(self):
+        """Pick concepts and question types to drill, weighted toward missed cards"""
+        cards = self.flashcards.cards
+        concepts = sorted({(cards.concept_number(i), cards.concept_name(i)) for i in range(len(cards))})
+        question_types = sorted(set(cards.question_types))
+
+        popup = tk.Toplevel(self.root)
+        popup.title("Drill Weak Areas")
+        popup.geometry("700x500")
+        popup.configure(bg='#2d2d2d')
+
+        tk.Label(
+            popup,
+            text="Missed cards and concepts come up more often. Select nothing to drill everything.",
+            font=('Arial', 11),
+            bg='#2d2d2d',
+            fg='#888888'
+        ).pack(pady=10)
+
+        lists_frame = tk.Frame(popup, bg='#2d2d2d')
+        lists_frame.pack(fill='both', expand=True, padx=20)
+
+        def make_list(items):
+            listbox = tk.Listbox(
+                lists_frame,
+                font=('Arial', 12),
+                bg='#ffffff',
+                fg='#000000',
+                selectmode='multiple',
+                exportselection=False,
+                activestyle='none'
+            )
+            for item in items:
+                listbox.insert('end', item)
+            listbox.pack(side='left', fill='both', expand=True, padx=5)
+            return listbox
+
+        concept_list = make_list(f"#{number}  {name}" for number, name in concepts)
+        type_list = make_list(question_types)
+
+        status_label = tk.Label(popup, text="", font=('Arial', 11), bg='#2d2d2d', fg='#888888')
+        status_label.pack(pady=5)
+
+        def start_drill():
+            try:
+                self.set_drill(
+                    [concepts[i][0] for i in concept_list.curselection()],
+                    [question_types[i] for i in type_list.curselection()]
+                )
+            except ValueError as e:
+                status_label.config(text=str(e))
+                return
+            popup.destroy()
+
+        buttons_frame = tk.Frame(popup, bg='#2d2d2d')
+        buttons_frame.pack(fill='x', padx=20, pady=10)
+        for text, command in (
+            ("Start Drill", start_drill),
+            ("Stop Drill", self.clear_card_filter),
+        ):
+            tk.Button(
+                buttons_frame,
+                text=text,
+                font=('Arial', 12),
+                bg='#FF9800',
+                fg='#000000',
+                activebackground='#F57C00',
+                activeforeground='#000000',
+                relief='flat',
+                cursor='hand2',
+                padx=15,
+                pady=5,
+                command=command
+            ).pack(side='left', padx=5)
+
+    def set_drill(self, concepts=None, question_types=None):
+        """Drill the given concepts and question types until the filter is cleared"""
+        selector = WeakAreaSelector.from_scheduler(
+            self.flashcards, self.scheduler, self.session.rng,
+            concepts=concepts, question_types=question_types
+        )
+        self.prefetcher.clear()
+        self.session.set_selector(selector)
+        self.next_question()
+
+    def set_card_filter(self, card_indices):
+        """Quiz only the given cards until the filter is cleared"""
+        self.prefetcher.clear()
+        self.session.set_selector(FilteredSelector(card_indices, self.session.rng, base=self.scheduler))
+        self.next_question()
+
+    def clear_card_filter(self):
+        """Go back to quizzing the whole deck"""
+        if self.session.selector is not self.scheduler:
+            self.prefetcher.clear()
+            self.session.set_selector(self.scheduler)
+            self.next_question()
+
+    def show_source_material(self, concept_num=None, concept_name=None):
+        """Show the full source text for a concept, by default the current one"""
+        if concept_num is None:
+            if not self.current_card:
+                return
+            concept_num = int(self.current_card['concept_number'])
+            concept_name = self.current_card['concept_name']
+            source_text = self.current_source
+        else:
+            source_text = CONCEPT_TEXTS.get(concept_num, SOURCE_NOT_FOUND)
 
         # Create popup window
         popup = tk.Toplevel(self.root)
@@ -647,8 +831,38 @@ class FlashcardApp:
 
 
 def main():
+    parser = argparse.ArgumentParser(description="Jeet Kune Do flashcard trainer")
+    parser.add_argument('--storage', choices=('log', 'sqlite'), default='log',
+                        help="where progress is kept (default: review log files)")
+    parser.add_argument('--profile', nargs='?', const='', metavar='JSON',
+                        help="time UI callbacks; print a summary on exit or F12, "
+                             "and save it to JSON if a path is given")
+    parser.add_argument('--deck', action='append', metavar='NAME',
+                        help="deck from data/ to study, e.g. level-3/striking (repeatable; "
+                             "see deck_library.py for the list)")
+    parser.add_argument('--concept', type=int, action='append', metavar='NUMBER',
+                        help="study every deck that teaches this concept (repeatable)")
+    parser.add_argument('--seed', type=int, help="seed for card order and answer shuffles")
+    parser.add_argument('--record', metavar='FILE',
+                        help="record the session for session_replay.py")
+    parser.add_argument('--ui', choices=('tk', 'curses', 'plain'), default='tk',
+                        help="window (default), full-screen terminal, or line-by-line terminal")
+    parser.add_argument('--typed', action='store_true',
+                        help="type each answer instead of picking from the options")
+    args = parser.parse_args()
+
+    if args.ui != 'tk':
+        from terminal_app import run_terminal
+        study = Study(args.storage, args.seed, args.record, args.deck, args.concept)
+        sys.exit(run_terminal(study, CONCEPT_TEXTS, curses_ui=args.ui == 'curses',
+                              typed=args.typed))
+
+    load_tk()
     root = tk.Tk()
-    app = FlashcardApp(root)
+    profiler = Profiler(args.profile or None) if args.profile is not None else None
+    app = FlashcardApp(root, storage=args.storage, profiler=profiler,
+                       seed=args.seed, record_path=args.record,
+                       decks=args.deck, concepts=args.concept, typed=args.typed)
     root.mainloop()
 
 
@@ -0,0 +1,256 @@
+"""
+UI Instrumentation
+Opt-in timing of app callbacks, widget reconfigurations and event-loop lag
+"""
+
+import functools
+import json
+import time
+
+
+# Sub-buckets per power of two; 2**7 keeps every recorded value within 1%
+PRECISION_BITS = 7
+
+# How often the event-loop lag probe asks Tk to wake it
+LAG_INTERVAL_MS = 50
+
+
+class Histogram:
+    """HDR-style log-linear histogram of durations, stored in microseconds
+
+    Values below 2**PRECISION_BITS µs get a bucket each; above that every
+    power of two is split into 2**(PRECISION_BITS - 1) equal buckets, so
+    memory grows with the log of the largest value while percentiles keep
+    a fixed relative precision. Only non-empty buckets are stored.
+    """
+
+    __slots__ = ('counts', 'count', 'total', 'min', 'max')
+
+    def __init__(self):
+        self.counts = {}
+        self.count = 0
+        self.total = 0
+        self.min = 0
+        self.max = 0
+
+    @staticmethod
+    def bucket_of(value):
+        sub_buckets = 1 << PRECISION_BITS
+        if value < sub_buckets:
+            return value
+        shift = value.bit_length() - PRECISION_BITS
+        half = sub_buckets >> 1
+        return sub_buckets + (shift - 1) * half + (value >> shift) - half
+
+    @staticmethod
+    def bucket_range(bucket):
+        """Lowest and highest value (µs) that fall into a bucket"""
+        sub_buckets = 1 << PRECISION_BITS
+        if bucket < sub_buckets:
+            return bucket, bucket
+        half = sub_buckets >> 1
+        shift, offset = divmod(bucket - sub_buckets, half)
+        shift += 1
+        low = (half + offset) << shift
+        return low, low + (1 << shift) - 1
+
+    def record(self, seconds):
+        value = max(0, int(seconds * 1_000_000))
+        bucket = self.bucket_of(value)
+        self.counts[bucket] = self.counts.get(bucket, 0) + 1
+        if not self.count or value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+        self.count += 1
+        self.total += value
+
+    def merge(self, other):
+        """Add another histogram's samples to this one"""
+        for bucket, count in other.counts.items():
+            self.counts[bucket] = self.counts.get(bucket, 0) + count
+        if other.count:
+            self.min = other.min if not self.count else min(self.min, other.min)
+            self.max = max(self.max, other.max)
+        self.count += other.count
+        self.total += other.total
+
+    def percentile(self, fraction):
+        """Value in seconds at or below which `fraction` of the samples lie"""
+        if not self.count:
+            return 0.0
+        rank = max(1, int(fraction * self.count + 0.5))
+        seen = 0
+        for bucket in sorted(self.counts):
+            seen += self.counts[bucket]
+            if seen >= rank:
+                low, high = self.bucket_range(bucket)
+                return min(max((low + high) / 2, self.min), self.max) / 1_000_000
+        return self.max / 1_000_000
+
+    @property
+    def mean(self):
+        return self.total / self.count / 1_000_000 if self.count else 0.0
+
+    def to_dict(self):
+        return {
+            'count': self.count,
+            'min_ms': self.min / 1000,
+            'mean_ms': round(self.mean * 1000, 3),
+            'p50_ms': round(self.percentile(0.5) * 1000, 3),
+            'p90_ms': round(self.percentile(0.9) * 1000, 3),
+            'p99_ms': round(self.percentile(0.99) * 1000, 3),
+            'max_ms': self.max / 1000,
+            'buckets': {str(bucket): count for bucket, count in sorted(self.counts.items())},
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        histogram = cls()
+        histogram.counts = {int(bucket): count for bucket, count in data['buckets'].items()}
+        histogram.count = data['count']
+        histogram.total = round(data['mean_ms'] * 1000 * data['count'])
+        histogram.min = round(data['min_ms'] * 1000)
+        histogram.max = round(data['max_ms'] * 1000)
+        return histogram
+
+
+class NullProfiler:
+    """Stand-in used when profiling is off: instrument() leaves methods alone"""
+
+    enabled = False
+
+    def instrument(self, obj, names):
+        pass
+
+    def record(self, name, seconds):
+        pass
+
+    def attach(self, root):
+        pass
+
+    def report(self):
+        return ""
+
+
+class Profiler:
+    """Wall-time histograms per callback, widget config counts and Tk loop lag
+
+    instrument() wraps named methods on one instance, so an app built with
+    a NullProfiler runs its original methods untouched. attach() starts the
+    lag probe and counts configure() calls on every Tk widget.
+    """
+
+    enabled = True
+
+    def __init__(self, output_path=None, lag_interval_ms=LAG_INTERVAL_MS):
+        self.output_path = output_path
+        self.lag_interval_ms = lag_interval_ms
+        self.histograms = {}
+        self.widget_configs = {}
+        self.started = time.perf_counter()
+        self._root = None
+        self._expected = 0.0
+        self._original_configure = None
+
+    def histogram(self, name):
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            histogram = self.histograms[name] = Histogram()
+        return histogram
+
+    def record(self, name, seconds):
+        self.histogram(name).record(seconds)
+
+    def timed(self, name, function):
+        """Wrap `function` so every call's wall time is recorded under `name`"""
+        histogram = self.histogram(name)
+        clock = time.perf_counter
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            start = clock()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                histogram.record(clock() - start)
+        return wrapper
+
+    def instrument(self, obj, names):
+        """Replace each named bound method of obj with a timed one"""
+        for name in names:
+            setattr(obj, name, self.timed(name, getattr(obj, name)))
+
+    def attach(self, root):
+        """Start counting widget reconfigurations and probing event-loop lag"""
+        import tkinter
+
+        if self._original_configure is None:
+            original = self._original_configure = tkinter.Misc.configure
+            counts = self.widget_configs
+
+            @functools.wraps(original)
+            def configure(widget, cnf=None, **kw):
+                if cnf or kw:
+                    kind = type(widget).__name__
+                    counts[kind] = counts.get(kind, 0) + 1
+                return original(widget, cnf, **kw)
+
+            tkinter.Misc.configure = tkinter.Misc.config = configure
+        self._root = root
+        self._expected = time.perf_counter() + self.lag_interval_ms / 1000
+        root.after(self.lag_interval_ms, self._probe_lag)
+
+    def detach(self):
+        """Restore tkinter's configure() and stop the lag probe"""
+        if self._original_configure is not None:
+            import tkinter
+
+            tkinter.Misc.configure = tkinter.Misc.config = self._original_configure
+            self._original_configure = None
+        self._root = None
+
+    def _probe_lag(self):
+        if self._root is None:
+            return
+        now = time.perf_counter()
+        self.record('event_loop_lag', max(0.0, now - self._expected))
+        self._expected = now + self.lag_interval_ms / 1000
+        self._root.after(self.lag_interval_ms, self._probe_lag)
+
+    def to_dict(self):
+        return {
+            'uptime_seconds': round(time.perf_counter() - self.started, 3),
+            'histograms': {name: histogram.to_dict()
+                           for name, histogram in sorted(self.histograms.items())},
+            'widget_configs': dict(sorted(self.widget_configs.items())),
+        }
+
+    def save(self, path=None):
+        """Write the profile as JSON; returns the path written, if any"""
+        path = path or self.output_path
+        if path is None:
+            return None
+        with open(path, 'w', encoding='utf-8') as file:
+            json.dump(self.to_dict(), file, indent=2)
+            file.write('\n')
+        return path
+
+    def report(self):
+        """Human-readable summary table"""
+        lines = [f"{'callback':<24}{'calls':>8}{'p50 ms':>10}{'p90 ms':>10}"
+                 f"{'p99 ms':>10}{'max ms':>10}"]
+        for name, histogram in sorted(self.histograms.items()):
+            if not histogram.count:
+                continue
+            lines.append(
+                f"{name:<24}{histogram.count:>8}"
+                f"{histogram.percentile(0.5) * 1000:>10.2f}"
+                f"{histogram.percentile(0.9) * 1000:>10.2f}"
+                f"{histogram.percentile(0.99) * 1000:>10.2f}"
+                f"{histogram.max / 1000:>10.2f}"
+            )
+        if self.widget_configs:
+            configs = ", ".join(f"{kind} {count}" for kind, count in sorted(self.widget_configs.items()))
+            lines.append(f"widget reconfigurations: {configs}")
+        return "\n".join(lines)
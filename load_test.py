@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Quiz API Load Generator
+Simulated learners hammering a running quiz_server, with latency percentiles
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import time
+
+
+class Client:
+    """One keep-alive HTTP connection acting as one learner"""
+
+    def __init__(self, host, port, user):
+        self.host = host
+        self.port = port
+        self.user = user
+        self.reader = None
+        self.writer = None
+
+    async def connect(self):
+        self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+
+    async def request(self, method, path, payload=None):
+        body = json.dumps(payload).encode('utf-8') if payload is not None else b''
+        self.writer.write((
+            f"{method} {path} HTTP/1.1\r\n"
+            f"Host: {self.host}\r\n"
+            f"X-User: {self.user}\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            "\r\n"
+        ).encode('latin-1') + body)
+        status_line = await self.reader.readline()
+        length = 0
+        while True:
+            line = await self.reader.readline()
+            if line in (b'\r\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            if name.lower() == 'content-length':
+                length = int(value)
+        data = await self.reader.readexactly(length)
+        status = int(status_line.split()[1])
+        if status != 200:
+            raise RuntimeError(f"{method} {path} -> {status}: {data.decode('utf-8', 'replace')}")
+        return json.loads(data)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+
+async def learner(client, deadline, latencies, rng):
+    """Loop next card / answer until the deadline, recording each request's latency"""
+    await client.connect()
+    try:
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            card = await client.request('GET', '/api/next')
+            middle = time.perf_counter()
+            choice = rng.randrange(len(card['options']))
+            await client.request('POST', '/api/answer', {'choice': choice})
+            end = time.perf_counter()
+            latencies.append(middle - start)
+            latencies.append(end - middle)
+    finally:
+        client.close()
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(fraction * len(sorted_values)))
+    return sorted_values[index]
+
+
+async def run(host, port, learners, duration, seed):
+    rng = random.Random(seed)
+    latencies = []
+    deadline = time.perf_counter() + duration
+    start = time.perf_counter()
+    await asyncio.gather(*(
+        learner(Client(host, port, f"load-{seed}-{i}"), deadline, latencies,
+                random.Random(rng.random()))
+        for i in range(learners)
+    ))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        'learners': learners,
+        'requests': len(latencies),
+        'elapsed_seconds': elapsed,
+        'requests_per_second': len(latencies) / elapsed if elapsed else 0.0,
+        'p50_ms': percentile(latencies, 0.50) * 1000,
+        'p99_ms': percentile(latencies, 0.99) * 1000,
+        'max_ms': (latencies[-1] if latencies else 0.0) * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test a running quiz_server")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--learners', type=int, default=1000, help="concurrent connections")
+    parser.add_argument('--duration', type=float, default=10.0, help="seconds")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', action='store_true', help="print the report as JSON")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args.host, args.port, args.learners, args.duration, args.seed))
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    print(f"Learners:     {report['learners']:,}")
+    print(f"Requests:     {report['requests']:,} in {report['elapsed_seconds']:.1f}s "
+          f"({report['requests_per_second']:,.0f}/s)")
+    print(f"Latency p50:  {report['p50_ms']:.2f} ms")
+    print(f"Latency p99:  {report['p99_ms']:.2f} ms")
+    print(f"Latency max:  {report['max_ms']:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,322 @@
+#!/usr/bin/env python3
+"""
+Near-Duplicate Finder
+Finds cards that ask nearly the same thing, and wrong answers that nearly copy the right one
+
+Cards are compared with MinHash signatures and LSH banding (needs NumPy),
+so only cards that share a band are ever compared and the work grows
+roughly linearly with the deck instead of with every pair of cards.
+Questions are also compared on their own, against a much stricter
+threshold, so two cards asking the same question are found even when
+their options differ, while series like "Stage 1"/"Stage 2" are not.
+"""
+
+import argparse
+import csv
+import json
+import zlib
+from collections import namedtuple
+
+from distractors import WRONG_FIELDS, _TOKEN, normalize_answer
+
+
+# Minimum Jaccard similarity of two cards' shingles to report them
+DEFAULT_THRESHOLD = 0.6
+
+# Minimum Jaccard similarity of two questions alone to report their cards.
+# Series of cards differ in one word ("What is Attack Line 1/2?" is 64%),
+# so only questions that are nearly word for word the same count.
+QUESTION_THRESHOLD = 0.9
+
+# Minimum similarity of a wrong answer to the correct one to flag it
+OPTION_THRESHOLD = 0.8
+
+# MinHash values per card, split into BANDS bands of SIGNATURE_SIZE // BANDS rows.
+# Two cards become candidates when any band matches; with 32 bands of 5 a
+# pair at similarity 0.6 is found 92% of the time, at 0.7 99.7%, while
+# unrelated cards of a deck with a small vocabulary rarely collide.
+SIGNATURE_SIZE = 160
+BANDS = 32
+
+# Buckets larger than this (e.g. templated cards) pair each card only with
+# the next MAX_BUCKET cards in the bucket, so one bucket can't go quadratic
+MAX_BUCKET = 16
+
+# Shingles hashed against every permutation at once, few enough for the
+# hashes to stay in cache
+HASH_CHUNK = 1 << 13
+
+# Candidate pairs whose signatures are compared at once
+ESTIMATE_CHUNK = 1 << 16
+
+# Candidates whose signatures agree on less than threshold minus this are
+# dropped before the exact comparison
+ESTIMATE_SLACK = 0.15
+
+_SHINGLE_FIELDS = ('question_text', 'correct_answer') + WRONG_FIELDS
+_QUESTION_FIELDS = ('question_text',)
+
+NearDuplicate = namedtuple('NearDuplicate', 'first second similarity')
+
+
+def card_shingles(row, fields=_SHINGLE_FIELDS):
+    """Hashed words and word pairs of a card's question and options (or `fields`)
+
+    Words are CRC-32s, so a pair packs into one 64-bit number.
+    """
+    shingles = set()
+    for field in fields:
+        words = [zlib.crc32(word.encode('utf-8')) for word in _TOKEN.findall((row.get(field) or '').lower())]
+        shingles.update(words)
+        shingles.update([first << 32 | second for first, second in zip(words, words[1:])])
+    return shingles
+
+
+def jaccard(first, second):
+    if not first and not second:
+        return 1.0
+    return len(first & second) / len(first | second)
+
+
+def _character_grams(text):
+    """Character trigrams of a non-empty text, with its ends marked by spaces"""
+    text = f" {text} "
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def near_copies(correct, wrong, threshold=OPTION_THRESHOLD):
+    """[(field, similarity)] of wrong answers that nearly copy the correct answer
+
+    Takes normalised answers, the wrong ones in WRONG_FIELDS order, and
+    compares them as character trigrams. Exact copies are left to the
+    validator's indistinct_answer check.
+    """
+    correct_grams = None
+    flagged = []
+    for field, answer in zip(WRONG_FIELDS, wrong):
+        if not answer or answer == correct:
+            continue
+        if min(len(answer), len(correct)) < threshold * max(len(answer), len(correct)):
+            continue  # Too different in length to reach the threshold
+        if correct_grams is None:
+            correct_grams = _character_grams(correct)
+        grams = _character_grams(answer)
+        similarity = len(correct_grams & grams) / len(correct_grams | grams)
+        if similarity >= threshold:
+            flagged.append((field, similarity))
+    return flagged
+
+
+def near_copy_options(row, threshold=OPTION_THRESHOLD):
+    """near_copies() for a csv.DictReader or JSON row"""
+    correct = normalize_answer(row.get('correct_answer'))
+    wrong = [normalize_answer(row.get(field)) for field in WRONG_FIELDS]
+    return near_copies(correct, wrong, threshold)
+
+
+def _require_numpy():
+    try:
+        import numpy as np
+    except ImportError:
+        raise ImportError("Finding near-duplicate cards requires NumPy: pip install numpy") from None
+    return np
+
+
+def minhash_signatures(shingle_sets, size=SIGNATURE_SIZE, seed=1):
+    """(cards, size) uint32 MinHash signatures of each card's shingle set
+
+    Each column is the minimum over the card's shingles of one random
+    multiply-shift hash, the top 32 bits of (a * x + b) mod 2**64, which
+    NumPy computes without a division. Cards without shingles get a
+    signature no other card shares.
+    """
+    np = _require_numpy()
+    rng = np.random.default_rng(seed)
+    a = (rng.integers(0, 1 << 63, size, dtype=np.uint64) | np.uint64(1))[:, None]
+    b = rng.integers(0, 1 << 63, size, dtype=np.uint64)[:, None]
+
+    sets = [shingles or {(1 << 64) - 1 - index} for index, shingles in enumerate(shingle_sets)]
+    lengths = np.fromiter((len(shingles) for shingles in sets), dtype=np.int64, count=len(sets))
+    offsets = np.concatenate(([0], np.cumsum(lengths)))
+    values = np.fromiter((value for shingles in sets for value in shingles),
+                         dtype=np.uint64, count=int(offsets[-1]))
+
+    signatures = np.empty((len(sets), size), dtype=np.uint32)
+    card = 0
+    while card < len(sets):
+        # Whole cards per chunk, at least one
+        end = int(np.searchsorted(offsets, offsets[card] + HASH_CHUNK, 'right')) - 1
+        end = min(max(end, card + 1), len(sets))
+        start, stop = offsets[card], offsets[end]
+        hashed = a * values[start:stop]
+        hashed += b
+        hashed >>= np.uint64(32)
+        signatures[card:end] = np.minimum.reduceat(hashed, offsets[card:end] - start, axis=1).T
+        card = end
+    return signatures
+
+
+def lsh_candidates(signatures, bands=BANDS, max_bucket=MAX_BUCKET):
+    """Unique (first, second) card pairs, first < second, that share a band"""
+    np = _require_numpy()
+    count, size = signatures.shape
+    rows = size // bands
+    codes = []
+    for band in range(bands):
+        keys = np.zeros(count, dtype=np.uint64)
+        for column in signatures[:, band * rows:(band + 1) * rows].T:
+            keys = keys * np.uint64(0x9E3779B1) + column
+        order = np.argsort(keys, kind='stable')
+        ordered = keys[order]
+        # Equal keys sit next to each other; pair each card with the
+        # following cards of its bucket, at most max_bucket of them
+        for offset in range(1, max_bucket + 1):
+            same = np.flatnonzero(ordered[:-offset] == ordered[offset:])
+            if not len(same):
+                break
+            first, second = order[same], order[same + offset]
+            codes.append(np.minimum(first, second) * count + np.maximum(first, second))
+    if not codes:
+        return np.empty((0, 2), dtype=np.int64)
+    codes = np.sort(np.concatenate(codes))
+    codes = codes[np.concatenate(([True], codes[1:] != codes[:-1]))]
+    return np.stack((codes // count, codes % count), axis=1)
+
+
+def find_near_duplicates(rows, threshold=DEFAULT_THRESHOLD, question_threshold=QUESTION_THRESHOLD):
+    """NearDuplicate(first, second, similarity) for card pairs at or above threshold
+
+    Pairs whose questions alone reach `question_threshold` are reported
+    too, with the higher of the two similarities. Positions index into
+    `rows`; pairs come most similar first.
+
+    >>> def card(question, *options):
+    ...     return dict(zip(_SHINGLE_FIELDS, (question,) + options))
+    >>> rows = [card('Where else can you hold Wu Sao?', 'Inside gate', 'Chin', 'Chest', 'Hip'),
+    ...         card('Where else can you hold Wu Sao?', 'Outside gate', 'Knee', 'Back', 'Shoulder'),
+    ...         card('What is Attack Line 1?', 'Straight', 'Curved', 'Circular', 'Low'),
+    ...         card('What is Attack Line 2?', 'Angled', 'Hooked', 'Rising', 'High')]
+    >>> [(pair.first, pair.second) for pair in find_near_duplicates(rows)]
+    [(0, 1)]
+    """
+    np = _require_numpy()
+    if len(rows) < 2:
+        return []
+    shingles = [card_shingles(row) for row in rows]
+    questions = [card_shingles(row, _QUESTION_FIELDS) for row in rows]
+    signatures = minhash_signatures(shingles)
+    question_signatures = minhash_signatures(questions)
+    candidates = np.unique(np.concatenate((
+        lsh_candidates(signatures), lsh_candidates(question_signatures),
+    )), axis=0)
+
+    found = []
+    for start in range(0, len(candidates), ESTIMATE_CHUNK):
+        chunk = candidates[start:start + ESTIMATE_CHUNK]
+        likely = (
+            ((signatures[chunk[:, 0]] == signatures[chunk[:, 1]]).mean(axis=1)
+             >= threshold - ESTIMATE_SLACK)
+            | ((question_signatures[chunk[:, 0]] == question_signatures[chunk[:, 1]]).mean(axis=1)
+               >= question_threshold - ESTIMATE_SLACK)
+        )
+        for first, second in chunk[likely].tolist():
+            similarity = jaccard(shingles[first], shingles[second])
+            question_similarity = jaccard(questions[first], questions[second])
+            if question_similarity >= question_threshold:
+                similarity = max(similarity, question_similarity)
+            elif similarity < threshold:
+                continue
+            found.append(NearDuplicate(first, second, similarity))
+    found.sort(key=lambda pair: (-pair.similarity, pair.first, pair.second))
+    return found
+
+
+def _describe(row, limit=60):
+    text = (row.get('question_text') or '').strip()
+    return repr(text if len(text) <= limit else text[:limit - 3] + '...')
+
+
+def deck_warning(rows, near_copies=(), threshold=DEFAULT_THRESHOLD, limit=5):
+    """Summary of near-duplicate cards and near-copied answers, or None if there are none
+
+    Used when a deck is imported; `near_copies` are the validator's
+    near_copy_option Issues for the rows. Near-duplicate cards are skipped
+    without NumPy.
+    """
+    try:
+        pairs = find_near_duplicates(rows, threshold)
+    except ImportError:
+        pairs = []
+    if not pairs and not near_copies:
+        return None
+
+    lines = []
+    if pairs:
+        lines.append(f"{len(pairs)} pair(s) of near-duplicate cards:")
+        lines += [f"  {_describe(rows[pair.first])} ~ {_describe(rows[pair.second])} ({pair.similarity:.0%})"
+                  for pair in pairs[:limit]]
+        if len(pairs) > limit:
+            lines.append(f"  ... and {len(pairs) - limit} more")
+    if near_copies:
+        lines.append(f"{len(near_copies)} wrong answer(s) nearly the same as the correct answer:")
+        lines += [f"  line {issue.line}: {issue.message}" for issue in near_copies[:limit]]
+        if len(near_copies) > limit:
+            lines.append(f"  ... and {len(near_copies) - limit} more")
+    lines.append("Run near_duplicates.py on the deck for the full list")
+    return '\n'.join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Find near-duplicate cards and near-copied wrong answers")
+    parser.add_argument('deck', help="flashcard CSV file")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help="minimum card similarity to report (0-1)")
+    parser.add_argument('--question-threshold', type=float, default=QUESTION_THRESHOLD,
+                        help="minimum similarity of the questions alone to report (0-1)")
+    parser.add_argument('--option-threshold', type=float, default=OPTION_THRESHOLD,
+                        help="minimum wrong/correct answer similarity to report (0-1)")
+    parser.add_argument('--json', action='store_true', help="print the results as JSON")
+    args = parser.parse_args()
+
+    with open(args.deck, 'r', encoding='utf-8', newline='') as file:
+        reader = csv.DictReader(file)
+        rows, lines = [], []
+        for row in reader:
+            rows.append(row)
+            lines.append(reader.line_num)
+
+    pairs = find_near_duplicates(rows, args.threshold, args.question_threshold)
+    copies = [
+        (position, field, similarity)
+        for position, row in enumerate(rows)
+        for field, similarity in near_copy_options(row, args.option_threshold)
+    ]
+    if args.json:
+        print(json.dumps({
+            'cards': len(rows),
+            'near_duplicates': [
+                {'lines': [lines[pair.first], lines[pair.second]], 'similarity': round(pair.similarity, 3),
+                 'questions': [rows[pair.first]['question_text'], rows[pair.second]['question_text']]}
+                for pair in pairs
+            ],
+            'near_copy_options': [
+                {'line': lines[position], 'field': field, 'similarity': round(similarity, 3),
+                 'correct_answer': rows[position]['correct_answer'], 'answer': rows[position][field]}
+                for position, field, similarity in copies
+            ],
+        }, indent=2))
+        return
+
+    print(f"{len(rows):,} cards, {len(pairs):,} near-duplicate pair(s), "
+          f"{len(copies):,} near-copied wrong answer(s)")
+    for pair in pairs:
+        print(f"{pair.similarity:5.0%}  line {lines[pair.first]}: {rows[pair.first]['question_text']}")
+        print(f"       line {lines[pair.second]}: {rows[pair.second]['question_text']}")
+    for position, field, similarity in copies:
+        row = rows[position]
+        print(f"{similarity:5.0%}  line {lines[position]} {field}: {row[field]!r} "
+              f"vs correct {row['correct_answer']!r}")
+
+
+if __name__ == "__main__":
+    main()
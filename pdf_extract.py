@@ -0,0 +1,313 @@
+#!/usr/bin/env python3
+"""
+PDF Concept Extractor
+Re-extracts concept texts from the source PDF across a process pool and diffs them against data/concepts/
+
+Pages are cached by a hash of their content, so a new edition of the
+manual only has its changed pages extracted again. Needs pypdf.
+"""
+
+import argparse
+import difflib
+import hashlib
+import json
+import os
+import re
+import sys
+import time
+from collections import namedtuple
+from pathlib import Path
+
+from concept_store import DEFAULT_CONCEPTS_DIR, SECTION_MARKER, ConceptStore
+
+
+DEFAULT_PDF_PATH = Path(__file__).parent / "data" / "jeet-kun-do-concepts-level-1-and-2.pdf"
+
+# Shared by every PDF, so a new edition under a new file name reuses the
+# pages it has in common with the last one
+DEFAULT_CACHE_PATH = Path(__file__).parent / "data" / ".cache" / "pdf_pages.json"
+
+# Bump when extraction or its cleanup changes, so cached pages are redone
+EXTRACTOR_VERSION = 1
+
+# Pages kept in the cache; the least recently used go first
+MAX_CACHED_PAGES = 2000
+
+# Lines found on at least this share of pages (running headers) are dropped
+HEADER_SHARE = 0.5
+
+# Concept headings start at the margin: "12. Worst-Case Scenario Theory"
+_HEADING = re.compile(r'(\d+)\.\s+(\S.*)')
+# Numbered points are indented, lettered sub-points more so
+_POINT = re.compile(r'\s*(\d+)\.\s+(\S.*)')
+_SUB_POINT = re.compile(r'\s+([a-z])\.\s+(\S.*)')
+_SPACES = re.compile(r'\s+')
+
+# Typographic quotes as the hand-copied texts write them
+_QUOTES = str.maketrans({'‘': "'", '’': "'", '“': '"', '”': '"'})
+
+# Concept numbers by how the extracted texts differ from the current ones.
+# `reflowed` texts have the same words with different line or paragraph breaks.
+ConceptChanges = namedtuple('ConceptChanges', 'added changed reflowed removed')
+
+
+def _require_pypdf():
+    try:
+        import pypdf
+    except ImportError:
+        raise ImportError("Extracting the source PDF requires pypdf: pip install pypdf") from None
+    return pypdf
+
+
+def _digest(*parts):
+    digest = hashlib.sha256(str(EXTRACTOR_VERSION).encode())
+    for part in parts:
+        digest.update(b'\0')
+        digest.update(part)
+    return digest.hexdigest()
+
+
+def page_hash(page):
+    """Hash of everything a page's text depends on: its content and font mappings"""
+    parts = [page.get_contents().get_data() if page.get_contents() is not None else b'']
+    fonts = page.get('/Resources', {}).get('/Font', {})
+    for name in sorted(fonts):
+        font = fonts[name].get_object()
+        parts.append(f"{name}={font.get('/BaseFont')}:{font.get('/Encoding')}".encode('utf-8'))
+        to_unicode = font.get('/ToUnicode')
+        if to_unicode is not None:
+            parts.append(to_unicode.get_object().get_data())
+    return _digest(*parts)
+
+
+class PageCache:
+    """Extracted page texts keyed by page hash, least recently used first"""
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_pages=MAX_CACHED_PAGES):
+        self.path = Path(path)
+        self.max_pages = max_pages
+        self.pages = {}
+        try:
+            with open(self.path, 'r', encoding='utf-8') as file:
+                data = json.load(file)
+            if data.get('version') == EXTRACTOR_VERSION:
+                self.pages = data['pages']
+        except (OSError, ValueError, KeyError):
+            pass
+        self._used = {}
+
+    def get(self, key):
+        text = self.pages.get(key)
+        if text is not None:
+            self._used[key] = text
+        return text
+
+    def put(self, key, text):
+        self._used[key] = text
+
+    def save(self):
+        """Write the pages used by this run after the rest, dropping the oldest"""
+        pages = {key: text for key, text in self.pages.items() if key not in self._used}
+        pages.update(self._used)
+        pages = dict(list(pages.items())[-self.max_pages:])
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, 'w', encoding='utf-8') as file:
+                json.dump({'version': EXTRACTOR_VERSION, 'pages': pages}, file, ensure_ascii=False)
+        except OSError:
+            pass
+
+
+_reader = None
+
+
+def _init_worker(pdf_path):
+    """Open the PDF once per worker process"""
+    global _reader
+    _reader = _require_pypdf().PdfReader(pdf_path)
+
+
+def extract_page(number, reader=None):
+    """Text of one page, laid out as it is printed so indentation marks points"""
+    reader = reader if reader is not None else _reader
+    return reader.pages[number].extract_text(extraction_mode='layout')
+
+
+def extract_pages(pdf_path, workers=None, cache_path=None):
+    """Text of every page of a PDF, and how many pages had to be extracted
+
+    Pages whose hash is in the cache are reused; the rest are extracted in
+    `workers` processes (0 extracts in this process).
+    """
+    pypdf = _require_pypdf()
+    if workers is None:
+        workers = os.cpu_count() or 1
+    reader = pypdf.PdfReader(pdf_path)
+    cache = PageCache(cache_path if cache_path is not None else DEFAULT_CACHE_PATH)
+
+    keys = [page_hash(page) for page in reader.pages]
+    texts = [cache.get(key) for key in keys]
+    missing = [number for number, text in enumerate(texts) if text is None]
+    if missing and (workers == 0 or len(missing) == 1):
+        extracted = [extract_page(number, reader) for number in missing]
+    elif missing:
+        # Imported here: a fully cached run never starts the pool
+        from concurrent.futures import ProcessPoolExecutor
+
+        with ProcessPoolExecutor(min(workers, len(missing)), initializer=_init_worker,
+                                 initargs=(str(pdf_path),)) as pool:
+            extracted = list(pool.map(extract_page, missing))
+    else:
+        extracted = []
+    for number, text in zip(missing, extracted):
+        texts[number] = text
+        cache.put(keys[number], text)
+    cache.save()
+    return texts, len(missing)
+
+
+def _page_lines(pages, header_share=HEADER_SHARE):
+    """Lines of every page without running headers and page numbers"""
+    seen = {}
+    for text in pages:
+        for line in {line.strip() for line in text.splitlines()}:
+            seen[line] = seen.get(line, 0) + 1
+    headers = {line for line, count in seen.items() if line and count >= header_share * len(pages) > 1}
+    for number, text in enumerate(pages, 1):
+        for line in text.splitlines():
+            stripped = line.strip()
+            if stripped in headers or stripped == str(number):
+                continue
+            yield line.rstrip()
+
+
+def segment_concepts(pages):
+    """{concept number: text} from extracted page texts
+
+    A concept starts at a numbered heading at the margin whose number is
+    the next concept's. Its text is the title, a blank line, then its
+    numbered points one per line ("   - " for lettered sub-points), or
+    paragraphs of prose, as in data/concepts/.
+    """
+    concepts = {}
+    number = 0
+    blocks = None     # [kind, [line, ...]] of the current concept, title first
+    open_block = False
+
+    for line in _page_lines(pages):
+        line = line.translate(_QUOTES).replace("''", '"')
+        if not line.strip():
+            # A blank line ends a paragraph; points run on until the next point
+            if blocks and blocks[-1][0] == 'prose':
+                open_block = False
+            continue
+        heading = _HEADING.fullmatch(line)
+        if heading and int(heading.group(1)) == number + 1:
+            number += 1
+            blocks = concepts[number] = [['title', [heading.group(2)]]]
+            open_block = False
+            continue
+        if blocks is None:
+            continue  # Title page
+        point = _POINT.fullmatch(line)
+        sub_point = _SUB_POINT.fullmatch(line)
+        if point:
+            blocks.append(['point', [f"{point.group(1)}. {point.group(2)}"]])
+        elif sub_point:
+            blocks.append(['sub', [sub_point.group(2)]])
+        elif open_block:
+            blocks[-1][1].append(line)
+            continue
+        else:
+            blocks.append(['prose', [line]])
+        open_block = True
+
+    texts = {}
+    for number, blocks in concepts.items():
+        parts = []
+        previous = None
+        for kind, lines in blocks:
+            text = _SPACES.sub(' ', ' '.join(lines)).strip()
+            if kind == 'title':
+                parts.append(text.replace('"', ''))
+            else:
+                # A blank line after the title and around paragraphs; points one per line
+                parts.append('\n\n' if 'prose' in (kind, previous) or previous == 'title' else '\n')
+                parts.append(f"   - {text}" if kind == 'sub' else text)
+            previous = kind
+        texts[number] = ''.join(parts)
+    return texts
+
+
+def compare_concepts(extracted, current):
+    """ConceptChanges from the current concept texts to the extracted ones"""
+    added, changed, reflowed = [], [], []
+    for number in sorted(extracted):
+        text = extracted[number]
+        if number not in current:
+            added.append(number)
+        elif current[number] != text:
+            if _SPACES.sub(' ', current[number]) == _SPACES.sub(' ', text):
+                reflowed.append(number)
+            else:
+                changed.append(number)
+    removed = [number for number in sorted(current) if number not in extracted]
+    return ConceptChanges(added, changed, reflowed, removed)
+
+
+def concept_diff(number, current, extracted):
+    """Unified diff of one concept's current text against its extracted text"""
+    return '\n'.join(difflib.unified_diff(
+        current.splitlines(), extracted.splitlines(),
+        f"current/{number}", f"pdf/{number}", lineterm='',
+    ))
+
+
+def write_concepts(texts, path):
+    """Write concept texts as a data/concepts/ source file"""
+    marker = SECTION_MARKER.decode('ascii')
+    with open(path, 'w', encoding='utf-8', newline='\n') as file:
+        for number in sorted(texts):
+            file.write(f"{marker}{number}\n{texts[number]}\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Extract concept texts from the source PDF and diff them")
+    parser.add_argument('pdf', nargs='?', default=str(DEFAULT_PDF_PATH), help="source PDF")
+    parser.add_argument('--concepts', default=str(DEFAULT_CONCEPTS_DIR),
+                        help="concept text directory to compare against (default: data/concepts/)")
+    parser.add_argument('--workers', type=int, help="extraction processes (default: CPU count, 0 = none)")
+    parser.add_argument('--cache', help="page cache path (default: data/.cache/pdf_pages.json)")
+    parser.add_argument('-o', '--output', help="write the extracted concepts to this source file")
+    parser.add_argument('--brief', action='store_true', help="list changed concepts without diffs")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    try:
+        pages, extracted_pages = extract_pages(args.pdf, args.workers, args.cache)
+    except ImportError as e:
+        sys.exit(str(e))
+    extracted = segment_concepts(pages)
+    elapsed = time.perf_counter() - start
+
+    current = ConceptStore(args.concepts)
+    changes = compare_concepts(extracted, current)
+    print(f"{len(pages)} pages ({extracted_pages} extracted, {len(pages) - extracted_pages} cached) "
+          f"in {elapsed:.2f}s: {len(extracted)} concepts")
+    print(f"{len(changes.added)} added, {len(changes.changed)} changed, "
+          f"{len(changes.reflowed)} reflowed, {len(changes.removed)} removed")
+    for label, numbers in zip(ConceptChanges._fields, changes):
+        if numbers:
+            print(f"  {label}: {', '.join(map(str, numbers))}")
+    if not args.brief:
+        for number in changes.changed:
+            print()
+            print(concept_diff(number, current[number], extracted[number]))
+
+    if args.output:
+        write_concepts(extracted, args.output)
+        print(f"Wrote {len(extracted)} concepts to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Question Prefetch
+Prepares upcoming questions ahead of time so serving one is only a pop
+"""
+
+from collections import deque, namedtuple
+
+
+# A question ready to display, with its concept's source text already read
+PreparedQuestion = namedtuple('PreparedQuestion', 'question source_text')
+
+SOURCE_NOT_FOUND = "Source material not found."
+
+# Latency samples kept for percentiles
+LATENCY_SAMPLES = 1000
+
+
+class QuestionPrefetcher:
+    """Ring buffer of up to `depth` prepared questions for a QuizSession
+
+    fill() picks cards, shuffles their options and resolves their source
+    text; call it when the UI is idle. take() then just pops the oldest.
+    The selector reserves every prefetched card so none is picked twice;
+    clear() hands them back, e.g. before switching selectors.
+    """
+
+    def __init__(self, session, concepts=None, depth=3):
+        self.session = session
+        self.concepts = concepts
+        self.depth = depth
+        self.ring = deque()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.ring)
+
+    def _prepare(self, card_index=None):
+        question = self.session.prepare_question(card_index)
+        source_text = SOURCE_NOT_FOUND
+        if self.concepts is not None:
+            source_text = self.concepts.get(int(question.card['concept_number']), SOURCE_NOT_FOUND)
+        return PreparedQuestion(question, source_text)
+
+    def fill(self):
+        """Prepare questions until the ring is full; returns how many were added"""
+        added = 0
+        while len(self.ring) < self.depth:
+            try:
+                self.ring.append(self._prepare())
+            except IndexError:
+                # Every card is reserved or in play; try again after an answer
+                break
+            added += 1
+        return added
+
+    def take(self, card_index=None):
+        """Next prepared question, or one for card_index prepared on the spot"""
+        if card_index is not None:
+            return self._prepare(card_index)
+        if self.ring:
+            self.hits += 1
+            return self.ring.popleft()
+        self.misses += 1
+        return self._prepare()
+
+    def clear(self):
+        """Drop every prepared question, releasing its card"""
+        while self.ring:
+            self.session.release(self.ring.popleft().question)
+
+
+class LatencyStats:
+    """Recent latency samples in seconds, summarised as percentiles"""
+
+    def __init__(self, samples=LATENCY_SAMPLES):
+        self.samples = deque(maxlen=samples)
+        self.count = 0
+
+    def record(self, seconds):
+        self.samples.append(seconds)
+        self.count += 1
+
+    @property
+    def last(self):
+        return self.samples[-1] if self.samples else 0.0
+
+    def percentile(self, fraction):
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+    def summary(self):
+        if not self.samples:
+            return "no samples"
+        return (f"last {self.last * 1000:.1f} ms, p50 {self.percentile(0.5) * 1000:.1f} ms, "
+                f"p95 {self.percentile(0.95) * 1000:.1f} ms")
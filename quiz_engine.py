@@ -0,0 +1,295 @@
+"""
+Quiz Engine
+UI-free deck, session and scoring logic shared by every frontend
+"""
+
+import csv
+import random
+import time
+from collections import namedtuple
+from pathlib import Path
+
+from card_store import CardStore
+from deck_cache import load_deck
+
+
+DEFAULT_DECK_PATH = Path(__file__).parent / "data" / "jkd_flashcards.csv"
+
+# One answered question. `chosen` is the answer slot picked (0 = correct
+# answer, 1-3 = wrong_answer_1..3), independent of the on-screen order.
+# A typed answer that matched is recorded as slot 0, one that didn't as TYPED_MISS.
+ReviewEvent = namedtuple('ReviewEvent', 'timestamp card_id chosen correct latency')
+
+TYPED_MISS = 4
+
+
+class Deck:
+    """An ordered, read-only collection of flashcards backed by a CardStore"""
+
+    def __init__(self, cards):
+        self.cards = cards
+
+    @classmethod
+    def load(cls, csv_path=DEFAULT_DECK_PATH):
+        """Load a deck through its compiled cache, building it when needed"""
+        if not Path(csv_path).exists():
+            raise FileNotFoundError(csv_path)
+        return cls(load_deck(csv_path))
+
+    @classmethod
+    def from_csv(cls, csv_path=DEFAULT_DECK_PATH):
+        """Load a deck from a flashcard CSV file"""
+        with open(csv_path, 'r', encoding='utf-8', newline='') as file:
+            return cls(CardStore.from_rows(csv.DictReader(file)))
+
+    def __len__(self):
+        return len(self.cards)
+
+    def __getitem__(self, index):
+        return self.cards[index]
+
+    def __iter__(self):
+        return iter(self.cards)
+
+    def options(self, index):
+        """Return the four answer options of a card, correct answer first"""
+        return self.cards.options(index)
+
+
+class Question:
+    """A card as served to the learner, with its options in display order"""
+
+    __slots__ = ('card_index', 'card', 'options', 'correct_index', 'order')
+
+    def __init__(self, card_index, card, options, correct_index, order):
+        self.card_index = card_index
+        self.card = card
+        self.options = options
+        self.correct_index = correct_index
+        self.order = order  # answer slot shown at each position
+
+    @property
+    def correct_answer(self):
+        return self.options[self.correct_index]
+
+
+class AnswerResult:
+    """Outcome of answering a question
+
+    For a typed answer `typed` holds the text and `match` its
+    typed_answers.TypedMatch; `selected_index` is then the correct option
+    if it matched and None otherwise.
+    """
+
+    __slots__ = ('question', 'selected_index', 'is_correct', 'latency', 'typed', 'match')
+
+    def __init__(self, question, selected_index, is_correct, latency=0.0, typed=None, match=None):
+        self.question = question
+        self.selected_index = selected_index
+        self.is_correct = is_correct
+        self.latency = latency
+        self.typed = typed
+        self.match = match
+
+    @property
+    def correct_answer(self):
+        return self.question.correct_answer
+
+    @property
+    def explanation(self):
+        return self.question.card.get('explanation', '') or ''
+
+    def feedback(self):
+        """Feedback text shown to the learner after answering"""
+        if self.is_correct:
+            return f"✓ Correct! {self.explanation}"
+        if self.match is not None and self.match.close:
+            return f"✗ Nearly. Correct answer: {self.correct_answer}. {self.explanation}"
+        return f"✗ Wrong. Correct answer: {self.correct_answer}. {self.explanation}"
+
+
+class Scorer:
+    """Running score for a session"""
+
+    __slots__ = ('score', 'total_answered')
+
+    def __init__(self):
+        self.score = 0
+        self.total_answered = 0
+
+    def record(self, is_correct):
+        self.total_answered += 1
+        if is_correct:
+            self.score += 1
+
+    def reset(self):
+        self.score = 0
+        self.total_answered = 0
+
+    @property
+    def percentage(self):
+        if self.total_answered > 0:
+            return int((self.score / self.total_answered) * 100)
+        return 0
+
+    def summary(self):
+        return f"Score: {self.score}/{self.total_answered} ({self.percentage}%)"
+
+
+class RandomSelector:
+    """Pick every card with equal probability"""
+
+    def __init__(self, deck, rng):
+        self.deck = deck
+        self.rng = rng
+
+    def select(self):
+        """Return the index of the next card to serve"""
+        return self.rng.randrange(len(self.deck))
+
+    def update(self, card_index, is_correct):
+        """Feed back the outcome of a served card"""
+
+    def release(self, card_index):
+        """Hand back a selected card that won't be answered"""
+
+
+class FilteredSelector:
+    """Pick uniformly among a subset of cards, passing outcomes to another selector"""
+
+    def __init__(self, indices, rng, base=None):
+        if not indices:
+            raise ValueError("Filter matches no cards")
+        self.indices = list(indices)
+        self.rng = rng
+        self.base = base
+
+    def select(self):
+        return self.indices[self.rng.randrange(len(self.indices))]
+
+    def update(self, card_index, is_correct):
+        if self.base is not None:
+            self.base.update(card_index, is_correct)
+
+    def release(self, card_index):
+        """Nothing to hand back: selections never reserve cards in the base"""
+
+
+class QuizSession:
+    """Serves questions from a deck and scores the answers"""
+
+    def __init__(self, deck, rng=None, selector=None, scorer=None, recorder=None):
+        if not len(deck):
+            raise ValueError("Deck has no flashcards")
+        self.deck = deck
+        self.rng = rng if rng is not None else random.Random()
+        self.selector = selector if selector is not None else RandomSelector(deck, self.rng)
+        self.scorer = scorer if scorer is not None else Scorer()
+        # Receives a ReviewEvent per answer, and prepared, served and released
+        # questions if it has record_prepare(), record_serve() and record_release()
+        self.recorder = recorder
+        self.current = None
+        self.answered = False
+        self.served_at = 0.0
+
+    def next_question(self, card_index=None):
+        """Pick the next card (or serve card_index) and shuffle its options"""
+        return self.serve(self.prepare_question(card_index))
+
+    def prepare_question(self, card_index=None):
+        """Pick a card (or take card_index) and shuffle its options without serving it
+
+        A picked card stays reserved by the selector until it is answered or
+        handed back with release().
+        """
+        picked = card_index is None
+        if picked:
+            card_index = self.selector.select()
+        raw = self.deck.options(card_index)
+        order = [0, 1, 2, 3]
+        self.rng.shuffle(order)
+        question = Question(
+            card_index,
+            self.deck[card_index],
+            [raw[i] for i in order],
+            order.index(0),
+            order
+        )
+        record_prepare = getattr(self.recorder, 'record_prepare', None)
+        if record_prepare is not None:
+            record_prepare(question, picked)
+        return question
+
+    def serve(self, question):
+        """Make a prepared question the current one"""
+        if self.current is not None and not self.answered:
+            # Skipped without an answer: let the selector offer it again
+            self.release(self.current)
+        self.current = question
+        self.answered = False
+        self.served_at = time.perf_counter()
+        record_serve = getattr(self.recorder, 'record_serve', None)
+        if record_serve is not None:
+            record_serve(question, self.served_at)
+        return question
+
+    def release(self, question):
+        """Hand a prepared but unanswered question's card back to the selector"""
+        release = getattr(self.selector, 'release', None)
+        if release is not None:
+            release(question.card_index)
+        record_release = getattr(self.recorder, 'record_release', None)
+        if record_release is not None:
+            record_release(question)
+
+    def set_selector(self, selector):
+        """Switch to another selector, first handing back the unanswered question
+
+        The old selector reserved the current card, so only it can release it.
+        """
+        if self.current is not None and not self.answered:
+            self.release(self.current)
+            self.current = None
+        self.selector = selector
+
+    def _unanswered(self):
+        if self.current is None or self.answered:
+            raise RuntimeError("No unanswered question in progress")
+        return self.current
+
+    def _score(self, question, chosen, is_correct):
+        """Record an answer to the current question; returns its latency"""
+        latency = time.perf_counter() - self.served_at
+        self.answered = True
+        self.scorer.record(is_correct)
+        self.selector.update(question.card_index, is_correct)
+        if self.recorder is not None:
+            self.recorder.record(ReviewEvent(time.time(), question.card_index, chosen, is_correct, latency))
+        return latency
+
+    def answer(self, selected_index):
+        """Score the option at selected_index for the current question"""
+        question = self._unanswered()
+        is_correct = selected_index == question.correct_index
+        latency = self._score(question, question.order[selected_index], is_correct)
+        return AnswerResult(question, selected_index, is_correct, latency)
+
+    def answer_typed(self, text, matcher=None):
+        """Score a typed answer to the current question against its correct answer
+
+        `matcher` is the typed_answers.AnswerMatcher for the question that
+        graded the answer while it was typed, if there was one.
+        """
+        question = self._unanswered()
+        if matcher is None:
+            from typed_answers import AnswerMatcher
+            matcher = AnswerMatcher(question.correct_answer)
+        match = matcher.grade(text)
+        latency = self._score(question, 0 if match.is_correct else TYPED_MISS, match.is_correct)
+        selected = question.correct_index if match.is_correct else None
+        return AnswerResult(question, selected, match.is_correct, latency, text, match)
+
+    def reset_score(self):
+        self.scorer.reset()
+        if self.recorder is not None:
+            self.recorder.record_reset(time.time())
@@ -0,0 +1,328 @@
+#!/usr/bin/env python3
+"""
+Quiz API Server
+Asyncio HTTP/JSON service that runs quiz sessions for many learners at once
+"""
+
+import argparse
+import asyncio
+import json
+import mimetypes
+import random
+import time
+import traceback
+from collections import OrderedDict
+from pathlib import Path
+from urllib.parse import parse_qs, urlsplit, unquote
+
+from concept_store import ConceptStore
+from quiz_engine import DEFAULT_DECK_PATH, Deck, QuizSession
+from scheduler import SparseScheduler
+
+
+WEB_DIR = Path(__file__).parent / "web"
+
+REASONS = {
+    200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+    409: 'Conflict', 413: 'Payload Too Large', 500: 'Internal Server Error',
+}
+
+MAX_BODY = 64 * 1024
+
+
+class HTTPError(Exception):
+    """An error response with a status code"""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+class LearnerSession:
+    """A learner's quiz session plus when it was last used"""
+
+    __slots__ = ('quiz', 'last_seen')
+
+    def __init__(self, quiz):
+        self.quiz = quiz
+        self.last_seen = time.monotonic()
+
+
+class QuizService:
+    """Per-learner quiz sessions over one shared deck
+
+    Sessions live in memory in least-recently-used order. The oldest is
+    dropped when max_sessions is reached, and sessions idle longer than
+    idle_timeout seconds are swept periodically. Each learner's scheduler
+    is a SparseScheduler, holding state only for the cards they have seen.
+    """
+
+    def __init__(self, deck, concepts, selector='sm2', max_sessions=10000, idle_timeout=1800):
+        self.deck = deck
+        self.concepts = concepts
+        self.selector = selector
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self.sessions = OrderedDict()
+        self.requests = 0
+        self.evicted = 0
+
+    def session(self, user):
+        if not user:
+            raise HTTPError(400, "Missing user id")
+        learner = self.sessions.get(user)
+        if learner is None:
+            rng = random.Random()
+            selector = SparseScheduler(self.deck, rng) if self.selector == 'sm2' else None
+            learner = LearnerSession(QuizSession(self.deck, rng=rng, selector=selector))
+            self.sessions[user] = learner
+            if len(self.sessions) > self.max_sessions:
+                self.sessions.popitem(last=False)
+                self.evicted += 1
+        else:
+            self.sessions.move_to_end(user)
+        learner.last_seen = time.monotonic()
+        return learner.quiz
+
+    def sweep(self):
+        """Drop sessions that have been idle too long"""
+        cutoff = time.monotonic() - self.idle_timeout
+        sessions = self.sessions
+        while sessions:
+            user, learner = next(iter(sessions.items()))
+            if learner.last_seen > cutoff:
+                break
+            del sessions[user]
+            self.evicted += 1
+
+    # Endpoints
+
+    def next_card(self, user):
+        quiz = self.session(user)
+        question = quiz.next_question()
+        card = question.card
+        return {
+            'card_id': question.card_index,
+            'concept_number': int(card['concept_number']),
+            'concept_name': card['concept_name'],
+            'question_text': card['question_text'],
+            'options': question.options,
+        }
+
+    def submit_answer(self, user, choice):
+        quiz = self.session(user)
+        if not isinstance(choice, int) or not 0 <= choice < 4:
+            raise HTTPError(400, "choice must be an option index 0-3")
+        try:
+            result = quiz.answer(choice)
+        except RuntimeError as error:
+            raise HTTPError(409, str(error)) from None
+        return {
+            'correct': result.is_correct,
+            'correct_index': result.question.correct_index,
+            'correct_answer': result.correct_answer,
+            'explanation': result.explanation,
+            'feedback': result.feedback(),
+            **self._score(quiz),
+        }
+
+    def source_text(self, concept_number):
+        text = self.concepts.get(concept_number)
+        if text is None:
+            raise HTTPError(404, "Source material not found.")
+        return {'concept_number': concept_number, 'text': text}
+
+    def stats(self, user=None):
+        if user:
+            return self._score(self.session(user))
+        return {
+            'cards': len(self.deck),
+            'sessions': len(self.sessions),
+            'evicted': self.evicted,
+            'requests': self.requests,
+        }
+
+    def reset(self, user):
+        quiz = self.session(user)
+        quiz.reset_score()
+        return self._score(quiz)
+
+    @staticmethod
+    def _score(quiz):
+        scorer = quiz.scorer
+        return {
+            'score': scorer.score,
+            'total_answered': scorer.total_answered,
+            'percentage': scorer.percentage,
+            'summary': scorer.summary(),
+        }
+
+    def dispatch(self, method, target, headers, body):
+        """Route a request; returns (status, content type, body bytes, content encoding)"""
+        self.requests += 1
+        url = urlsplit(target)
+        path = unquote(url.path)
+        query = parse_qs(url.query)
+        user = headers.get('x-user') or query.get('user', [None])[0]
+
+        if not path.startswith('/api/'):
+            if method != 'GET':
+                raise HTTPError(405, "Method not allowed")
+            return static_file(path, 'gzip' in headers.get('accept-encoding', ''))
+
+        if path == '/api/next' and method == 'GET':
+            payload = self.next_card(user)
+        elif path == '/api/answer' and method == 'POST':
+            data = parse_json(body)
+            payload = self.submit_answer(data.get('user') or user, data.get('choice'))
+        elif path == '/api/reset' and method == 'POST':
+            data = parse_json(body)
+            payload = self.reset(data.get('user') or user)
+        elif path.startswith('/api/source/') and method == 'GET':
+            try:
+                concept_number = int(path[len('/api/source/'):])
+            except ValueError:
+                raise HTTPError(400, "Concept number must be an integer") from None
+            payload = self.source_text(concept_number)
+        elif path == '/api/stats' and method == 'GET':
+            payload = self.stats(user)
+        else:
+            raise HTTPError(404, "Unknown endpoint")
+        return 200, 'application/json', json.dumps(payload, separators=(',', ':')).encode('utf-8'), None
+
+
+def parse_json(body):
+    try:
+        data = json.loads(body or b'{}')
+    except ValueError:
+        raise HTTPError(400, "Body must be JSON") from None
+    if not isinstance(data, dict):
+        raise HTTPError(400, "Body must be a JSON object")
+    return data
+
+
+def static_file(path, accept_gzip=False):
+    """Serve a file from the web app directory, precompressed when build_web made a .gz"""
+    if path.endswith('/'):
+        path += 'index.html'
+    file_path = (WEB_DIR / path.lstrip('/')).resolve()
+    if WEB_DIR.resolve() not in file_path.parents or not file_path.is_file():
+        raise HTTPError(404, "Not found")
+    content_type = mimetypes.guess_type(file_path.name)[0] or 'application/octet-stream'
+    compressed = file_path.with_name(file_path.name + '.gz')
+    if accept_gzip and compressed.is_file():
+        return 200, content_type, compressed.read_bytes(), 'gzip'
+    return 200, content_type, file_path.read_bytes(), None
+
+
+def build_response(status, content_type, body, keep_alive, encoding=None):
+    head = (
+        f"HTTP/1.1 {status} {REASONS.get(status, 'OK')}\r\n"
+        f"Content-Type: {content_type}\r\n"
+        f"Content-Length: {len(body)}\r\n"
+        + (f"Content-Encoding: {encoding}\r\n" if encoding else "")
+        + f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n"
+        "\r\n"
+    )
+    return head.encode('latin-1') + body
+
+
+class QuizServer:
+    """Minimal HTTP/1.1 server with keep-alive in front of a QuizService"""
+
+    def __init__(self, service, sweep_interval=60):
+        self.service = service
+        self.sweep_interval = sweep_interval
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                try:
+                    method, target, version = request_line.decode('latin-1').split()
+                except ValueError:
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+
+                keep_alive = (
+                    version == 'HTTP/1.1' and headers.get('connection', '').lower() != 'close'
+                )
+                encoding = None
+                try:
+                    length = int(headers.get('content-length') or 0)
+                    if length > MAX_BODY:
+                        raise HTTPError(413, "Request body too large")
+                    body = await reader.readexactly(length) if length else b''
+                    status, content_type, payload, encoding = self.service.dispatch(
+                        method, target, headers, body
+                    )
+                except HTTPError as error:
+                    status, content_type = error.status, 'application/json'
+                    payload = json.dumps({'error': error.message}).encode('utf-8')
+                except ValueError:
+                    status, content_type = 400, 'application/json'
+                    payload = b'{"error":"Malformed request"}'
+                    keep_alive = False
+                except Exception:
+                    # Details stay in the server log, not the response
+                    traceback.print_exc()
+                    status, content_type = 500, 'application/json'
+                    payload = b'{"error":"Internal server error"}'
+
+                writer.write(build_response(status, content_type, payload, keep_alive, encoding))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+            pass
+        finally:
+            writer.close()
+
+    async def sweep_forever(self):
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            self.service.sweep()
+
+    async def serve(self, host, port):
+        server = await asyncio.start_server(self.handle, host, port, backlog=1024)
+        sweeper = asyncio.create_task(self.sweep_forever())
+        addresses = ', '.join(str(sock.getsockname()) for sock in server.sockets)
+        print(f"Serving quiz API on {addresses}")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            sweeper.cancel()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the quiz API and web app")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--deck', default=str(DEFAULT_DECK_PATH), help="flashcard CSV file")
+    parser.add_argument('--selector', choices=('random', 'sm2'), default='sm2',
+                        help="card selection strategy per learner")
+    parser.add_argument('--max-sessions', type=int, default=10000)
+    parser.add_argument('--idle-timeout', type=float, default=1800, help="seconds")
+    args = parser.parse_args()
+
+    service = QuizService(
+        Deck.load(args.deck), ConceptStore(), args.selector, args.max_sessions, args.idle_timeout
+    )
+    try:
+        asyncio.run(QuizServer(service).serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
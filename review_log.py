@@ -0,0 +1,399 @@
+"""
+Review Log
+Durable, append-only history of answered questions with snapshot compaction
+"""
+
+import os
+import struct
+import threading
+import time
+import zlib
+from array import array
+from pathlib import Path
+
+from quiz_engine import ReviewEvent
+from scheduler import STATE_ARRAYS
+
+
+DEFAULT_PROGRESS_DIR = Path(__file__).parent / "data" / "progress"
+
+# Files identify cards by CardStore.card_keys(), so saved progress follows
+# each card when deck rows are added, removed or reordered. Version 1 files
+# used the card's row position and are converted on restore.
+LOG_MAGIC = b'JKDLOG2\n'
+SNAPSHOT_MAGIC = b'JKDSNAP2'
+LEGACY_LOG_MAGIC = b'JKDLOG1\n'
+LEGACY_SNAPSHOT_MAGIC = b'JKDSNAP1'
+
+# magic, generation
+LOG_HEADER = struct.Struct('<8sQ')
+
+# timestamp, card key, chosen slot, flags, latency, then a CRC-32 of those fields
+RECORD = struct.Struct('<dQbBf')
+RECORD_CRC = struct.Struct('<I')
+RECORD_SIZE = RECORD.size + RECORD_CRC.size
+
+# Version 1 record: the card key was a uint32 row position
+LEGACY_RECORD = struct.Struct('<dIbBf')
+LEGACY_RECORD_SIZE = LEGACY_RECORD.size + RECORD_CRC.size
+
+# magic, generation, score, total answered, card count, written at; version 2
+# snapshots follow it with the card keys, then the state arrays in that order
+SNAPSHOT_HEADER = struct.Struct('<8sQQQQd')
+
+FLAG_CORRECT = 0x01
+FLAG_RESET = 0x02
+
+# Card id used by score reset markers in ReviewEvents
+RESET_CARD_ID = 0xFFFFFFFF
+
+# Card key written for score reset markers; card keys are below 2**63
+RESET_KEY = 0xFFFFFFFFFFFFFFFF
+
+# Typecodes of the scheduler arrays in a snapshot, in STATE_ARRAYS order
+_STATE_TYPECODES = {'ease': 'd', 'interval': 'd', 'repetitions': 'I', 'lapses': 'I', 'due': 'd'}
+
+
+def encode_event(event, key):
+    """Pack a ReviewEvent for the card with this key into a fixed-size checksummed record"""
+    flags = FLAG_CORRECT if event.correct else 0
+    if event.card_id == RESET_CARD_ID:
+        flags |= FLAG_RESET
+        key = RESET_KEY
+    body = RECORD.pack(event.timestamp, key, event.chosen, flags, event.latency)
+    return body + RECORD_CRC.pack(zlib.crc32(body))
+
+
+def read_log(path):
+    """Return (generation, events, valid_length, legacy) for a log file
+
+    Events carry the card key in `card_id`, RESET_KEY for score resets, or
+    the row position when `legacy` (a version 1 log). Reading stops at the
+    first torn or corrupt record; `valid_length` is the byte offset just
+    past the last good one.
+    """
+    with open(path, 'rb') as file:
+        data = file.read()
+    if len(data) < LOG_HEADER.size:
+        raise ValueError("Review log header is truncated")
+    magic, generation = LOG_HEADER.unpack_from(data)
+    if magic not in (LOG_MAGIC, LEGACY_LOG_MAGIC):
+        raise ValueError("Not a review log")
+    legacy = magic == LEGACY_LOG_MAGIC
+    record = LEGACY_RECORD if legacy else RECORD
+
+    events = []
+    position = LOG_HEADER.size
+    while position + record.size + RECORD_CRC.size <= len(data):
+        body = data[position:position + record.size]
+        (crc,) = RECORD_CRC.unpack_from(data, position + record.size)
+        if zlib.crc32(body) != crc:
+            break
+        timestamp, card_id, chosen, flags, latency = record.unpack(body)
+        if flags & FLAG_RESET:
+            card_id = RESET_KEY
+        events.append(ReviewEvent(timestamp, card_id, chosen, bool(flags & FLAG_CORRECT), latency))
+        position += record.size + RECORD_CRC.size
+    return generation, events, position, legacy
+
+
+class ReviewLog:
+    """Append-only event log with group commit on a background thread
+
+    append() only queues the record; the writer thread batches whatever has
+    queued up, writes it in one call and fsyncs once per batch, so callers
+    on the UI thread never wait for the disk.
+    """
+
+    def __init__(self, path, generation=0, commit_interval=0.05):
+        self.path = Path(path)
+        self.commit_interval = commit_interval
+        self._pending = []
+        self._condition = threading.Condition()
+        self._closed = False
+        self._flush_requested = False
+        self._committed = 0
+        self._queued = 0
+        self._error = None          # OSError that stopped the writer thread
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = self._open(generation)
+        self._thread = threading.Thread(target=self._run, name="review-log-writer", daemon=True)
+        self._thread.start()
+
+    def _open(self, generation):
+        """Open the log for appending, discarding any torn tail"""
+        try:
+            log_generation, _, valid_length, legacy = read_log(self.path)
+        except (FileNotFoundError, ValueError):
+            log_generation, legacy = None, False
+        if log_generation != generation or legacy:
+            _write_atomic(self.path, LOG_HEADER.pack(LOG_MAGIC, generation))
+            valid_length = LOG_HEADER.size
+        file = open(self.path, 'r+b')
+        file.truncate(valid_length)
+        file.seek(valid_length)
+        return file
+
+    def append(self, event, key):
+        """Queue an event for the card with this key for the next group commit"""
+        record = encode_event(event, key)
+        with self._condition:
+            if self._error is not None:
+                raise self._error
+            if self._closed:
+                raise ValueError("Review log is closed")
+            self._pending.append(record)
+            self._queued += 1
+            self._condition.notify()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._pending and not self._closed:
+                    self._condition.wait()
+                if not self._pending and self._closed:
+                    return
+                # Give concurrent appends a moment to join this batch
+                self._condition.wait_for(
+                    lambda: self._closed or self._flush_requested,
+                    self.commit_interval
+                )
+                batch = self._pending
+                self._pending = []
+                self._flush_requested = False
+            try:
+                self._file.write(b''.join(batch))
+                self._file.flush()
+                os.fsync(self._file.fileno())
+            except OSError as error:
+                # Hand the error to append() and flush() rather than dying quietly
+                with self._condition:
+                    self._error = error
+                    self._condition.notify_all()
+                return
+            with self._condition:
+                self._committed += len(batch)
+                self._condition.notify_all()
+
+    def flush(self):
+        """Block until everything appended so far is on disk
+
+        Raises the OSError that stopped the writer thread, if one did.
+        """
+        with self._condition:
+            target = self._queued
+            self._flush_requested = True
+            self._condition.notify_all()
+            while self._committed < target and self._error is None:
+                self._condition.wait()
+            if self._error is not None:
+                raise self._error
+
+    def close(self):
+        """Commit queued events and stop the writer thread"""
+        with self._condition:
+            if self._closed:
+                return
+            self._closed = True
+            self._condition.notify_all()
+        self._thread.join()
+        self._file.close()
+
+
+class ReviewHistory:
+    """Review log plus snapshot that together hold a learner's progress
+
+    Compaction folds the scorer and scheduler state into a snapshot tagged
+    with a new generation, then starts an empty log with that generation.
+    A log from an older generation has already been folded and is dropped,
+    so a crash between the two steps can't count an event twice.
+    """
+
+    def __init__(self, directory=DEFAULT_PROGRESS_DIR, compact_after=10000):
+        self.directory = Path(directory)
+        self.snapshot_path = self.directory / "reviews.snapshot"
+        self.log_path = self.directory / "reviews.log"
+        self.archive_dir = self.directory / "archive"
+        self.compact_after = compact_after
+        self.generation = 0
+        self.logged_events = 0
+        self.log = None
+        self.deck = None
+        self.keys = array('Q')      # card key by deck index
+
+    def restore(self, scorer, scheduler=None, deck=None):
+        """Load the snapshot and replay the log into a scorer and scheduler
+
+        Saved cards are matched to `deck` (default: the scheduler's) by card
+        key; reviews of cards no longer in the deck still count towards the
+        score. Progress saved by position in a version 1 format is taken to
+        be in the current deck's order and saved again by key.
+        """
+        self.deck = deck if deck is not None else getattr(scheduler, 'deck', None)
+        if self.deck is not None:
+            self.keys = self.deck.cards.card_keys()
+        index_of = {key: index for index, key in enumerate(self.keys)}
+        legacy = False
+
+        snapshot = read_snapshot(self.snapshot_path)
+        if snapshot is not None:
+            self.generation = snapshot['generation']
+            scorer.score = snapshot['score']
+            scorer.total_answered = snapshot['total_answered']
+            saved = snapshot['keys']
+            legacy = saved is None
+            if scheduler is not None:
+                # Unless the deck was edited since, cards are still in saved order
+                positions = None
+                if not legacy and saved != self.keys[:len(saved)]:
+                    positions = [index_of.get(key) for key in saved]
+                scheduler.load_state(snapshot['arrays'], positions)
+
+        try:
+            generation, events, _, legacy_log = read_log(self.log_path)
+        except (FileNotFoundError, ValueError):
+            generation, events, legacy_log = None, [], False
+        if snapshot is None and generation is not None:
+            # Snapshot lost: the log is all that is left
+            self.generation = generation
+        if generation == self.generation:
+            replay(events, scorer, scheduler, None if legacy_log else index_of)
+            self.logged_events = len(events)
+            legacy = legacy or legacy_log
+
+        if legacy:
+            # Fold the positional files into a keyed snapshot and start a keyed log
+            self.compact(scorer, scheduler)
+        else:
+            self.log = ReviewLog(self.log_path, self.generation)
+            if self.logged_events >= self.compact_after:
+                self.compact(scorer, scheduler)
+
+    def _current_keys(self):
+        """Card keys, including cards appended to the deck since restore()"""
+        if self.deck is not None and len(self.keys) < len(self.deck):
+            self.keys = self.deck.cards.card_keys()
+        return self.keys
+
+    def record(self, event):
+        key = RESET_KEY
+        if event.card_id != RESET_CARD_ID:
+            keys = self.keys if event.card_id < len(self.keys) else self._current_keys()
+            key = keys[event.card_id]
+        self.log.append(event, key)
+        self.logged_events += 1
+
+    def record_reset(self, timestamp):
+        self.record(ReviewEvent(timestamp, RESET_CARD_ID, -1, False, 0.0))
+
+    def compact(self, scorer, scheduler=None):
+        """Fold the current state into a new snapshot and start a new log
+
+        The folded log is kept in archive/ for analytics; startup never reads it.
+        """
+        if self.log is not None:
+            self.log.close()
+        self.generation += 1
+        write_snapshot(self.snapshot_path, self.generation, scorer, scheduler, self._current_keys())
+        if self.log_path.exists():
+            self.archive_dir.mkdir(parents=True, exist_ok=True)
+            os.replace(self.log_path, self.archive_dir / f"reviews.{self.generation - 1:06d}.log")
+        self.log = ReviewLog(self.log_path, self.generation)
+        self.logged_events = 0
+
+    def close(self, scorer=None, scheduler=None):
+        """Flush the log, compacting first if it has grown large"""
+        if self.log is None:
+            return
+        if scorer is not None and self.logged_events >= self.compact_after:
+            self.compact(scorer, scheduler)
+        self.log.close()
+        self.log = None
+
+
+def replay(events, scorer, scheduler=None, index_of=None):
+    """Apply events from read_log() to a scorer and scheduler
+
+    `index_of` maps card keys to deck indexes; without it events carry
+    deck indexes, as in a version 1 log.
+    """
+    card_count = len(scheduler.due) if scheduler is not None else 0
+    for event in events:
+        if event.card_id == RESET_KEY:
+            scorer.reset()
+            continue
+        scorer.record(event.correct)
+        index = event.card_id if index_of is None else index_of.get(event.card_id, card_count)
+        if scheduler is not None and index < card_count:
+            quality = 4 if event.correct else 1
+            scheduler.review(index, quality, now=event.timestamp)
+
+
+def write_snapshot(path, generation, scorer, scheduler=None, keys=()):
+    """Atomically write scorer totals, and scheduler arrays under each card's key"""
+    arrays = scheduler.state_arrays() if scheduler is not None else {}
+    count = len(arrays['due']) if arrays else 0
+    parts = [SNAPSHOT_HEADER.pack(
+        SNAPSHOT_MAGIC, generation, scorer.score, scorer.total_answered, count, time.time()
+    )]
+    if arrays:
+        # Cards without a key are saved under one no card has
+        keys = array('Q', keys[:count])
+        keys.extend([RESET_KEY] * (count - len(keys)))
+        parts.append(keys.tobytes())
+    for name in STATE_ARRAYS:
+        if arrays:
+            parts.append(arrays[name].tobytes())
+    body = b''.join(parts)
+    _write_atomic(path, body + struct.pack('<I', zlib.crc32(body)))
+
+
+def read_snapshot(path):
+    """Return the snapshot at path as a dict, or None if missing or corrupt"""
+    try:
+        data = Path(path).read_bytes()
+    except FileNotFoundError:
+        return None
+    if len(data) < SNAPSHOT_HEADER.size + 4:
+        return None
+    body, (crc,) = data[:-4], struct.unpack('<I', data[-4:])
+    if zlib.crc32(body) != crc:
+        return None
+    magic, generation, score, total, count, written_at = SNAPSHOT_HEADER.unpack_from(body)
+    if magic not in (SNAPSHOT_MAGIC, LEGACY_SNAPSHOT_MAGIC):
+        return None
+
+    keys = None
+    arrays = {}
+    position = SNAPSHOT_HEADER.size
+    if magic == SNAPSHOT_MAGIC:
+        keys = array('Q')
+        keys.frombytes(body[position:position + keys.itemsize * count])
+        position += keys.itemsize * count
+    if count:
+        for name in STATE_ARRAYS:
+            values = array(_STATE_TYPECODES[name])
+            size = values.itemsize * count
+            values.frombytes(body[position:position + size])
+            arrays[name] = values
+            position += size
+    return {
+        'generation': generation,
+        'score': score,
+        'total_answered': total,
+        'written_at': written_at,
+        'keys': keys,       # None in a version 1 snapshot, whose arrays are by position
+        'arrays': arrays,
+    }
+
+
+def _write_atomic(path, data):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, 'wb') as file:
+        file.write(data)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(tmp_path, path)
@@ -0,0 +1,293 @@
+"""
+Spaced Repetition Scheduler
+SM-2 review scheduling with a priority queue of due dates
+"""
+
+import heapq
+import random
+import time
+from array import array
+
+
+DAY = 86400.0
+
+# Seconds before a missed card is shown again
+RELEARN_DELAY = 60.0
+
+INITIAL_EASE = 2.5
+MINIMUM_EASE = 1.3
+
+# SM-2 response quality for a correct and a wrong answer (0-5 scale)
+QUALITY_CORRECT = 4
+QUALITY_WRONG = 1
+
+# Per-card arrays that make up the persistent scheduling state
+STATE_ARRAYS = ('ease', 'interval', 'repetitions', 'lapses', 'due')
+
+
+class SM2Scheduler:
+    """Serve the card that is due soonest and reschedule it with SM-2
+
+    Per-card state lives in columns indexed by card (ease, interval,
+    repetitions, lapses, due and generation), set up by the subclass. Due
+    dates sit in a binary heap; rescheduling pushes a fresh entry and bumps
+    the card's generation so the old entry is skipped when it surfaces.
+    Both select() and update() are O(log n).
+    """
+
+    def _push(self, index):
+        if index in self._retired:
+            return
+        self._sequence += 1
+        heapq.heappush(self._heap, (self.due[index], self._sequence, index, self.generation[index]))
+        if len(self._heap) > 2 * len(self.due) + 64:
+            self._compact()
+
+    def _compact(self):
+        """Drop superseded heap entries"""
+        generation = self.generation
+        self._heap = [entry for entry in self._heap if entry[3] == generation[entry[2]]]
+        heapq.heapify(self._heap)
+
+    def select(self):
+        """Return the index of the card due soonest and reserve it
+
+        When nothing is due yet the earliest upcoming card is served, so a
+        session never runs dry. A reserved card isn't selected again until
+        it is reviewed or released, so several can be picked ahead of time.
+        """
+        heap = self._heap
+        generation = self.generation
+        while heap:
+            _, _, index, card_generation = heapq.heappop(heap)
+            if card_generation == generation[index]:
+                self._reserved.add(index)
+                return index
+        raise IndexError("No cards to schedule")
+
+    def retire(self, card_index):
+        """Stop serving a card that was removed from the deck"""
+        self._retired.add(card_index)
+        self._reserved.discard(card_index)
+        self.generation[card_index] += 1
+
+    def reinstate(self, card_index):
+        """Serve a retired card again, keeping its review history"""
+        if card_index in self._retired:
+            self._retired.discard(card_index)
+            self.generation[card_index] += 1
+            self._push(card_index)
+
+    def release(self, card_index):
+        """Requeue a selected card that wasn't answered, as it was"""
+        if card_index in self._reserved:
+            self._reserved.discard(card_index)
+            self._push(card_index)
+
+    def update(self, card_index, is_correct):
+        """Reschedule a card after it was answered"""
+        self.review(card_index, QUALITY_CORRECT if is_correct else QUALITY_WRONG)
+
+    def review(self, card_index, quality, now=None):
+        """Apply one SM-2 review with response quality 0-5"""
+        now = self.clock() if now is None else now
+        if quality >= 3:
+            repetitions = self.repetitions[card_index]
+            if repetitions == 0:
+                interval = 1.0
+            elif repetitions == 1:
+                interval = 6.0
+            else:
+                interval = self.interval[card_index] * self.ease[card_index]
+            self.repetitions[card_index] = repetitions + 1
+            self.interval[card_index] = interval
+            self.due[card_index] = now + interval * DAY
+        else:
+            self.repetitions[card_index] = 0
+            self.lapses[card_index] += 1
+            self.interval[card_index] = 0.0
+            self.due[card_index] = now + RELEARN_DELAY
+
+        miss = 5 - quality
+        self.ease[card_index] = max(
+            MINIMUM_EASE,
+            self.ease[card_index] + 0.1 - miss * (0.08 + miss * 0.02)
+        )
+
+        self.generation[card_index] += 1
+        self._reserved.discard(card_index)
+        self._push(card_index)
+
+
+class SpacedRepetitionScheduler(SM2Scheduler):
+    """SM2Scheduler with per-card state in parallel arrays, saved by snapshots
+
+    Every card is queued up front, unseen ones in shuffled order.
+    """
+
+    def __init__(self, deck, rng=None, clock=time.time):
+        count = len(deck)
+        self.deck = deck
+        self.rng = rng if rng is not None else random.Random()
+        self.clock = clock
+        self.ease = array('d', [INITIAL_EASE]) * count
+        self.interval = array('d', [0.0]) * count      # days
+        self.repetitions = array('I', [0]) * count
+        self.lapses = array('I', [0]) * count
+        self.due = array('d', [0.0]) * count           # epoch seconds
+        self.generation = array('I', [0]) * count
+        self._sequence = 0
+        self._reserved = set()  # selected, not yet answered or released
+        self._retired = set()   # removed from the deck; never queued
+        self._rebuild_heap()
+
+    def _rebuild_heap(self):
+        """Queue every card; unseen cards come out in shuffled order"""
+        order = [index for index in range(len(self.due)) if index not in self._retired]
+        self.rng.shuffle(order)
+        self._heap = [
+            (self.due[index], rank, index, self.generation[index])
+            for rank, index in enumerate(order)
+        ]
+        heapq.heapify(self._heap)
+        self._sequence = len(order)
+
+    def add_cards(self, count):
+        """Schedule `count` new unseen cards appended to the deck"""
+        start = len(self.due)
+        self.ease.extend([INITIAL_EASE] * count)
+        self.interval.extend([0.0] * count)
+        self.repetitions.extend([0] * count)
+        self.lapses.extend([0] * count)
+        self.due.extend([0.0] * count)
+        self.generation.extend([0] * count)
+        for index in range(start, start + count):
+            self._push(index)
+
+    def load_state(self, arrays, positions=None):
+        """Restore per-card state saved from state_arrays() and requeue every card
+
+        `positions[i]` is the current index of the card saved at index i, or
+        None if it has left the deck; cards nothing was saved for keep the
+        defaults for unseen cards. Without `positions` the arrays must be in
+        the current deck's order and are truncated or padded to its size.
+        """
+        if positions is not None:
+            moves = [(saved, index) for saved, index in enumerate(positions)
+                     if index is not None and index < len(self.due)]
+        for name in STATE_ARRAYS:
+            values = arrays.get(name)
+            if values is None:
+                continue
+            target = getattr(self, name)
+            if positions is None:
+                count = min(len(target), len(values))
+                target[:count] = values[:count]
+            else:
+                for saved, index in moves:
+                    target[index] = values[saved]
+        self._reserved.clear()
+        self._rebuild_heap()
+
+    def state_arrays(self):
+        """Per-card state arrays by name, for snapshots"""
+        return {name: getattr(self, name) for name in STATE_ARRAYS}
+
+    def due_count(self, now=None):
+        """Number of cards due at `now` (a linear scan, for reporting only)"""
+        now = self.clock() if now is None else now
+        return sum(1 for due in self.due if due <= now)
+
+
+
+class _SparseColumn(dict):
+    """Per-card values stored only for cards that were set; `default` for the rest"""
+
+    def __init__(self, default):
+        super().__init__()
+        self.default = default
+
+    def __missing__(self, index):
+        return self.default
+
+
+class SparseScheduler(SM2Scheduler):
+    """SM2Scheduler that keeps state only for cards it has served
+
+    For servers holding many learners over one deck. Unseen cards come
+    first in random order, as in SpacedRepetitionScheduler, but are drawn
+    one at a time by a Fisher-Yates shuffle that remembers only the
+    positions it swapped, and only served cards enter the heap. A
+    learner's memory grows with the cards they have seen, not with the
+    deck.
+    """
+
+    def __init__(self, deck, rng=None, clock=time.time):
+        self.deck = deck
+        self.rng = rng if rng is not None else random.Random()
+        self.clock = clock
+        self.ease = _SparseColumn(INITIAL_EASE)
+        self.interval = _SparseColumn(0.0)
+        self.repetitions = _SparseColumn(0)
+        self.lapses = _SparseColumn(0)
+        self.due = _SparseColumn(0.0)
+        self.generation = _SparseColumn(0)
+        self._sequence = 0
+        self._reserved = set()
+        self._retired = set()
+        self._heap = []
+        self._cards = len(deck)
+        self._unseen = len(deck)    # shuffle positions not drawn yet
+        self._swapped = {}          # shuffle position -> card moved there
+        self._moved = {}            # card -> shuffle position, for moved undrawn cards
+
+    def _take(self, position):
+        """Remove the card at an undrawn shuffle position, filling it from the end"""
+        last = self._unseen - 1
+        index = self._swapped.pop(position, position)
+        self._moved.pop(index, None)
+        if position != last:
+            moved = self._swapped.pop(last, last)
+            if moved == position:
+                self._moved.pop(moved, None)
+            else:
+                self._swapped[position] = moved
+                self._moved[moved] = position
+        self._unseen = last
+        return index
+
+    def _shuffle_position(self, index):
+        """Shuffle position of a card not drawn yet, or None"""
+        if index in self._moved:
+            return self._moved[index]
+        if index < self._unseen and self._swapped.get(index, index) == index:
+            return index
+        return None
+
+    def select(self):
+        while self._unseen:
+            index = self._take(self.rng.randrange(self._unseen))
+            if index not in self._retired:
+                self._reserved.add(index)
+                return index
+        return super().select()
+
+    def reinstate(self, card_index):
+        """Serve a retired card again; one not drawn yet leaves the shuffle for the heap"""
+        if card_index in self._retired:
+            position = self._shuffle_position(card_index)
+            if position is not None:
+                self._take(position)
+        super().reinstate(card_index)
+
+    def add_cards(self, count):
+        """Schedule `count` new unseen cards appended to the deck"""
+        for index in range(self._cards, self._cards + count):
+            self._push(index)
+        self._cards += count
+
+    def due_count(self, now=None):
+        """Number of cards due at `now` (a scan of the seen cards, for reporting only)"""
+        now = self.clock() if now is None else now
+        # Cards never reviewed are due at 0
+        return self._cards - len(self.due) + sum(1 for due in self.due.values() if due <= now)
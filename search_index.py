@@ -0,0 +1,308 @@
+#!/usr/bin/env python3
+"""
+Search Index
+BM25-ranked keyword search over flashcards and concept source material
+"""
+
+import argparse
+import heapq
+import math
+import pickle
+import re
+import time
+import zlib
+from collections import Counter
+from pathlib import Path
+
+
+# Card columns that are searched
+SEARCH_FIELDS = ('question_text', 'correct_answer', 'explanation')
+
+STOPWORDS = frozenset("""
+a an and are as at be by do does for from how in is it its of on or that the
+this to what when where which who why with you your
+""".split())
+
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+
+INDEX_VERSION = 2
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text):
+    """Lower-case word tokens with stopwords removed"""
+    return [token for token in _TOKEN.findall(text.lower()) if token not in STOPWORDS]
+
+
+class InvertedIndex:
+    """Term -> {doc_id: term frequency} postings with BM25 ranking
+
+    Documents can be added, replaced and removed one at a time; collection
+    statistics are kept as running totals so no update touches other
+    documents. The highest frequency of each term and the shortest
+    document length only move up and down as documents are added, so after
+    removals they are loose but still valid bounds for search().
+    """
+
+    def __init__(self):
+        self.postings = {}
+        self.max_frequency = {}
+        self.doc_lengths = {}
+        self.doc_terms = {}
+        self.total_length = 0
+        self.min_length = None
+
+    def __len__(self):
+        return len(self.doc_lengths)
+
+    def __contains__(self, doc_id):
+        return doc_id in self.doc_lengths
+
+    def add(self, doc_id, text):
+        """Index a document, replacing any earlier version"""
+        if doc_id in self.doc_lengths:
+            self.remove(doc_id)
+        tokens = tokenize(text)
+        counts = Counter(tokens)
+        postings = self.postings
+        max_frequency = self.max_frequency
+        for term, count in counts.items():
+            term_postings = postings.get(term)
+            if term_postings is None:
+                postings[term] = term_postings = {}
+            term_postings[doc_id] = count
+            if count > max_frequency.get(term, 0):
+                max_frequency[term] = count
+        if self.min_length is None or len(tokens) < self.min_length:
+            self.min_length = len(tokens)
+        self.doc_lengths[doc_id] = len(tokens)
+        self.doc_terms[doc_id] = tuple(counts)
+        self.total_length += len(tokens)
+
+    def remove(self, doc_id):
+        """Drop a document from the index"""
+        length = self.doc_lengths.pop(doc_id, None)
+        if length is None:
+            return
+        self.total_length -= length
+        for term in self.doc_terms.pop(doc_id):
+            term_postings = self.postings[term]
+            del term_postings[doc_id]
+            if not term_postings:
+                del self.postings[term]
+                del self.max_frequency[term]
+
+    def search(self, query, limit=20, accept=None):
+        """Return [(score, doc_id)] best first; `accept` filters doc ids"""
+        count = len(self.doc_lengths)
+        if not count:
+            return []
+        average_length = self.total_length / count or 1.0
+        doc_lengths = self.doc_lengths
+        norm = K1 * (1 - B)
+        scale = K1 * B / average_length
+        # Rarest terms first. No document gets more from a term than its
+        # highest frequency in the shortest document would, so once the terms
+        # left can't lift a document that has none of the terms so far to the
+        # current limit-th best score, they only rescore the candidates
+        # instead of adding new ones (MaxScore); the results stay exact
+        terms = sorted((term for term in set(tokenize(query)) if term in self.postings),
+                       key=lambda term: len(self.postings[term]))
+        idfs = []
+        bounds = []
+        for term in terms:
+            frequency = len(self.postings[term])
+            idf = math.log(1 + (count - frequency + 0.5) / (frequency + 0.5))
+            tf = self.max_frequency[term]
+            idfs.append(idf)
+            bounds.append(idf * tf * (K1 + 1) / (tf + norm + scale * self.min_length))
+        remaining = sum(bounds)
+        scores = {}
+        pruning = False
+        for term, idf, bound in zip(terms, idfs, bounds):
+            term_postings = self.postings[term]
+            if not pruning and len(scores) >= limit:
+                best = heapq.nlargest(limit, (
+                    score for doc_id, score in scores.items() if accept is None or accept(doc_id)
+                ))
+                pruning = len(best) == limit and remaining < best[-1]
+            remaining -= bound
+            if pruning:
+                if len(scores) < len(term_postings):
+                    matches = [(doc_id, term_postings.get(doc_id)) for doc_id in scores]
+                else:
+                    matches = [(doc_id, tf) for doc_id, tf in term_postings.items() if doc_id in scores]
+                for doc_id, tf in matches:
+                    if tf:
+                        scores[doc_id] += idf * tf * (K1 + 1) / (
+                            tf + norm + scale * doc_lengths[doc_id]
+                        )
+                continue
+            for doc_id, tf in term_postings.items():
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (K1 + 1) / (
+                    tf + norm + scale * doc_lengths[doc_id]
+                )
+        if accept is not None:
+            return heapq.nlargest(
+                limit,
+                ((score, doc_id) for doc_id, score in scores.items() if accept(doc_id))
+            )
+        return heapq.nlargest(limit, ((score, doc_id) for doc_id, score in scores.items()))
+
+
+class SearchResult:
+    """A ranked hit: either a card or a concept's source material"""
+
+    __slots__ = ('score', 'kind', 'card_index', 'concept_number', 'title')
+
+    def __init__(self, score, kind, card_index, concept_number, title):
+        self.score = score
+        self.kind = kind
+        self.card_index = card_index
+        self.concept_number = concept_number
+        self.title = title
+
+    def __repr__(self):
+        return f"SearchResult({self.kind}, {self.title!r}, {self.score:.2f})"
+
+
+def card_text(card):
+    return '\n'.join(card[field] for field in SEARCH_FIELDS)
+
+
+class DeckSearch:
+    """Search over a deck's cards and the concept texts
+
+    Cards are indexed under their deck index and concepts under the negated
+    concept number. The index can be saved next to the deck; on load, cards
+    whose text fingerprint changed are re-indexed and the rest are kept.
+    """
+
+    def __init__(self):
+        self.index = InvertedIndex()
+        self.fingerprints = {}
+
+    @classmethod
+    def build(cls, deck, concepts, cache_path=None):
+        """Return an index for deck and concepts, reusing a saved one when possible"""
+        search = None
+        if cache_path is not None:
+            search = cls.load(cache_path)
+        if search is None:
+            search = cls()
+        changed = search.sync(deck, concepts)
+        if cache_path is not None and changed:
+            search.save(cache_path)
+        return search
+
+    def sync(self, deck, concepts):
+        """Bring the index up to date with deck and concepts; returns docs changed"""
+        wanted = {}
+        for card_index in range(len(deck)):
+            wanted[card_index] = card_text(deck[card_index])
+        for concept_number in concepts:
+            wanted[-concept_number] = concepts[concept_number]
+
+        changed = 0
+        for doc_id in [doc_id for doc_id in self.fingerprints if doc_id not in wanted]:
+            self.remove(doc_id)
+            changed += 1
+        for doc_id, text in wanted.items():
+            if self.update(doc_id, text):
+                changed += 1
+        return changed
+
+    def update(self, doc_id, text):
+        """(Re)index one document if its text changed; returns whether it did"""
+        fingerprint = zlib.crc32(text.encode('utf-8'))
+        if self.fingerprints.get(doc_id) == fingerprint:
+            return False
+        self.index.add(doc_id, text)
+        self.fingerprints[doc_id] = fingerprint
+        return True
+
+    def update_card(self, deck, card_index):
+        return self.update(card_index, card_text(deck[card_index]))
+
+    def remove(self, doc_id):
+        self.index.remove(doc_id)
+        self.fingerprints.pop(doc_id, None)
+
+    def search(self, query, deck, concepts, limit=20, kind=None):
+        """Return ranked SearchResults; kind limits hits to 'card' or 'concept'"""
+        accept = None
+        if kind == 'card':
+            accept = (lambda doc_id: doc_id >= 0)
+        elif kind == 'concept':
+            accept = (lambda doc_id: doc_id < 0)
+
+        results = []
+        for score, doc_id in self.index.search(query, limit, accept):
+            if doc_id >= 0:
+                card = deck[doc_id]
+                results.append(SearchResult(
+                    score, 'card', doc_id, int(card['concept_number']), card['question_text']
+                ))
+            else:
+                concept_number = -doc_id
+                title = concepts.get(concept_number, '').split('\n', 1)[0]
+                results.append(SearchResult(score, 'concept', None, concept_number, title))
+        return results
+
+    def save(self, cache_path):
+        cache_path = Path(cache_path)
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = cache_path.with_name(cache_path.name + ".tmp")
+        with open(tmp_path, 'wb') as file:
+            pickle.dump((INDEX_VERSION, self.index, self.fingerprints), file, pickle.HIGHEST_PROTOCOL)
+        tmp_path.replace(cache_path)
+
+    @classmethod
+    def load(cls, cache_path):
+        """Load a saved index, or None if it is missing or from another version"""
+        try:
+            with open(cache_path, 'rb') as file:
+                version, index, fingerprints = pickle.load(file)
+        except (OSError, pickle.UnpicklingError, EOFError, ValueError, AttributeError):
+            return None
+        if version != INDEX_VERSION:
+            return None
+        search = cls()
+        search.index = index
+        search.fingerprints = fingerprints
+        return search
+
+
+def default_index_path(csv_path):
+    csv_path = Path(csv_path)
+    return csv_path.parent / ".cache" / f"{csv_path.stem}.search"
+
+
+def main():
+    from concept_store import ConceptStore
+    from quiz_engine import DEFAULT_DECK_PATH, Deck
+
+    parser = argparse.ArgumentParser(description="Search flashcards and source material")
+    parser.add_argument('query', help="keywords, e.g. 'wu sao'")
+    parser.add_argument('--deck', default=str(DEFAULT_DECK_PATH), help="flashcard CSV file")
+    parser.add_argument('--limit', type=int, default=10)
+    parser.add_argument('--kind', choices=('card', 'concept'))
+    args = parser.parse_args()
+
+    deck = Deck.load(args.deck)
+    concepts = ConceptStore()
+    search = DeckSearch.build(deck, concepts, default_index_path(args.deck))
+    start = time.perf_counter()
+    results = search.search(args.query, deck, concepts, args.limit, args.kind)
+    elapsed = time.perf_counter() - start
+    for result in results:
+        label = f"card {result.card_index}" if result.kind == 'card' else "source"
+        print(f"{result.score:6.2f}  #{result.concept_number:<3} {label:<10} {result.title}")
+    print(f"{len(results)} results in {elapsed * 1000:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+"""
+Session Record & Replay
+Captures a quiz session's event stream to a compact file and replays it against the engine
+"""
+
+import argparse
+import json
+import random
+import struct
+import time
+
+from instrumentation import Histogram
+from drill import WeakAreaSelector
+from quiz_engine import DEFAULT_DECK_PATH, TYPED_MISS, Deck, QuizSession
+from scheduler import SpacedRepetitionScheduler
+
+
+RECORDING_MAGIC = b'JKDREC2\n'
+# Version 1 recordings have no prepare or release events
+LEGACY_RECORDING_MAGIC = b'JKDREC1\n'
+
+# magic, seed (-1 = unseeded), card count, selector, started at
+RECORDING_HEADER = struct.Struct('<8sqIBd')
+
+# kind, card index, option order, chosen slot, timestamp, latency
+EVENT = struct.Struct('<BIBbdf')
+
+EVENT_SERVE = 0
+EVENT_ANSWER = 1
+EVENT_RESET = 2
+# A card picked and shuffled ahead of serving (by the prefetcher), and one
+# handed back unanswered. Prepare events whose chosen slot is PREPARED_BY_INDEX
+# were asked for by index rather than picked by the selector.
+EVENT_PREPARE = 3
+EVENT_RELEASE = 4
+
+PREPARED_BY_INDEX = 1
+
+SELECTORS = ('random', 'sm2', 'drill')
+
+# Bytes buffered before the recorder writes them out
+WRITE_BUFFER = 64 * 1024
+
+
+def pack_order(order):
+    """Pack a permutation of the four answer slots into one byte"""
+    return order[0] | order[1] << 2 | order[2] << 4 | order[3] << 6
+
+
+def unpack_order(packed):
+    return [packed & 3, packed >> 2 & 3, packed >> 4 & 3, packed >> 6 & 3]
+
+
+class SessionRecorder:
+    """QuizSession recorder that writes every prepare, serve, release, answer and reset to a file
+
+    Passes answers and resets on to `inner` (e.g. the review history), so
+    it can sit in front of the app's normal recorder.
+    """
+
+    def __init__(self, path, card_count, seed=None, selector='random', inner=None):
+        self.path = path
+        self.inner = inner
+        self.events = 0
+        self._order = 0     # option order of the question being answered
+        self._buffer = bytearray()
+        self._file = open(path, 'wb')
+        self._file.write(RECORDING_HEADER.pack(
+            RECORDING_MAGIC, -1 if seed is None else seed, card_count,
+            SELECTORS.index(selector), time.time()
+        ))
+
+    def _append(self, kind, card_index, chosen, timestamp, latency, order=None):
+        order = self._order if order is None else order
+        self._buffer += EVENT.pack(kind, card_index, order, chosen, timestamp, latency)
+        self.events += 1
+        if len(self._buffer) >= WRITE_BUFFER:
+            self._file.write(self._buffer)
+            self._buffer.clear()
+
+    def record_prepare(self, question, picked):
+        self._append(EVENT_PREPARE, question.card_index, -1 if picked else PREPARED_BY_INDEX,
+                     time.time(), 0.0, pack_order(question.order))
+
+    def record_serve(self, question, served_at):
+        self._order = pack_order(question.order)
+        self._append(EVENT_SERVE, question.card_index, -1, time.time(), 0.0)
+
+    def record_release(self, question):
+        self._append(EVENT_RELEASE, question.card_index, -1, time.time(), 0.0, pack_order(question.order))
+
+    def record(self, event):
+        self._append(EVENT_ANSWER, event.card_id, event.chosen, event.timestamp, event.latency)
+        if self.inner is not None:
+            self.inner.record(event)
+
+    def record_reset(self, timestamp):
+        self._append(EVENT_RESET, 0, -1, timestamp, 0.0)
+        if self.inner is not None:
+            self.inner.record_reset(timestamp)
+
+    def finish(self):
+        """Write out buffered events and close the file"""
+        if self._file.closed:
+            return
+        self._file.write(self._buffer)
+        self._buffer.clear()
+        self._file.close()
+
+
+def read_recording(path):
+    """Return (header dict, list of event tuples) for a recording file"""
+    with open(path, 'rb') as file:
+        data = file.read()
+    if len(data) < RECORDING_HEADER.size:
+        raise ValueError("Recording header is truncated")
+    magic, seed, card_count, selector, started_at = RECORDING_HEADER.unpack_from(data)
+    if magic not in (RECORDING_MAGIC, LEGACY_RECORDING_MAGIC):
+        raise ValueError("Not a session recording")
+    end = RECORDING_HEADER.size + (len(data) - RECORDING_HEADER.size) // EVENT.size * EVENT.size
+    events = list(EVENT.iter_unpack(data[RECORDING_HEADER.size:end]))
+    header = {
+        'seed': None if seed < 0 else seed,
+        'card_count': card_count,
+        'selector': SELECTORS[selector],
+        'started_at': started_at,
+    }
+    return header, events
+
+
+class Replayer:
+    """Drives a fresh QuizSession through a recording as fast as it can
+
+    By default every recorded card is served by index, so the same cards
+    are answered with the same slots whatever the selector does. With
+    verify=True the session picks its own cards from the recorded seed and
+    a clock that replays the recorded timestamps instead, preparing,
+    serving and releasing questions in the recorded order, so cards the
+    app prefetched are picked when they were. A seeded session that
+    started from a blank history picks the same cards again, and every
+    pick that differs is counted.
+    """
+
+    def __init__(self, deck, header, events):
+        if header['card_count'] != len(deck):
+            raise ValueError(f"Recording is for {header['card_count']} cards, "
+                             f"deck has {len(deck)}")
+        self.deck = deck
+        self.header = header
+        self.events = events
+        self.now = header['started_at']
+
+    def _session(self):
+        rng = random.Random(self.header['seed'])
+        selector = None
+        if self.header['selector'] == 'sm2':
+            selector = SpacedRepetitionScheduler(self.deck, rng, clock=lambda: self.now)
+        elif self.header['selector'] == 'drill':
+            selector = WeakAreaSelector(self.deck, rng)
+        return QuizSession(self.deck, rng=rng, selector=selector)
+
+    @staticmethod
+    def _find(prepared, card_index):
+        """Position of the oldest prepared question recorded for card_index"""
+        for position, (recorded, _) in enumerate(prepared):
+            if recorded == card_index:
+                return position
+        return None
+
+    def run(self, verify=False, repeat=1):
+        """Replay the recording `repeat` times, each on a fresh session"""
+        serve_times = Histogram()
+        answer_times = Histogram()
+        clock = time.perf_counter
+        mismatches = 0
+
+        start = clock()
+        for _ in range(repeat):
+            session = self._session()
+            question = None
+            prepared = []   # (recorded card index, question) prepared but not yet served
+            for kind, card_index, _, chosen, timestamp, _ in self.events:
+                self.now = timestamp
+                if kind == EVENT_PREPARE and verify:
+                    by_index = chosen == PREPARED_BY_INDEX
+                    picked = session.prepare_question(card_index if by_index else None)
+                    prepared.append((card_index, picked))
+                    if picked.card_index != card_index:
+                        mismatches += 1
+                elif kind == EVENT_RELEASE and verify:
+                    # Skipped questions were released by serve(); only prepared ones are left
+                    position = self._find(prepared, card_index)
+                    if position is not None:
+                        session.release(prepared.pop(position)[1])
+                elif kind == EVENT_SERVE:
+                    position = self._find(prepared, card_index) if verify else None
+                    before = clock()
+                    if position is not None:
+                        question = session.serve(prepared.pop(position)[1])
+                    else:
+                        # Version 1 recordings, or replaying by index
+                        question = session.next_question(None if verify else card_index)
+                    serve_times.record(clock() - before)
+                    if position is None and question.card_index != card_index:
+                        mismatches += 1
+                elif kind == EVENT_ANSWER:
+                    if question is None or session.answered:
+                        continue
+                    if chosen == TYPED_MISS:
+                        # A typed answer that didn't match; any miss scores the same
+                        before = clock()
+                        session.answer_typed('')
+                    else:
+                        # The recording holds the answer slot; find where it sits now
+                        position = question.order.index(chosen) if question.card_index == card_index \
+                            else question.correct_index
+                        before = clock()
+                        session.answer(position)
+                    answer_times.record(clock() - before)
+                elif kind == EVENT_RESET:
+                    session.reset_score()
+        elapsed = clock() - start
+
+        events = len(self.events) * repeat
+        return {
+            'events': events,
+            'elapsed_seconds': elapsed,
+            'events_per_second': events / elapsed if elapsed > 0 else float('inf'),
+            'score': session.scorer.score,
+            'total_answered': session.scorer.total_answered,
+            'mismatches': mismatches,
+            'serve': serve_times.to_dict(),
+            'answer': answer_times.to_dict(),
+        }
+
+
+def compare(report, baseline):
+    """Lines comparing a replay report with an earlier one"""
+    def change(new, old):
+        return f"{(new / old - 1) * 100:+.1f}%" if old else "n/a"
+
+    lines = [f"throughput: {report['events_per_second']:,.0f} vs "
+             f"{baseline['events_per_second']:,.0f} events/s "
+             f"({change(report['events_per_second'], baseline['events_per_second'])})"]
+    for step in ('serve', 'answer'):
+        for key in ('p50_ms', 'p99_ms'):
+            new, old = report[step][key], baseline[step][key]
+            lines.append(f"{step} {key[:-3]}: {new:.4f} vs {old:.4f} ms ({change(new, old)})")
+    return lines
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a recorded quiz session against the engine")
+    parser.add_argument('recording', help="file written by --record")
+    parser.add_argument('--deck', default=str(DEFAULT_DECK_PATH), help="flashcard CSV file")
+    parser.add_argument('--repeat', type=int, default=1, help="replay the recording this many times")
+    parser.add_argument('--verify', action='store_true',
+                        help="let the session pick cards and count picks that differ")
+    parser.add_argument('--baseline', help="JSON report of an earlier replay to compare with")
+    parser.add_argument('--json', action='store_true', help="print the report as JSON")
+    args = parser.parse_args()
+
+    header, events = read_recording(args.recording)
+    replayer = Replayer(Deck.load(args.deck), header, events)
+    report = replayer.run(verify=args.verify, repeat=args.repeat)
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    print(f"{report['events']:,} events in {report['elapsed_seconds']:.3f}s "
+          f"({report['events_per_second']:,.0f} events/s)")
+    print(f"Score: {report['score']}/{report['total_answered']}")
+    print(f"Serve:  p50 {report['serve']['p50_ms']:.4f} ms, p99 {report['serve']['p99_ms']:.4f} ms")
+    print(f"Answer: p50 {report['answer']['p50_ms']:.4f} ms, p99 {report['answer']['p99_ms']:.4f} ms")
+    if args.verify:
+        print(f"Cards picked differently: {report['mismatches']:,}")
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as file:
+            baseline = json.load(file)
+        for line in compare(report, baseline):
+            print(line)
+
+
+if __name__ == "__main__":
+    main()
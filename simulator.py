@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Quiz Session Simulator
+Drives the quiz engine with scripted answers, without a display
+"""
+
+import argparse
+import random
+import time
+
+from quiz_engine import DEFAULT_DECK_PATH, Deck, QuizSession
+from drill import WeakAreaSelector
+from scheduler import SpacedRepetitionScheduler
+from session_replay import SessionRecorder
+
+
+def accuracy_policy(accuracy, rng):
+    """Answer correctly with the given probability, otherwise pick a wrong option"""
+    def choose(question):
+        if rng.random() < accuracy:
+            return question.correct_index
+        wrong = rng.randrange(3)
+        return wrong + 1 if wrong >= question.correct_index else wrong
+    return choose
+
+
+def scripted_policy(script):
+    """Replay a fixed sequence of option indexes, repeating it when exhausted"""
+    script = list(script)
+    if not script:
+        raise ValueError("Answer script is empty")
+    position = [0]
+
+    def choose(question):
+        choice = script[position[0] % len(script)]
+        position[0] += 1
+        return choice
+    return choose
+
+
+def run_simulation(session, events, policy):
+    """Answer `events` questions with `policy` and return throughput stats"""
+    next_question = session.next_question
+    answer = session.answer
+    start = time.perf_counter()
+    for _ in range(events):
+        answer(policy(next_question()))
+    elapsed = time.perf_counter() - start
+    return {
+        'events': events,
+        'elapsed_seconds': elapsed,
+        'events_per_minute': events / elapsed * 60 if elapsed > 0 else float('inf'),
+        'score': session.scorer.score,
+        'total_answered': session.scorer.total_answered,
+        'percentage': session.scorer.percentage,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a headless quiz session simulation")
+    parser.add_argument('--deck', default=str(DEFAULT_DECK_PATH), help="flashcard CSV file")
+    parser.add_argument('--events', type=int, default=1_000_000, help="answer events to simulate")
+    parser.add_argument('--accuracy', type=float, default=0.75, help="probability of a correct answer")
+    parser.add_argument('--script', help="comma-separated option indexes (0-3) to answer with instead")
+    parser.add_argument('--seed', type=int, help="seed for card selection and answers")
+    parser.add_argument('--selector', choices=('random', 'sm2', 'drill'), default='random',
+                        help="card selection strategy")
+    parser.add_argument('--record', metavar='FILE', help="record the session for session_replay.py")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    deck = Deck.load(args.deck)
+    selector = None
+    if args.selector == 'sm2':
+        selector = SpacedRepetitionScheduler(deck, rng)
+    elif args.selector == 'drill':
+        selector = WeakAreaSelector(deck, rng)
+    recorder = None
+    if args.record:
+        recorder = SessionRecorder(args.record, len(deck), args.seed, args.selector)
+    session = QuizSession(deck, rng=rng, selector=selector, recorder=recorder)
+    if args.script:
+        policy = scripted_policy(int(choice) for choice in args.script.split(','))
+    else:
+        policy = accuracy_policy(args.accuracy, random.Random(args.seed))
+
+    stats = run_simulation(session, args.events, policy)
+    if recorder is not None:
+        recorder.finish()
+    print(f"{stats['events']:,} answer events in {stats['elapsed_seconds']:.2f}s "
+          f"({stats['events_per_minute'] / 1e6:.2f}M events/min)")
+    print(f"Score: {stats['score']}/{stats['total_answered']} ({stats['percentage']}%)")
+
+
+if __name__ == "__main__":
+    main()
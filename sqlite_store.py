@@ -0,0 +1,368 @@
+#!/usr/bin/env python3
+"""
+SQLite Storage
+Cards, score sessions and review history in a local SQLite database
+"""
+
+import argparse
+import csv
+import json
+import sqlite3
+import time
+import warnings
+from array import array
+from pathlib import Path
+
+import deck_validator
+import distractors
+import near_duplicates
+from card_store import CARD_FIELDS, CardStore
+from deck_watch import _numbered, card_identity
+from quiz_engine import Deck
+from scheduler import STATE_ARRAYS
+
+
+DEFAULT_DB_PATH = Path(__file__).parent / "data" / "progress" / "jkd.sqlite3"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS cards (
+    id INTEGER PRIMARY KEY,
+    concept_number INTEGER NOT NULL,
+    concept_name TEXT NOT NULL,
+    question_type TEXT NOT NULL,
+    question_text TEXT NOT NULL,
+    correct_answer TEXT NOT NULL,
+    wrong_answer_1 TEXT NOT NULL,
+    wrong_answer_2 TEXT NOT NULL,
+    wrong_answer_3 TEXT NOT NULL,
+    explanation TEXT NOT NULL DEFAULT ''
+);
+CREATE TABLE IF NOT EXISTS card_state (
+    card_id INTEGER PRIMARY KEY REFERENCES cards(id) ON DELETE CASCADE,
+    ease REAL NOT NULL,
+    interval REAL NOT NULL,
+    repetitions INTEGER NOT NULL,
+    lapses INTEGER NOT NULL,
+    due REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS sessions (
+    id INTEGER PRIMARY KEY,
+    started_at REAL NOT NULL,
+    ended_at REAL
+);
+CREATE TABLE IF NOT EXISTS reviews (
+    id INTEGER PRIMARY KEY,
+    session_id INTEGER NOT NULL REFERENCES sessions(id),
+    card_id INTEGER NOT NULL REFERENCES cards(id) ON DELETE CASCADE,
+    chosen INTEGER NOT NULL,
+    correct INTEGER NOT NULL,
+    latency REAL NOT NULL,
+    timestamp REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_cards_concept ON cards(concept_number);
+CREATE INDEX IF NOT EXISTS idx_cards_type ON cards(question_type);
+CREATE INDEX IF NOT EXISTS idx_card_state_due ON card_state(due);
+CREATE INDEX IF NOT EXISTS idx_reviews_card ON reviews(card_id);
+CREATE INDEX IF NOT EXISTS idx_reviews_session ON reviews(session_id);
+"""
+
+_CARD_COLUMNS = ', '.join(CARD_FIELDS)
+
+# Statements are kept as constants so sqlite3's statement cache reuses
+# their prepared form on every call
+SELECT_CARDS = f"SELECT id, {_CARD_COLUMNS} FROM cards ORDER BY id"
+UPSERT_CARD = f"""
+    INSERT INTO cards (id, {_CARD_COLUMNS}) VALUES (?, {', '.join('?' * len(CARD_FIELDS))})
+    ON CONFLICT(id) DO UPDATE SET {', '.join(f'{field} = excluded.{field}' for field in CARD_FIELDS)}
+"""
+INSERT_REVIEW = """
+    INSERT INTO reviews (session_id, card_id, chosen, correct, latency, timestamp)
+    VALUES (?, ?, ?, ?, ?, ?)
+"""
+UPSERT_STATE = """
+    INSERT INTO card_state (card_id, ease, interval, repetitions, lapses, due)
+    VALUES (?, ?, ?, ?, ?, ?)
+    ON CONFLICT(card_id) DO UPDATE SET
+        ease = excluded.ease, interval = excluded.interval,
+        repetitions = excluded.repetitions, lapses = excluded.lapses, due = excluded.due
+"""
+SELECT_DUE = """
+    SELECT c.id FROM cards c JOIN card_state s ON s.card_id = c.id
+    WHERE s.due <= ? {filters} ORDER BY s.due
+"""
+SELECT_UNSEEN = """
+    SELECT c.id FROM cards c LEFT JOIN card_state s ON s.card_id = c.id
+    WHERE s.card_id IS NULL {filters} ORDER BY c.id
+"""
+ACCURACY_BY = """
+    SELECT c.{column}, COUNT(*), SUM(r.correct)
+    FROM reviews r JOIN cards c ON c.id = r.card_id
+    GROUP BY c.{column} ORDER BY c.{column}
+"""
+
+
+class SQLiteStore:
+    """Card loader and score recorder backed by a SQLite database
+
+    Implements the same restore/record/close interface as ReviewHistory, so
+    a QuizSession can use either as its recorder.
+    """
+
+    def __init__(self, db_path=DEFAULT_DB_PATH):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(self.db_path), cached_statements=256)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("PRAGMA foreign_keys=ON")
+        self.conn.executescript(SCHEMA)
+        self._add_review_foreign_key()
+        self.card_ids = array('q')
+        self.scheduler = None
+        self.session_id = None
+
+    def _add_review_foreign_key(self):
+        """Rebuild a reviews table from before reviews referenced their card
+
+        Reviews whose card is gone are dropped; they can't be told apart
+        from reviews of whatever card took over its id.
+        """
+        if any(key[2] == 'cards' for key in self.conn.execute("PRAGMA foreign_key_list(reviews)")):
+            return
+        columns = "id, session_id, card_id, chosen, correct, latency, timestamp"
+        # The schema runs again after the old table (and its indexes) are dropped
+        self.conn.executescript(f"""
+            BEGIN;
+            ALTER TABLE reviews RENAME TO reviews_without_card_key;
+            {SCHEMA}
+            INSERT INTO reviews ({columns})
+                SELECT {columns} FROM reviews_without_card_key WHERE card_id IN (SELECT id FROM cards);
+            DROP TABLE reviews_without_card_key;
+            {SCHEMA}
+            COMMIT;
+        """)
+
+    # Cards
+
+    def card_count(self):
+        return self.conn.execute("SELECT COUNT(*) FROM cards").fetchone()[0]
+
+    def load_deck(self):
+        """Load every card into a Deck, remembering each card's row id"""
+        self.card_ids = array('q')
+        rows = []
+        for row in self.conn.execute(SELECT_CARDS):
+            self.card_ids.append(row[0])
+            rows.append(dict(zip(CARD_FIELDS, row[1:])))
+        return Deck(CardStore.from_rows(rows))
+
+    def import_rows(self, rows, replace=True, cache_path=None):
+        """Insert cards in one transaction, optionally replacing the deck
+
+        When replacing, cards are matched to the stored ones as deck_watch
+        matches them (concept number and question text): matched cards are
+        updated under their row id, so their scheduling state and reviews
+        stay with them, and stored cards with no match are deleted along
+        with theirs. Rows that can't be loaded are left out with a warning,
+        and near-duplicate cards or near-copied wrong answers are pointed
+        out with another. Missing wrong answers are generated as
+        deck_cache.read_rows() does, cached at `cache_path`.
+        """
+        skipped = []
+        near_copies = []
+        rows = list(deck_validator.usable_rows(rows, skipped, near_copies))
+        if skipped:
+            warnings.warn(deck_validator.skipped_message(skipped))
+        duplicates = near_duplicates.deck_warning(rows, near_copies)
+        if duplicates:
+            warnings.warn(duplicates)
+        if any(distractors.weak_slots(row) for row in rows):
+            try:
+                rows = distractors.fill_distractors(rows, cache_path)
+            except ImportError as error:
+                warnings.warn(f"Cards with missing wrong answers left as-is: {error}")
+        with self.conn:
+            ids = [None] * len(rows)
+            if replace:
+                stored = self.conn.execute(
+                    "SELECT id, concept_number, question_text FROM cards ORDER BY id"
+                ).fetchall()
+                unmatched = dict(zip(
+                    _numbered(card_identity(number, question) for _, number, question in stored),
+                    (card_id for card_id, _, _ in stored),
+                ))
+                ids = [unmatched.pop(identity, None) for identity in _numbered(
+                    card_identity(row['concept_number'], row['question_text']) for row in rows
+                )]
+                self.conn.executemany("DELETE FROM cards WHERE id = ?", ((card_id,) for card_id in unmatched.values()))
+            next_id = self.conn.execute("SELECT COALESCE(MAX(id) + 1, 0) FROM cards").fetchone()[0]
+            for i, card_id in enumerate(ids):
+                if card_id is None:
+                    ids[i] = next_id
+                    next_id += 1
+            self.conn.executemany(UPSERT_CARD, (
+                (card_id, int(row['concept_number']),
+                 *(row.get(field) or '' for field in CARD_FIELDS[1:]))
+                for card_id, row in zip(ids, rows)
+            ))
+        return self.card_count()
+
+    def import_csv(self, csv_path, replace=True):
+        with open(csv_path, 'r', encoding='utf-8', newline='') as file:
+            return self.import_rows(csv.DictReader(file), replace, distractors.default_cache_path(csv_path))
+
+    def import_json(self, json_path, replace=True):
+        with open(json_path, 'r', encoding='utf-8') as file:
+            return self.import_rows(json.load(file), replace, distractors.default_cache_path(json_path))
+
+    def export_rows(self):
+        """Yield every card as a dict in the flashcard CSV/JSON format"""
+        for row in self.conn.execute(SELECT_CARDS):
+            card = dict(zip(CARD_FIELDS, row[1:]))
+            card['concept_number'] = str(card['concept_number'])
+            yield card
+
+    def export_csv(self, csv_path):
+        with open(csv_path, 'w', encoding='utf-8', newline='') as file:
+            writer = csv.DictWriter(file, fieldnames=CARD_FIELDS)
+            writer.writeheader()
+            writer.writerows(self.export_rows())
+
+    def export_json(self, json_path):
+        with open(json_path, 'w', encoding='utf-8') as file:
+            json.dump(list(self.export_rows()), file, indent=2, ensure_ascii=False)
+
+    # Score and scheduling state
+
+    def restore(self, scorer, scheduler=None):
+        """Resume the open score session and load scheduling state"""
+        row = self.conn.execute(
+            "SELECT id FROM sessions WHERE ended_at IS NULL ORDER BY id DESC LIMIT 1"
+        ).fetchone()
+        if row is None:
+            self._start_session(time.time())
+        else:
+            self.session_id = row[0]
+            total, correct = self.conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(correct), 0) FROM reviews WHERE session_id = ?",
+                (self.session_id,)
+            ).fetchone()
+            scorer.score = correct
+            scorer.total_answered = total
+
+        self.scheduler = scheduler
+        if scheduler is not None:
+            index_of = {card_id: index for index, card_id in enumerate(self.card_ids)}
+            arrays = {
+                name: array(values.typecode, values)
+                for name, values in scheduler.state_arrays().items()
+            }
+            for card_id, *state in self.conn.execute(
+                f"SELECT card_id, {', '.join(STATE_ARRAYS)} FROM card_state"
+            ):
+                index = index_of.get(card_id)
+                if index is None:
+                    continue
+                for name, value in zip(STATE_ARRAYS, state):
+                    arrays[name][index] = value
+            scheduler.load_state(arrays)
+
+    def _start_session(self, timestamp):
+        with self.conn:
+            cursor = self.conn.execute("INSERT INTO sessions (started_at) VALUES (?)", (timestamp,))
+        self.session_id = cursor.lastrowid
+
+    def record(self, event):
+        """Store a review and the card's new scheduling state"""
+        card_id = self.card_ids[event.card_id]
+        with self.conn:
+            self.conn.execute(INSERT_REVIEW, (
+                self.session_id, card_id, event.chosen, int(event.correct),
+                event.latency, event.timestamp
+            ))
+            if self.scheduler is not None:
+                self.conn.execute(UPSERT_STATE, (
+                    card_id,
+                    *(getattr(self.scheduler, name)[event.card_id] for name in STATE_ARRAYS)
+                ))
+
+    def record_reset(self, timestamp):
+        """Close the current score session and open a new one"""
+        with self.conn:
+            self.conn.execute(
+                "UPDATE sessions SET ended_at = ? WHERE id = ?", (timestamp, self.session_id)
+            )
+        self._start_session(timestamp)
+
+    def close(self, scorer=None, scheduler=None):
+        self.conn.close()
+
+    # Indexed queries
+
+    def due_cards(self, concept_number=None, question_type=None, now=None, include_unseen=True):
+        """Row ids of cards due at `now`, optionally within a concept and question type"""
+        now = time.time() if now is None else now
+        filters = ''
+        params = []
+        if concept_number is not None:
+            filters += " AND c.concept_number = ?"
+            params.append(concept_number)
+        if question_type is not None:
+            filters += " AND c.question_type = ?"
+            params.append(question_type)
+        due = [row[0] for row in self.conn.execute(SELECT_DUE.format(filters=filters), [now, *params])]
+        if include_unseen:
+            due += [row[0] for row in self.conn.execute(SELECT_UNSEEN.format(filters=filters), params)]
+        return due
+
+    def accuracy_by_question_type(self):
+        """{question_type: (answered, correct)} over all recorded reviews"""
+        return self._accuracy_by('question_type')
+
+    def accuracy_by_concept(self):
+        """{concept_number: (answered, correct)} over all recorded reviews"""
+        return self._accuracy_by('concept_number')
+
+    def _accuracy_by(self, column):
+        return {
+            key: (answered, correct)
+            for key, answered, correct in self.conn.execute(ACCURACY_BY.format(column=column))
+        }
+
+
+def main():
+    from quiz_engine import DEFAULT_DECK_PATH
+
+    parser = argparse.ArgumentParser(description="Manage the SQLite flashcard database")
+    parser.add_argument('--db', default=str(DEFAULT_DB_PATH), help="database file")
+    commands = parser.add_subparsers(dest='command', required=True)
+    import_cmd = commands.add_parser('import', help="load cards from a CSV or JSON deck")
+    import_cmd.add_argument('path', nargs='?', default=str(DEFAULT_DECK_PATH))
+    import_cmd.add_argument('--append', action='store_true', help="keep existing cards")
+    export_cmd = commands.add_parser('export', help="write cards to a CSV or JSON deck")
+    export_cmd.add_argument('path')
+    due_cmd = commands.add_parser('due', help="list due cards")
+    due_cmd.add_argument('--concept', type=int)
+    due_cmd.add_argument('--type', dest='question_type')
+    commands.add_parser('accuracy', help="accuracy per question type")
+    args = parser.parse_args()
+
+    store = SQLiteStore(args.db)
+    if args.command == 'import':
+        importer = store.import_json if args.path.endswith('.json') else store.import_csv
+        count = importer(args.path, replace=not args.append)
+        print(f"{count} cards in {args.db}")
+    elif args.command == 'export':
+        (store.export_json if args.path.endswith('.json') else store.export_csv)(args.path)
+        print(f"Exported {store.card_count()} cards to {args.path}")
+    elif args.command == 'due':
+        due = store.due_cards(args.concept, args.question_type)
+        print(f"{len(due)} cards due: {', '.join(map(str, due))}")
+    else:
+        for question_type, (answered, correct) in store.accuracy_by_question_type().items():
+            print(f"{question_type:<24} {correct}/{answered} ({int(correct / answered * 100)}%)")
+    store.close()
+
+
+if __name__ == "__main__":
+    main()
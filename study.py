@@ -0,0 +1,117 @@
+"""
+Study Setup
+Opens the selected decks, saved progress and quiz session for any frontend
+"""
+
+import random
+import warnings
+
+from deck_library import DEFAULT_DECK_NAME, DeckLibrary
+from deck_watch import DeckWatcher
+from quiz_engine import DEFAULT_DECK_PATH, Deck, QuizSession, Scorer
+from review_log import DEFAULT_PROGRESS_DIR, ReviewHistory
+from scheduler import SpacedRepetitionScheduler
+
+
+class Study:
+    """One learner's decks, progress and SM-2 session, without any UI
+
+    The Tk and terminal frontends both build one of these and only differ
+    in how they show questions and problems. open() returns warnings about
+    the decks instead of showing them and raises FileNotFoundError,
+    KeyError or ValueError when there is nothing to study. SQLite support
+    is imported only when that storage is picked.
+    """
+
+    def __init__(self, storage='log', seed=None, record_path=None, decks=None, concepts=None):
+        self.storage = storage
+        self.seed = seed
+        self.record_path = record_path
+        self.library = None
+        self.deck_names = None  # None: the default deck, without the library
+        if decks or concepts:
+            self.library = DeckLibrary()
+            self.deck_names = list(decks) if decks else self.library.decks_for(concepts)
+        progress = self.progress_name()
+        if storage == 'sqlite':
+            from sqlite_store import DEFAULT_DB_PATH, SQLiteStore
+            db_path = DEFAULT_DB_PATH.with_name(f"{progress}.sqlite3") if progress else DEFAULT_DB_PATH
+            self.history = SQLiteStore(db_path)
+        else:
+            self.history = ReviewHistory(DEFAULT_PROGRESS_DIR / progress if progress else DEFAULT_PROGRESS_DIR)
+        self.deck = None
+        self.scheduler = None
+        self.session = None
+        self.session_recorder = None
+        self.deck_watcher = None
+
+    @property
+    def uses_database(self):
+        return self.storage == 'sqlite'
+
+    def progress_name(self):
+        """Name progress is saved under for the selected decks, None for the default deck"""
+        if self.deck_names is None or self.deck_names == [DEFAULT_DECK_NAME]:
+            return None
+        return '+'.join(name.replace('/', '-') for name in self.deck_names)
+
+    def deck_paths(self):
+        if self.deck_names is None:
+            return [DEFAULT_DECK_PATH]
+        return [self.library.decks[name].path for name in self.deck_names]
+
+    def open(self):
+        """Load the decks and saved progress and start the session; returns warning messages"""
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter('always')
+            if self.uses_database:
+                if not self.history.card_count():
+                    for i, csv_path in enumerate(self.deck_paths()):
+                        self.history.import_csv(csv_path, replace=i == 0)
+                self.deck = self.history.load_deck()
+            elif self.deck_names is not None:
+                self.deck = self.library.session_deck(self.deck_names)
+            else:
+                self.deck = Deck.load(DEFAULT_DECK_PATH)
+        messages = [str(warning.message) for warning in caught]
+
+        if not len(self.deck):
+            raise ValueError("No flashcards found in CSV file!")
+        rng = random.Random(self.seed)
+        self.scheduler = SpacedRepetitionScheduler(self.deck, rng)
+        scorer = Scorer()
+        self.history.restore(scorer, self.scheduler)
+        recorder = self.history
+        if self.record_path:
+            from session_replay import SessionRecorder
+            recorder = self.session_recorder = SessionRecorder(
+                self.record_path, len(self.deck), self.seed, 'sm2', inner=self.history
+            )
+        self.session = QuizSession(
+            self.deck,
+            rng=rng,
+            selector=self.scheduler,
+            scorer=scorer,
+            recorder=recorder
+        )
+        paths = self.deck_paths()
+        if not self.uses_database and len(paths) == 1:
+            # The SQLite deck lives in the database, not in the CSV
+            self.deck_watcher = DeckWatcher(paths[0], self.deck, self.scheduler)
+        return messages
+
+    def review_data(self):
+        """Review history as analytics.ReviewData; raises ImportError without NumPy"""
+        from analytics import ReviewData
+
+        if self.uses_database:
+            return ReviewData.load(self.deck, databases=[self.history.db_path])
+        self.history.log.flush()
+        return ReviewData.load(self.deck, progress_dirs=[self.history.directory])
+
+    def close(self):
+        """Save progress and finish any recording"""
+        if self.session:
+            self.history.close(self.session.scorer, self.scheduler)
+        if self.session_recorder is not None:
+            self.session_recorder.finish()
@@ -0,0 +1,428 @@
+#!/usr/bin/env python3
+"""
+Terminal Flashcard App
+Quizzes in a terminal, full screen with curses or one prompt at a time
+"""
+
+import argparse
+import shutil
+import sys
+import textwrap
+
+from concept_store import ConceptStore
+from deck_watch import POLL_INTERVAL
+from prefetch import QuestionPrefetcher
+from study import Study
+
+
+# Keys that pick answers A-D; digits work too
+ANSWER_KEYS = 'abcd'
+
+HELP = "a-d answer  n next  s source  t stats  r reset score  q quit"
+
+# Typed answers take letters, so commands while typing start with ':'
+TYPED_HELP = "type your answer  :n skip  :s source  :t stats  :r reset score  :q quit"
+
+# Keys while an answer is being typed in the full-screen view, and after
+TYPING_HELP = "Enter answer  Esc skip  Tab source  Ctrl-C quit"
+TYPED_ANSWERED_HELP = "n next  s source  t stats  r reset score  q quit"
+
+
+class TerminalQuiz:
+    """The quiz flow shared by the curses and plain frontends
+
+    Holds the question on screen and the last answer, and turns each
+    command into text to show. Nothing here draws, so both frontends stay
+    a thin loop over the same Study and concept texts as the Tk app. With
+    `typed`, answers are typed instead of picked from the options.
+    """
+
+    def __init__(self, study, concepts, typed=False):
+        self.study = study
+        self.concepts = concepts
+        self.typed = typed
+        self.prefetcher = QuestionPrefetcher(study.session, concepts)
+        self.question = None
+        self.source_text = None
+        self.result = None
+        self.matcher = None
+        self.notice = ""
+
+    def next_question(self):
+        prepared = self.prefetcher.take()
+        self.question = self.study.session.serve(prepared.question)
+        self.source_text = prepared.source_text
+        self.result = None
+        if self.typed:
+            from typed_answers import AnswerMatcher
+            self.matcher = AnswerMatcher(self.question.correct_answer)
+        return self.question
+
+    def answer(self, index):
+        """Score option `index` of the question on screen, once"""
+        if self.result is None:
+            self.result = self.study.session.answer(index)
+            self.prefetcher.fill()
+        return self.result
+
+    def answer_text(self, text):
+        """Score a typed answer to the question on screen, once"""
+        if self.result is None:
+            self.result = self.study.session.answer_typed(text, self.matcher)
+            self.prefetcher.fill()
+        return self.result
+
+    def typing_hint(self, text):
+        """Live status of an answer still being typed"""
+        from typed_answers import typing_hint
+        return typing_hint(self.matcher.grade(text)) if text.strip() else ""
+
+    @property
+    def score(self):
+        return self.study.session.scorer.summary()
+
+    @property
+    def concept_line(self):
+        card = self.question.card
+        return f"Concept #{card['concept_number']}: {card['concept_name']}"
+
+    def source(self):
+        """(title, text) of the current card's concept"""
+        return self.concept_line, self.source_text
+
+    def stats(self):
+        """(title, text) of the progress report"""
+        try:
+            data = self.study.review_data()
+        except ImportError as e:
+            return "Progress Stats", str(e)
+        from analytics import format_report
+        return "Progress Stats", format_report(data, self.study.deck)
+
+    def reset_score(self):
+        self.study.session.reset_score()
+
+    def poll_deck(self):
+        """Apply edits to the deck CSV, noting what changed"""
+        watcher = self.study.deck_watcher
+        if watcher is None:
+            return
+        try:
+            changes = watcher.poll()
+        except (OSError, KeyError, ValueError) as e:
+            self.notice = f"Deck reload failed: {e}"
+            return
+        if changes is not None and any(changes):
+            self.prefetcher.clear()
+            self.prefetcher.fill()
+            self.notice = (f"Deck updated: {len(changes.added)} added, "
+                           f"{len(changes.changed)} changed, {len(changes.removed)} removed")
+
+
+def answer_index(key):
+    """Option position for an answer key, or None"""
+    key = key.lower()
+    if len(key) == 1 and key in ANSWER_KEYS:
+        return ANSWER_KEYS.index(key)
+    if key in ('1', '2', '3', '4'):
+        return int(key) - 1
+    return None
+
+
+def run_plain(quiz, read=input, write=print):
+    """Prompt-per-question loop for terminals without curses, or pipes"""
+    width = min(shutil.get_terminal_size().columns - 1, 100)
+    help_text = TYPED_HELP if quiz.typed else HELP
+    write("JEET KUNE DO TRAINING")
+    write(help_text)
+    quiz.next_question()
+    while True:
+        question = quiz.question
+        write("")
+        write(f"{quiz.score}   {quiz.concept_line}")
+        write(textwrap.fill(question.card['question_text'], width))
+        if not quiz.typed:
+            for i, option in enumerate(question.options):
+                write(textwrap.fill(f"{ANSWER_KEYS[i].upper()}) {option}", width, subsequent_indent='   '))
+        try:
+            line = read("> ").strip()
+        except EOFError:
+            return
+        quiz.poll_deck()
+        if quiz.notice:
+            write(quiz.notice)
+            quiz.notice = ""
+        typed_answer = None
+        if not quiz.typed:
+            command = line.lower()
+        elif line.startswith(':'):
+            command = line[1:].strip().lower()
+        else:
+            # Anything else is the answer; an empty line skips
+            command = '' if not line else None
+            typed_answer = line or None
+        index = answer_index(command) if command and not quiz.typed else None
+        if command == 'q':
+            return
+        elif (index is not None or typed_answer is not None) and quiz.result is None:
+            result = quiz.answer(index) if typed_answer is None else quiz.answer_text(typed_answer)
+            write(textwrap.fill(result.feedback(), width))
+            write(quiz.score)
+            try:
+                command = read("Enter for the next question, s for source: ").strip().lower()
+            except EOFError:
+                return
+            if command == 's':
+                title, text = quiz.source()
+                write(title)
+                write(text)
+            elif command == 'q':
+                return
+            quiz.next_question()
+        elif command in ('', 'n'):
+            quiz.next_question()
+        elif command == 's':
+            title, text = quiz.source()
+            write(title)
+            write(text)
+        elif command == 't':
+            title, text = quiz.stats()
+            write(title)
+            write(text)
+        elif command == 'r':
+            if read("Reset your score? [y/N] ").strip().lower() == 'y':
+                quiz.reset_score()
+                quiz.next_question()
+        else:
+            write(help_text)
+
+
+class CursesScreen:
+    """Full-screen frontend drawn with curses"""
+
+    def __init__(self, stdscr, quiz):
+        import curses
+
+        self.curses = curses
+        self.stdscr = stdscr
+        self.quiz = quiz
+        self.typed_text = ""
+        self.colors = {}
+        if curses.has_colors():
+            curses.use_default_colors()
+            for number, (name, color) in enumerate((
+                ('good', curses.COLOR_GREEN), ('bad', curses.COLOR_RED),
+                ('accent', curses.COLOR_YELLOW),
+            ), 1):
+                curses.init_pair(number, color, -1)
+                self.colors[name] = curses.color_pair(number)
+        curses.curs_set(0)
+        stdscr.timeout(int(POLL_INTERVAL * 1000))
+
+    def _put(self, row, text, attr=0):
+        height, width = self.stdscr.getmaxyx()
+        if row < height:
+            self.stdscr.addnstr(row, 0, text, width - 1, attr)
+        return row + 1
+
+    def _wrapped(self, row, text, attr=0, indent=''):
+        width = max(self.stdscr.getmaxyx()[1] - 1, 20)
+        for line in textwrap.wrap(text, width, subsequent_indent=indent) or ['']:
+            row = self._put(row, line, attr)
+        return row
+
+    def draw(self):
+        curses = self.curses
+        quiz = self.quiz
+        question = quiz.question
+        result = quiz.result
+        self.stdscr.erase()
+        row = self._put(0, "JEET KUNE DO TRAINING", curses.A_BOLD)
+        row = self._put(row, quiz.score, self.colors.get('good', 0))
+        row = self._put(row, quiz.concept_line, self.colors.get('accent', 0)) + 1
+        row = self._wrapped(row, question.card['question_text'], curses.A_BOLD) + 1
+        if quiz.typed:
+            row = self._wrapped(row, f"> {self.typed_text}" + ("_" if result is None else ""))
+            if result is None:
+                row = self._put(row, quiz.typing_hint(self.typed_text), curses.A_DIM)
+        for i, option in enumerate(() if quiz.typed else question.options):
+            attr = 0
+            if result is not None:
+                if i == question.correct_index:
+                    attr = self.colors.get('good', curses.A_BOLD)
+                elif i == result.selected_index:
+                    attr = self.colors.get('bad', curses.A_UNDERLINE)
+            row = self._wrapped(row, f"{ANSWER_KEYS[i].upper()}) {option}", attr, '   ')
+        if result is not None:
+            row = self._wrapped(row + 1, result.feedback(),
+                                self.colors.get('good' if result.is_correct else 'bad', 0))
+        height = self.stdscr.getmaxyx()[0]
+        if quiz.notice:
+            self._put(height - 2, quiz.notice, self.colors.get('accent', 0))
+        if not quiz.typed:
+            help_text = HELP
+        else:
+            help_text = TYPING_HELP if result is None else TYPED_ANSWERED_HELP
+        self._put(height - 1, help_text, curses.A_DIM)
+        self.stdscr.refresh()
+
+    def page(self, title, text):
+        """Scrollable view of a long text until q, Esc or Enter"""
+        curses = self.curses
+        top = 0
+        while True:
+            height, width = self.stdscr.getmaxyx()
+            lines = []
+            for paragraph in text.splitlines() or ['']:
+                lines.extend(textwrap.wrap(paragraph, max(width - 1, 20)) or [''])
+            visible = max(height - 3, 1)
+            top = max(0, min(top, len(lines) - visible))
+            self.stdscr.erase()
+            self._put(0, title, curses.A_BOLD)
+            for offset, line in enumerate(lines[top:top + visible]):
+                self._put(offset + 2, line)
+            self._put(height - 1, "up/down page-up/page-down scroll  q back", curses.A_DIM)
+            self.stdscr.refresh()
+            key = self.stdscr.getch()
+            if key in (ord('q'), 27, 10, 13, curses.KEY_ENTER):
+                return
+            if key in (curses.KEY_DOWN, ord('j')):
+                top += 1
+            elif key in (curses.KEY_UP, ord('k')):
+                top -= 1
+            elif key in (curses.KEY_NPAGE, ord(' ')):
+                top += visible
+            elif key == curses.KEY_PPAGE:
+                top -= visible
+
+    def confirm(self, prompt):
+        height = self.stdscr.getmaxyx()[0]
+        self._put(height - 2, prompt, self.curses.A_BOLD)
+        self.stdscr.timeout(-1)
+        key = self.stdscr.getch()
+        self.stdscr.timeout(int(POLL_INTERVAL * 1000))
+        return key in (ord('y'), ord('Y'))
+
+    def type_answer(self):
+        """Edit the typed answer for one key; False when waiting timed out"""
+        curses = self.curses
+        quiz = self.quiz
+        try:
+            key = self.stdscr.get_wch()
+        except curses.error:
+            return False
+        quiz.notice = ""
+        if key in ('\n', '\r', curses.KEY_ENTER):
+            if self.typed_text.strip():
+                quiz.answer_text(self.typed_text)
+        elif key == '\x1b':
+            quiz.next_question()
+            self.typed_text = ""
+        elif key == '\t':
+            self.page(*quiz.source())
+        elif key in (curses.KEY_BACKSPACE, '\x7f', '\b'):
+            self.typed_text = self.typed_text[:-1]
+        elif key == '\x15':
+            self.typed_text = ""  # Ctrl-U
+        elif isinstance(key, str) and key.isprintable():
+            self.typed_text += key
+        return True
+
+    def run(self):
+        quiz = self.quiz
+        quiz.next_question()
+        while True:
+            self.draw()
+            if quiz.typed and quiz.result is None:
+                if not self.type_answer():
+                    quiz.poll_deck()
+                continue
+            key = self.stdscr.getch()
+            if key == -1:
+                # Timed out waiting for a key: check the deck file
+                quiz.poll_deck()
+                continue
+            if key == self.curses.KEY_RESIZE:
+                continue
+            quiz.notice = ""
+            char = chr(key) if 0 <= key < 256 else ''
+            index = answer_index(char)
+            if char.lower() == 'q':
+                return
+            elif index is not None:
+                quiz.answer(index)
+            elif char.lower() == 'n' or key in (10, 13, self.curses.KEY_ENTER) or char == ' ':
+                quiz.next_question()
+                self.typed_text = ""
+            elif char.lower() == 's':
+                self.page(*quiz.source())
+            elif char.lower() == 't':
+                self.page(*quiz.stats())
+            elif char.lower() == 'r':
+                if self.confirm("Reset your score? [y/N]"):
+                    quiz.reset_score()
+                    quiz.next_question()
+                    self.typed_text = ""
+
+
+def run_terminal(study, concepts, curses_ui=True, typed=False):
+    """Open the study and quiz in this terminal until the learner quits
+
+    Falls back to the plain prompt when curses is unavailable or the
+    output isn't a terminal. With `typed`, answers are typed instead of
+    picked. Returns a process exit code.
+    """
+    try:
+        for message in study.open():
+            print(message, file=sys.stderr)
+    except FileNotFoundError as e:
+        print(f"Flashcard file not found at: {e.filename}", file=sys.stderr)
+        return 1
+    except (KeyError, ValueError) as e:
+        print(f"Can't load decks: {e}", file=sys.stderr)
+        return 1
+
+    curses = None
+    if curses_ui and sys.stdout.isatty():
+        try:
+            import curses
+        except ImportError:
+            pass  # e.g. Windows without windows-curses
+
+    quiz = TerminalQuiz(study, concepts, typed)
+    try:
+        if curses is not None:
+            curses.wrapper(lambda stdscr: CursesScreen(stdscr, quiz).run())
+        else:
+            run_plain(quiz)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        study.close()
+    print(quiz.score)
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Jeet Kune Do flashcard trainer for the terminal")
+    parser.add_argument('--storage', choices=('log', 'sqlite'), default='log',
+                        help="where progress is kept (default: review log files)")
+    parser.add_argument('--deck', action='append', metavar='NAME',
+                        help="deck from data/ to study (repeatable)")
+    parser.add_argument('--concept', type=int, action='append', metavar='NUMBER',
+                        help="study every deck that teaches this concept (repeatable)")
+    parser.add_argument('--seed', type=int, help="seed for card order and answer shuffles")
+    parser.add_argument('--record', metavar='FILE',
+                        help="record the session for session_replay.py")
+    parser.add_argument('--plain', action='store_true',
+                        help="one prompt per question instead of a full-screen view")
+    parser.add_argument('--typed', action='store_true',
+                        help="type each answer instead of picking from the options")
+    args = parser.parse_args()
+
+    study = Study(args.storage, args.seed, args.record, args.deck, args.concept)
+    sys.exit(run_terminal(study, ConceptStore(), curses_ui=not args.plain, typed=args.typed))
+
+
+if __name__ == "__main__":
+    main()
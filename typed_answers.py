@@ -0,0 +1,204 @@
+"""
+Typed Answers
+Grades free-text answers against a card's correct answer with bit-parallel edit distance
+"""
+
+from collections import namedtuple
+
+from distractors import normalize_answer
+
+
+# (minimum length, edits allowed): typos forgiven in a normalised answer or
+# word of at least that many characters. Longer answers allow one edit per
+# LONG_ANSWER_CHARS characters.
+EDIT_ALLOWANCE = ((0, 0), (4, 1), (8, 2), (13, 3))
+LONG_ANSWER_CHARS = 6
+LONG_ANSWER_START = 20
+
+# Words a typed answer may leave out or add without counting against it
+FILLER_WORDS = frozenset((
+    'a', 'an', 'the', 'of', 'to', 'and', 'or', 'in', 'on', 'at', 'by', 'for',
+    'with', 'is', 'are', 'be', 'it', 'its', 'your', 'his', 'their',
+))
+
+# Extra key words a typed answer may add, per this many expected key words
+EXTRA_WORDS_PER = 4
+
+# Outcome of grading one typed answer. `distance` is the edit distance of
+# the whole normalised answers and `allowed` the edits forgiven at that
+# length; `matched` of `expected` key words were found among the typed
+# words, in any order. `close` marks a wrong answer worth a "nearly".
+TypedMatch = namedtuple('TypedMatch', 'is_correct close distance allowed matched expected')
+
+
+def allowed_edits(length):
+    """Edits forgiven in an answer or word of `length` normalised characters"""
+    if length >= LONG_ANSWER_START:
+        return length // LONG_ANSWER_CHARS
+    allowed = 0
+    for minimum, edits in EDIT_ALLOWANCE:
+        if length >= minimum:
+            allowed = edits
+    return allowed
+
+
+def pattern_masks(pattern):
+    """Bit i of masks[c] is set where pattern[i] == c (Myers' Peq table)"""
+    masks = {}
+    for i, char in enumerate(pattern):
+        masks[char] = masks.get(char, 0) | 1 << i
+    return masks
+
+
+def _advance(masks, full, high, state, text, states=None):
+    """Advance the DP column `state` over `text`
+
+    Hyyrö's bit-vector algorithm for the global Damerau (optimal string
+    alignment) distance, which builds on Myers': a column of the DP
+    matrix is held as vertical +1/-1 deltas in VP/VN, one bit per pattern
+    character, and `distance` tracks its bottom cell. D0 and the previous
+    character's match mask carry over so that swapping two neighbouring
+    characters costs one edit. Python ints make any pattern length one word.
+    The column after each character is appended to `states` if given.
+    """
+    vp, vn, d0, previous_eq, distance = state
+    for char in text:
+        eq = masks.get(char, 0)
+        d0 = ((((~d0 & eq) << 1) & previous_eq)
+              | (((eq & vp) + vp) ^ vp) | eq | vn) & full
+        hp = vn | (~(d0 | vp) & full)
+        hn = vp & d0
+        if hp & high:
+            distance += 1
+        elif hn & high:
+            distance -= 1
+        # The top row of the matrix grows by one per text character
+        hp = (hp << 1 | 1) & full
+        vp = ((hn << 1) | ~(d0 | hp)) & full
+        vn = hp & d0
+        previous_eq = eq
+        if states is not None:
+            states.append((vp, vn, d0, eq, distance))
+    return vp, vn, d0, previous_eq, distance
+
+
+def edit_distance(pattern, text, masks=None):
+    """Edit distance between two strings, bit-parallel over `pattern`
+
+    Insertions, deletions, substitutions and swaps of neighbouring
+    characters each cost one.
+    """
+    if not pattern:
+        return len(text)
+    masks = masks if masks is not None else pattern_masks(pattern)
+    full = (1 << len(pattern)) - 1
+    return _advance(masks, full, 1 << (len(pattern) - 1), _start(pattern), text)[-1]
+
+
+def _start(pattern):
+    """DP column before any text: row i holds i"""
+    return ((1 << len(pattern)) - 1, 0, 0, 0, len(pattern))
+
+
+class IncrementalDistance:
+    """Edit distance from a fixed pattern to text that grows and shrinks as it is typed
+
+    The DP column after every text character is kept, so a call only
+    processes the characters after the prefix it shares with the previous
+    call: one step per keystroke, and nothing at all for a backspace.
+    """
+
+    __slots__ = ('pattern', 'masks', 'full', 'high', 'text', 'states')
+
+    def __init__(self, pattern):
+        self.pattern = pattern
+        self.masks = pattern_masks(pattern)
+        self.full = (1 << len(pattern)) - 1
+        self.high = 1 << max(len(pattern) - 1, 0)
+        self.text = ''
+        self.states = [_start(pattern)]
+
+    def distance(self, text):
+        if not self.pattern:
+            return len(text)
+        previous = self.text
+        shared = 0
+        limit = min(len(previous), len(text))
+        while shared < limit and previous[shared] == text[shared]:
+            shared += 1
+        states = self.states
+        del states[shared + 1:]
+        _advance(self.masks, self.full, self.high, states[-1], text[shared:], states)
+        self.text = text
+        return states[-1][-1]
+
+
+class AnswerMatcher:
+    """Grades typed answers against one correct answer, fast enough to run per keystroke
+
+    An answer is correct when its normalised text is within the edits
+    allowed for the correct answer's length, or when every key word of the
+    correct answer (filler words aside) is typed, in any order and within
+    the edits allowed for that word's length, with at most a few key words
+    to spare. Word matches are remembered, so retyping an answer only
+    compares new words.
+    """
+
+    def __init__(self, correct_answer):
+        self.expected = normalize_answer(correct_answer)
+        self.allowed = allowed_edits(len(self.expected))
+        self.whole = IncrementalDistance(self.expected)
+        words = self.expected.split()
+        self.key_words = sorted({word for word in words if word not in FILLER_WORDS} or set(words))
+        self._word_patterns = [
+            (word, pattern_masks(word), allowed_edits(len(word))) for word in self.key_words
+        ]
+        self._key_positions = {word: position for position, word in enumerate(self.key_words)}
+        self.extra_words = max(1, len(self.key_words) // EXTRA_WORDS_PER)
+        self._word_matches = {}   # typed word -> key word positions it matches
+
+    def _matches(self, word):
+        found = self._word_matches.get(word)
+        if found is None and word in self._key_positions:
+            found = self._word_matches[word] = (self._key_positions[word],)
+        if found is None:
+            found = []
+            for position, (key, masks, allowed) in enumerate(self._word_patterns):
+                if allowed and abs(len(key) - len(word)) <= allowed \
+                        and edit_distance(key, word, masks) <= allowed:
+                    found.append(position)
+            found = self._word_matches[word] = tuple(found)
+        return found
+
+    def grade(self, typed):
+        """TypedMatch for a typed answer"""
+        text = normalize_answer(typed)
+        distance = self.whole.distance(text)
+        covered = set()
+        extra = 0
+        for word in text.split():
+            if word in FILLER_WORDS:
+                continue
+            found = self._matches(word)
+            if found:
+                covered.update(found)
+            else:
+                extra += 1
+        matched = len(covered)
+        expected = len(self.key_words)
+        is_correct = bool(text) and (
+            distance <= self.allowed or (matched == expected and extra <= self.extra_words)
+        )
+        close = not is_correct and bool(text) and bool(
+            (self.allowed and distance <= 2 * self.allowed) or (expected > 1 and matched * 4 >= expected * 3)
+        )
+        return TypedMatch(is_correct, close, distance, self.allowed, matched, expected)
+
+
+def typing_hint(match):
+    """Short live status for an answer being typed"""
+    if match.is_correct:
+        return "✓ Looks right, press Enter"
+    if match.close:
+        return "Nearly there"
+    return f"{match.matched} of {match.expected} key words"
@@ -5,6 +5,29 @@ let score = 0;
 let totalAnswered = 0;
 let currentAnswers = [];
 let correctAnswer = '';
+let correctIndex = -1;
+
+// When served by quiz_server.py, the server picks cards and keeps score
+let apiMode = false;
+const userId = localStorage.getItem('jkd-user') || (() => {
+    const id = Math.random().toString(36).slice(2) + Date.now().toString(36);
+    localStorage.setItem('jkd-user', id);
+    return id;
+})();
+
+async function api(path, body) {
+    const options = { headers: { 'X-User': userId } };
+    if (body !== undefined) {
+        options.method = 'POST';
+        options.body = JSON.stringify(body);
+        options.headers['Content-Type'] = 'application/json';
+    }
+    const response = await fetch(`api/${path}`, options);
+    if (!response.ok) {
+        throw new Error(`api/${path} failed: ${response.status}`);
+    }
+    return response.json();
+}
 
 // DOM Elements
 const questionText = document.getElementById('question-text');
@@ -30,6 +53,16 @@ const closeModalX = document.getElementById('close-modal');
 
 // Load flashcards from JSON
 async function loadFlashcards() {
+    try {
+        const stats = await api('stats');
+        apiMode = true;
+        scoreDisplay.textContent = stats.summary;
+        nextQuestion();
+        return;
+    } catch (error) {
+        // Static hosting: fall back to quizzing from flashcards.json
+    }
+
     try {
         const response = await fetch('flashcards.json');
         flashcards = await response.json();
@@ -52,96 +85,127 @@ function shuffle(array) {
 }
 
 // Load next question
-function nextQuestion() {
+async function nextQuestion() {
     // Reset UI
     feedbackEl.textContent = '';
     feedbackEl.className = 'feedback';
     nextBtn.disabled = true;
     sourceBtn.disabled = false;
 
-    // Pick random flashcard
-    currentCard = flashcards[Math.floor(Math.random() * flashcards.length)];
+    if (apiMode) {
+        // Server-scheduled card, options already shuffled
+        currentCard = await api('next');
+        currentAnswers = currentCard.options;
+        correctAnswer = '';
+        correctIndex = -1;
+    } else {
+        // Pick random flashcard
+        currentCard = flashcards[Math.floor(Math.random() * flashcards.length)];
+
+        // Prepare answers
+        const order = shuffle([0, 1, 2, 3]);
+        const answers = [
+            currentCard.correct_answer,
+            currentCard.wrong_answer_1,
+            currentCard.wrong_answer_2,
+            currentCard.wrong_answer_3
+        ];
+        currentAnswers = order.map(i => answers[i]);
+        correctAnswer = currentCard.correct_answer;
+        correctIndex = order.indexOf(0);
+    }
 
     // Update question
     questionText.textContent = currentCard.question_text;
     conceptDisplay.textContent = `Concept #${currentCard.concept_number}: ${currentCard.concept_name}`;
 
-    // Prepare answers
-    currentAnswers = shuffle([
-        currentCard.correct_answer,
-        currentCard.wrong_answer_1,
-        currentCard.wrong_answer_2,
-        currentCard.wrong_answer_3
-    ]);
-    correctAnswer = currentCard.correct_answer;
-
     // Update buttons
     answerButtons.forEach((btn, i) => {
         btn.textContent = `${String.fromCharCode(65 + i)}) ${currentAnswers[i]}`;
         btn.className = 'answer-btn';
         btn.disabled = false;
-        btn.onclick = () => checkAnswer(currentAnswers[i], btn);
+        btn.onclick = () => checkAnswer(i);
     });
 }
 
 // Check answer
-function checkAnswer(selectedAnswer, selectedBtn) {
-    const isCorrect = selectedAnswer === correctAnswer;
+async function checkAnswer(selectedIndex) {
+    answerButtons.forEach(btn => { btn.disabled = true; });
+
+    let isCorrect;
+    let feedback;
+    if (apiMode) {
+        const result = await api('answer', { choice: selectedIndex });
+        isCorrect = result.correct;
+        correctIndex = result.correct_index;
+        feedback = result.feedback;
+        scoreDisplay.textContent = result.summary;
+    } else {
+        isCorrect = selectedIndex === correctIndex;
 
-    // Update score
-    totalAnswered++;
-    if (isCorrect) {
-        score++;
-    }
+        // Update score
+        totalAnswered++;
+        if (isCorrect) {
+            score++;
+        }
 
-    // Update score display
-    const percentage = totalAnswered > 0 ? Math.round((score / totalAnswered) * 100) : 0;
-    scoreDisplay.textContent = `Score: ${score}/${totalAnswered} (${percentage}%)`;
+        // Update score display
+        const percentage = totalAnswered > 0 ? Math.round((score / totalAnswered) * 100) : 0;
+        scoreDisplay.textContent = `Score: ${score}/${totalAnswered} (${percentage}%)`;
 
-    // Update button colors and disable all
-    answerButtons.forEach(btn => {
-        const answerText = btn.textContent.substring(3); // Remove "A) ", "B) ", etc.
+        feedback = isCorrect
+            ? `✓ Correct! ${currentCard.explanation || ''}`
+            : `✗ Wrong. Correct answer: ${correctAnswer}. ${currentCard.explanation || ''}`;
+    }
 
-        if (answerText === correctAnswer) {
+    // Update button colors
+    answerButtons.forEach((btn, i) => {
+        if (i === correctIndex) {
             btn.className = 'answer-btn correct';
-        } else if (btn === selectedBtn && !isCorrect) {
+        } else if (i === selectedIndex && !isCorrect) {
             btn.className = 'answer-btn wrong';
         } else {
             btn.className = 'answer-btn other';
         }
-        btn.disabled = true;
     });
 
     // Show feedback
-    if (isCorrect) {
-        feedbackEl.textContent = `✓ Correct! ${currentCard.explanation || ''}`;
-        feedbackEl.className = 'feedback correct';
-    } else {
-        feedbackEl.textContent = `✗ Wrong. Correct answer: ${correctAnswer}. ${currentCard.explanation || ''}`;
-        feedbackEl.className = 'feedback wrong';
-    }
+    feedbackEl.textContent = feedback;
+    feedbackEl.className = isCorrect ? 'feedback correct' : 'feedback wrong';
 
     // Enable next button
     nextBtn.disabled = false;
 }
 
 // Reset score
-function resetScore() {
+async function resetScore() {
     if (confirm('Are you sure you want to reset your score?')) {
-        score = 0;
-        totalAnswered = 0;
-        scoreDisplay.textContent = 'Score: 0/0 (0%)';
+        if (apiMode) {
+            const stats = await api('reset', {});
+            scoreDisplay.textContent = stats.summary;
+        } else {
+            score = 0;
+            totalAnswered = 0;
+            scoreDisplay.textContent = 'Score: 0/0 (0%)';
+        }
         nextQuestion();
     }
 }
 
 // Show source material
-function showSourceMaterial() {
+async function showSourceMaterial() {
     if (!currentCard) return;
 
     const conceptNum = parseInt(currentCard.concept_number);
     const conceptName = currentCard.concept_name;
-    const sourceTextContent = CONCEPT_TEXTS[conceptNum] || 'Source material not found.';
+    let sourceTextContent = CONCEPT_TEXTS[conceptNum] || 'Source material not found.';
+    if (apiMode) {
+        try {
+            sourceTextContent = (await api(`source/${conceptNum}`)).text;
+        } catch (error) {
+            sourceTextContent = 'Source material not found.';
+        }
+    }
 
     modalTitle.textContent = `Concept #${conceptNum}: ${conceptName}`;
     sourceText.textContent = sourceTextContent;